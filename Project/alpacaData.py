@@ -1,42 +1,32 @@
-from alpaca.data.historical import CryptoHistoricalDataClient
-from alpaca.data.requests import CryptoBarsRequest
-from alpaca.data.timeframe import TimeFrame
 from datetime import datetime
 
+from bar_store import AlpacaCryptoFetcher, BarIngestor, BarStore
+
 # no keys required for crypto data
-client = CryptoHistoricalDataClient()
+# Daily bars are kept in the local bar store; re-running only fetches bars
+# newer than what is already stored (the high-water mark per symbol)
+store = BarStore("./bars")
+ingestor = BarIngestor(store, AlpacaCryptoFetcher(), timeframe="1Day")
 
-request_params = CryptoBarsRequest(
-    symbol_or_symbols=["BTC/USD", "ETH/USD"],
-    timeframe=TimeFrame.Day,
-    start=datetime(2022, 7, 1),
-    end=datetime(2022, 9, 1)
-)
+new_rows = ingestor.ingest(["BTC/USD", "ETH/USD"], default_start=datetime(2022, 7, 1))
+print(f"New bars stored: {new_rows}")
 
-bars = client.get_crypto_bars(request_params)
+bars = store.read(["BTC/USD", "ETH/USD"], start=datetime(2022, 7, 1), end=datetime(2022, 9, 1))
 
-# Convert to dataframe and print it
+# Print the dataframe
 print("=== Crypto Bars Data ===")
-print(bars.df)
+print(bars)
 
 # Print some basic info
 print(f"\n=== Data Summary ===")
-print(f"Number of records: {len(bars.df)}")
-print(f"Date range: {bars.df.index.get_level_values('timestamp').min()} to {bars.df.index.get_level_values('timestamp').max()}")
+print(f"Number of records: {len(bars)}")
+print(f"Date range: {bars['timestamp'].min()} to {bars['timestamp'].max()}")
 
-# Access specific symbol data - FIXED: Use list indexing instead of .head()
+# Access specific symbol data
 print(f"\n=== BTC/USD Sample (first 5 records) ===")
-btc_data = bars["BTC/USD"]
-for i in range(min(5, len(btc_data))):  # Show first 5 or fewer if list is shorter
-    print(btc_data[i])
+btc_df = bars[bars["symbol"] == "BTC/USD"]
+print(btc_df.head())
 
 print(f"\n=== ETH/USD Sample (first 5 records) ===")
-eth_data = bars["ETH/USD"]
-for i in range(min(5, len(eth_data))):  # Show first 5 or fewer if list is shorter
-    print(eth_data[i])
-
-# Alternative: Convert the list to DataFrame for easier viewing
-import pandas as pd
-print(f"\n=== BTC/USD as DataFrame ===")
-btc_df = pd.DataFrame([bar.__dict__ for bar in btc_data])
-print(btc_df.head())
\ No newline at end of file
+eth_df = bars[bars["symbol"] == "ETH/USD"]
+print(eth_df.head())
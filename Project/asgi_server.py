@@ -0,0 +1,658 @@
+# ============================================================================
+# ASYNC (ASGI) SERVING MODE
+# ============================================================================
+#
+# Same routes and JSON contracts as server.py, served by an asyncio event loop
+# instead of one blocking Flask worker per request.
+#
+# - Upstream I/O (yfinance, RSS) is awaited concurrently. The upstream
+#   libraries are synchronous, so each call runs on a large I/O thread pool
+#   while the event loop keeps accepting requests.
+# - CPU work (forecast fitting, sentiment inference) runs on a separate pool
+#   sized to the number of cores, so it can't starve the I/O calls.
+#
+# All response building is shared with server.py (build_stock_prediction,
+# build_portfolio, ...), so both modes return identical payloads.
+#
+# To run this server (Starlette + uvicorn are required for this mode only):
+#     uvicorn asgi_server:app --port 5001
+# or
+#     python asgi_server.py
+#
+# Pool sizes are configured with ASGI_IO_THREADS (default 256) and
+# ASGI_CPU_THREADS (default: number of CPU cores).
+# ============================================================================
+
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import server
+from server import (
+    analyze_news_sentiment,
+    build_detailed_forecast,
+    build_health,
+    build_portfolio,
+    build_portfolio_risk,
+    build_signal,
+    build_similar_stocks,
+    build_valuation,
+    build_stock_prediction,
+    compute_stock_prediction,
+    fetch_news_entries,
+    get_sentiment_pipeline_within,
+    parse_latency_budget,
+    parse_risk_request,
+    parse_sync_cursor,
+    parse_simulate,
+    parse_stream_symbols,
+    parse_valuation_request,
+    run_quick_forecast,
+    score_news_entries,
+    signal_tasks,
+    unknown_ticker_response,
+)
+from profiling import PROFILE_HEADER, PROFILE_QUERY_ARG
+from response_cache import UncacheableResponse, etag_matches
+from serialization import COMPRESSION_MIN_BYTES, dumps, negotiate_encoding, should_compress
+
+# ============================================================================
+# EXECUTORS
+# ============================================================================
+
+# Blocking upstream calls: lots of threads, they mostly wait on the network
+io_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('ASGI_IO_THREADS', 256)),
+                             thread_name_prefix='asgi-io')
+
+# Model fitting and inference: one thread per core
+cpu_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('ASGI_CPU_THREADS', os.cpu_count() or 4)),
+                              thread_name_prefix='asgi-cpu')
+
+
+# Profile of the current request, if it is being profiled (see ProfilingMiddleware).
+# Tasks copy the context when they are created, so every part of a request sees it.
+request_profile = contextvars.ContextVar('request_profile', default=None)
+
+
+def _profiled(func, args):
+    """func and args, wrapped to run under the current request's profile if there is one."""
+    active = request_profile.get()
+    return (func, args) if active is None else (active.run, (func, *args))
+
+
+async def run_io(func, *args):
+    """Run a blocking upstream call on the I/O pool and await it."""
+    func, args = _profiled(func, args)
+    return await asyncio.get_running_loop().run_in_executor(io_pool, func, *args)
+
+
+async def run_cpu(func, *args):
+    """Run CPU-bound work on the CPU pool and await it."""
+    func, args = _profiled(func, args)
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool, func, *args)
+
+
+async def read_json(request):
+    """Parse the JSON body, returning an empty dict if it is missing or invalid."""
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+class FlaskJSONResponse(JSONResponse):
+    """
+    JSON response encoded with the same encoder as the Flask server.
+
+    Starlette's own encoder rejects NaN/Infinity and NumPy scalars, both of
+    which the forecast payloads can contain.
+    """
+
+    def render(self, content):
+        return dumps(content)
+
+
+def json_response(payload, status=200):
+    return FlaskJSONResponse(payload, status_code=status)
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+async def get_stock_data(request):
+    """POST /api/stock/predict (see server.get_stock_data)."""
+    try:
+        data = await read_json(request)
+        ticker = str(data.get('ticker', '')).upper()
+        if not ticker:
+            return json_response({'error': 'Ticker symbol is required'}, 400)
+        server.popularity.record(ticker)  # for background pre-warming
+
+        # Info, price history and the forecast fit don't depend on each other,
+        # so all three run at the same time
+        info, hist, forecast_result = await asyncio.gather(
+            run_io(server.market_cache.get_info, ticker),
+            run_io(server.market_cache.get_history, ticker, '5d'),
+            run_cpu(run_quick_forecast, ticker),
+        )
+
+        response, status = build_stock_prediction(ticker, info, hist, forecast_result)
+        return json_response(response, status)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def get_detailed_forecast(request):
+    """POST /api/stock/forecast (see server.get_detailed_forecast)."""
+    try:
+        data = await read_json(request)
+        ticker = str(data.get('ticker', '')).upper()
+        if not ticker:
+            return json_response({'error': 'Ticker symbol is required'}, 400)
+        # Reject tickers without price history before any model work
+        if ticker not in await run_io(server.ticker_index):
+            response, status = unknown_ticker_response(ticker)
+            return json_response(response, status)
+        server.popularity.record(ticker)  # for background pre-warming
+
+        horizon = data.get('horizon', 20)
+        lags = data.get('lags')
+        fmt = data.get('format', 'rows')
+        if fmt not in server.RESPONSE_FORMATS:
+            return json_response({'error': "format must be 'rows' or 'columnar'"}, 400)
+        try:
+            simulate = parse_simulate(data.get('simulate'))
+        except ValueError as ve:
+            return json_response({'error': str(ve)}, 400)
+
+        response, status = await run_cpu(build_detailed_forecast, ticker, horizon, lags, fmt, simulate)
+        return json_response(response, status)
+
+    except ValueError as ve:
+        return json_response({'error': str(ve)}, 404)
+
+    except Exception as e:
+        print(f"Unexpected error in forecast endpoint: {e}")
+        return json_response({'error': str(e)}, 500)
+
+
+async def get_news_sentiment(request):
+    """POST /api/news/sentiment (see server.get_news_sentiment)."""
+    try:
+        data = await read_json(request)
+        ticker = str(data.get('ticker', '')).upper()
+        keyword = str(data.get('keyword', ticker)).lower()
+        if not ticker:
+            return json_response({'error': 'Ticker symbol is required'}, 400)
+        server.popularity.record(ticker)  # for background pre-warming
+
+        # Same budget rules as the Flask handler: body field first, then header
+        try:
+            deadline = parse_latency_budget(data, request.headers)
+        except ValueError as ve:
+            return json_response({'error': str(ve)}, 400)
+
+        # Feed fetch and model loading overlap; both respect the deadline
+        (entries, partial), pipe = await asyncio.gather(
+            run_io(fetch_news_entries, ticker, deadline),
+            run_io(get_sentiment_pipeline_within, deadline),
+        )
+        if entries is None:
+            return json_response({'error': 'Unable to fetch news feed'}, 500)
+
+        response, status = await run_cpu(score_news_entries, ticker, keyword, entries,
+                                         pipe, deadline, partial)
+        return json_response(response, status)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def _signal_part(name, func, args, deadline):
+    """Run one part of a signal request and time it, within the deadline."""
+    started = time.perf_counter()
+    pool = run_cpu if name == 'forecast' else run_io
+    result = await asyncio.wait_for(pool(func, *args), deadline.remaining())
+    return result, round((time.perf_counter() - started) * 1000.0, 1)
+
+
+async def get_stock_signal(request):
+    """POST /api/stock/signal (see server.get_stock_signal)."""
+    try:
+        data = await read_json(request)
+        ticker = str(data.get('ticker', '')).strip().upper()
+        if not ticker:
+            return json_response({'error': 'Ticker symbol is required'}, 400)
+        keyword = str(data.get('keyword', ticker)).lower()
+        try:
+            horizon = int(data.get('horizon', 20))
+        except (TypeError, ValueError):
+            return json_response({'error': 'horizon must be an integer'}, 400)
+        try:
+            deadline = parse_latency_budget(data, request.headers)
+        except ValueError as ve:
+            return json_response({'error': str(ve)}, 400)
+        if not 1 <= horizon <= server.SIGNAL_HORIZON_MAX:
+            return json_response({'error': f'horizon must be between 1 and {server.SIGNAL_HORIZON_MAX}'}, 400)
+        server.popularity.record(ticker)  # for background pre-warming
+
+        # Quote, forecast fit and sentiment all at once; total latency is the slowest one
+        started = time.perf_counter()
+        tasks = signal_tasks(ticker, keyword, horizon, deadline)
+        outcomes = await asyncio.gather(
+            *(_signal_part(name, task[0], task[1:], deadline) for name, task in tasks.items()),
+            return_exceptions=True,
+        )
+        results, errors, timings = {}, {}, {}
+        for name, outcome in zip(tasks, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                errors[name] = 'latency budget exceeded'
+            elif isinstance(outcome, Exception):
+                errors[name] = str(outcome)
+            else:
+                results[name], timings[name] = outcome
+        timings['total'] = round((time.perf_counter() - started) * 1000.0, 1)
+
+        response, status = build_signal(ticker, horizon, results, errors, timings)
+        return json_response(response, status)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def get_portfolio_data(request):
+    """POST /api/portfolio (see server.get_portfolio_data)."""
+    try:
+        data = await read_json(request)
+        tickers = data.get('tickers', [])
+        if not tickers or not isinstance(tickers, list):
+            return json_response({'error': 'Tickers array is required'}, 400)
+        fmt = data.get('format', 'rows')
+        if fmt not in server.RESPONSE_FORMATS:
+            return json_response({'error': "format must be 'rows' or 'columnar'"}, 400)
+        try:
+            cursor = parse_sync_cursor(data)
+        except ValueError as ve:
+            return json_response({'error': str(ve)}, 400)
+
+        # One bulk price download and the parallel info lookups, at the same time
+        symbols = [str(ticker).upper() for ticker in tickers]
+        histories, infos = await asyncio.gather(
+            run_io(server.market_cache.get_histories, symbols, '1d'),
+            run_io(server.market_cache.get_infos, symbols),
+        )
+
+        response, status = build_portfolio(tickers, histories, infos, fmt, cursor)
+        return json_response(response, status)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def get_portfolio_valuation(request):
+    """POST /api/portfolio/valuation (see server.get_portfolio_valuation)."""
+    try:
+        data = await read_json(request)
+        try:
+            book, include_weights, fmt = await run_cpu(parse_valuation_request, data)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+
+        histories = await run_io(server.market_cache.get_histories, book.tickers, '5d')
+        response, status = await run_cpu(build_valuation, book, histories, include_weights, fmt)
+        return json_response(response, status)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def get_portfolio_risk(request):
+    """POST /api/portfolio/risk (see server.get_portfolio_risk)."""
+    try:
+        data = await read_json(request)
+        try:
+            book, confidence, horizon_days = parse_risk_request(data)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+
+        response, status = await run_cpu(build_portfolio_risk, book, confidence, horizon_days)
+        return json_response(response, status)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def search_tickers(request):
+    """GET /api/tickers/search (see server.search_tickers)."""
+    try:
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return json_response({'error': 'Query parameter q is required'}, 400)
+        try:
+            limit = int(request.query_params.get('limit') or 10)
+        except ValueError:
+            return json_response({'error': 'limit must be an integer'}, 400)
+        if not 1 <= limit <= server.TICKER_SEARCH_MAX:
+            return json_response({'error': f'limit must be between 1 and {server.TICKER_SEARCH_MAX}'}, 400)
+
+        index = await run_io(server.ticker_index)
+        return json_response({'query': query, 'results': index.search(query, limit), 'tickers': len(index)})
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def get_similar_stocks(request):
+    """GET /api/stock/similar (see server.get_similar_stocks)."""
+    try:
+        ticker = request.query_params.get('ticker', '').strip().upper()
+        if not ticker:
+            return json_response({'error': 'Ticker symbol is required'}, 400)
+        try:
+            n = int(request.query_params.get('n') or 10)
+        except ValueError:
+            return json_response({'error': 'n must be an integer'}, 400)
+        if not 1 <= n <= server.SIMILAR_MAX:
+            return json_response({'error': f'n must be between 1 and {server.SIMILAR_MAX}'}, 400)
+
+        # Constant time, except when a rebuilt index file has to be loaded
+        response, status = await run_io(build_similar_stocks, ticker, n)
+        return json_response(response, status)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+# ============================================================================
+# CACHED GET ENDPOINTS (ETag / 304)
+# ============================================================================
+
+async def cached_json_response(request, endpoint, params, compute, pool=None, coalesce=True):
+    """Serve a GET endpoint from server.response_cache (see server.cached_json_response)."""
+    run = run_cpu if pool == 'cpu' else run_io
+    try:
+        entry = await run(server.response_cache.get_or_compute, endpoint, params, compute, coalesce)
+    except UncacheableResponse as u:
+        return json_response(u.payload, u.status)
+
+    encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+    if not should_compress(entry.body, encoding):
+        encoding = None
+    etag = entry.variant_etag(encoding)
+
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(entry.variant(encoding), media_type='application/json', headers=headers)
+
+
+async def get_stock_data_cached(request):
+    """GET /api/stock/predict?ticker=AAPL"""
+    try:
+        ticker = request.query_params.get('ticker', '').strip().upper()
+        if not ticker:
+            return json_response({'error': 'Ticker symbol is required'}, 400)
+        server.popularity.record(ticker)  # for background pre-warming
+        return await cached_json_response(request, 'predict', (ticker,),
+                                          lambda: compute_stock_prediction(ticker))
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def get_detailed_forecast_cached(request):
+    """GET /api/stock/forecast?ticker=AAPL&horizon=20&lags=10&simulate=2000"""
+    try:
+        ticker = request.query_params.get('ticker', '').strip().upper()
+        if not ticker:
+            return json_response({'error': 'Ticker symbol is required'}, 400)
+        if ticker not in await run_io(server.ticker_index):
+            response, status = unknown_ticker_response(ticker)
+            return json_response(response, status)
+        server.popularity.record(ticker)  # for background pre-warming
+        try:
+            horizon = int(request.query_params.get('horizon') or 20)
+            lags = int(request.query_params['lags']) if request.query_params.get('lags') else None
+        except ValueError:
+            return json_response({'error': 'horizon and lags must be integers'}, 400)
+        try:
+            simulate = parse_simulate(request.query_params.get('simulate'))
+        except ValueError as ve:
+            return json_response({'error': str(ve)}, 400)
+        fmt = request.query_params.get('format', 'rows')
+        if fmt not in server.RESPONSE_FORMATS:
+            return json_response({'error': "format must be 'rows' or 'columnar'"}, 400)
+        return await cached_json_response(request, 'forecast', (ticker, horizon, lags, fmt, simulate),
+                                          lambda: build_detailed_forecast(ticker, horizon, lags, fmt, simulate),
+                                          pool='cpu')
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def get_news_sentiment_cached(request):
+    """GET /api/news/sentiment?ticker=AAPL&keyword=apple&budgetMs=800"""
+    try:
+        ticker = request.query_params.get('ticker', '').strip().upper()
+        if not ticker:
+            return json_response({'error': 'Ticker symbol is required'}, 400)
+        server.popularity.record(ticker)  # for background pre-warming
+        keyword = request.query_params.get('keyword', ticker).lower()
+        try:
+            deadline = parse_latency_budget(request.query_params, request.headers)
+        except ValueError as ve:
+            return json_response({'error': str(ve)}, 400)
+
+        def compute():
+            payload, status = analyze_news_sentiment(ticker, keyword, deadline)
+            if status == 200 and payload.get('partial'):
+                raise UncacheableResponse(payload, status)
+            return payload, status
+
+        # Budgeted requests compute alone (see server.get_news_sentiment_cached)
+        return await cached_json_response(request, 'sentiment', (ticker, keyword), compute,
+                                          coalesce=not deadline.bounded)
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+# ============================================================================
+# LIVE PRICE STREAM (SERVER-SENT EVENTS)
+# ============================================================================
+
+async def price_stream(subscription):
+    """Async version of server.price_stream: no thread is held per client."""
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            update = await subscription.aget(timeout=server.price_hub.heartbeat)
+            if subscription.closed:
+                break
+            if update is None:
+                yield ': heartbeat\n\n'
+            else:
+                yield server.sse_event('price', update)
+    finally:
+        # Also runs when Starlette cancels the stream because the client left
+        server.price_hub.unsubscribe(subscription)
+
+
+async def stream_prices(request):
+    """GET /api/stream/prices?symbols=SPY,QQQ (see server.stream_prices)."""
+    try:
+        subscription = server.price_hub.subscribe(
+            parse_stream_symbols(request.query_params.get('symbols')),
+            loop=asyncio.get_running_loop())
+    except ValueError as ve:
+        return json_response({'error': str(ve)}, 400)
+    except OverflowError as oe:
+        return json_response({'error': str(oe)}, 503)
+    return StreamingResponse(price_stream(subscription), media_type='text/event-stream',
+                             headers=server.SSE_HEADERS)
+
+
+async def health_check(request):
+    """GET /api/health (see server.health_check)."""
+    response, status = build_health()
+    return json_response(response, status)
+
+# ============================================================================
+# REQUEST PROFILING (OPT-IN)
+# ============================================================================
+
+# Same triggers, storage and endpoints as in server.py (server.request_profiler).
+# The event loop thread runs every request's coroutines interleaved, so it is
+# not profiled; the profile covers the work the request runs through run_io()
+# and run_cpu(), which is where a slow request spends its time.
+
+class ProfilingMiddleware:
+    """ASGI middleware: profile requests that ask for it or are sampled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'].startswith('/api/debug/profiles'):
+            # Fetching profiles (token header included) shouldn't create new ones
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        active = server.request_profiler.start(request.headers, request.query_params, profile_caller=False)
+        if active is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message['headers'] = list(message.get('headers', [])) + [(b'x-profile-id', active.id.encode())]
+            await send(message)
+
+        token = request_profile.set(active)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            request_profile.reset(token)
+            # Never write the trigger token to disk
+            query = {k: v for k, v in request.query_params.items() if k != PROFILE_QUERY_ARG}
+            await run_io(server.request_profiler.finish, active, request.method, request.url.path,
+                         query, status)
+
+
+def profiles_authorized(request):
+    """The profiling token, or a local client when no token is configured (see server.py)."""
+    if server.request_profiler.token:
+        return server.request_profiler.authorized(request.headers.get(PROFILE_HEADER)
+                                                  or request.query_params.get(PROFILE_QUERY_ARG))
+    return request.client is not None and request.client.host in ('127.0.0.1', '::1')
+
+
+async def list_profiles(request):
+    """GET /api/debug/profiles (see server.list_profiles)."""
+    if not profiles_authorized(request):
+        return json_response({'error': 'profiling token required'}, 403)
+    profiles = await run_io(server.request_profiler.list)
+    return json_response({'profiler': server.request_profiler.stats(), 'profiles': profiles})
+
+
+async def download_profile(request):
+    """GET /api/debug/profiles/{profile_id} (see server.download_profile)."""
+    if not profiles_authorized(request):
+        return json_response({'error': 'profiling token required'}, 403)
+    profile_id = request.path_params['profile_id']
+    fmt = request.query_params.get('format', 'prof')
+    if fmt == 'json':
+        path = server.request_profiler.path(profile_id, '.json')
+        if path is None:
+            return json_response({'error': f'No profile {profile_id}'}, 404)
+        return FileResponse(os.path.abspath(path), media_type='application/json')
+    if fmt == 'text':
+        sort = request.query_params.get('sort', 'cumulative')
+        if sort not in server.PROFILE_SORT_KEYS:
+            return json_response({'error': f"sort must be one of {', '.join(server.PROFILE_SORT_KEYS)}"}, 400)
+        report = await run_io(server.request_profiler.report, profile_id, sort)
+        if report is None:
+            return json_response({'error': f'No profile {profile_id}'}, 404)
+        return PlainTextResponse(report)
+    if fmt != 'prof':
+        return json_response({'error': "format must be 'prof', 'json' or 'text'"}, 400)
+    path = server.request_profiler.path(profile_id)
+    if path is None:
+        return json_response({'error': f'No profile {profile_id}'}, 404)
+    return FileResponse(os.path.abspath(path), media_type='application/octet-stream',
+                        filename=profile_id + '.prof')
+
+# ============================================================================
+# ASGI APPLICATION
+# ============================================================================
+
+routes = [
+    Route('/api/stock/predict', get_stock_data, methods=['POST']),
+    Route('/api/stock/predict', get_stock_data_cached, methods=['GET']),
+    Route('/api/stock/forecast', get_detailed_forecast, methods=['POST']),
+    Route('/api/stock/forecast', get_detailed_forecast_cached, methods=['GET']),
+    Route('/api/stock/signal', get_stock_signal, methods=['POST']),
+    Route('/api/news/sentiment', get_news_sentiment, methods=['POST']),
+    Route('/api/news/sentiment', get_news_sentiment_cached, methods=['GET']),
+    Route('/api/tickers/search', search_tickers, methods=['GET']),
+    Route('/api/stock/similar', get_similar_stocks, methods=['GET']),
+    Route('/api/portfolio', get_portfolio_data, methods=['POST']),
+    Route('/api/portfolio/valuation', get_portfolio_valuation, methods=['POST']),
+    Route('/api/portfolio/risk', get_portfolio_risk, methods=['POST']),
+    Route('/api/stream/prices', stream_prices, methods=['GET']),
+    Route('/api/health', health_check, methods=['GET']),
+]
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Background pre-warming of popular tickers (PREWARM_ENABLED=1)
+    server.start_prewarm()
+    yield
+
+
+def create_app():
+    """
+    Build the Starlette application.
+
+    CORS is open to all origins, same as flask_cors's CORS(app) in server.py.
+    GZip covers the uncached responses; cached GET responses compress themselves
+    (with brotli when available) and are skipped by the middleware.
+    """
+    app_routes = list(routes)
+    middleware = []
+    # Opt-in request profiling (PROFILE_TOKEN / PROFILE_SAMPLE_EVERY), outermost
+    # so its duration covers the other middleware too
+    if server.request_profiler.enabled:
+        middleware.append(Middleware(ProfilingMiddleware))
+        app_routes += [
+            Route('/api/debug/profiles', list_profiles, methods=['GET']),
+            Route('/api/debug/profiles/{profile_id}', download_profile, methods=['GET']),
+        ]
+    middleware += [
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES),
+    ]
+    return Starlette(routes=app_routes, lifespan=lifespan, middleware=middleware)
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=5001)
@@ -0,0 +1,277 @@
+"""
+Streaming aggregation of trades into OHLCV/VWAP bars.
+
+Feeds on batches of trades (or any iterator of trades) and maintains bars at
+several timeframes at once, so bars can be derived locally from the trade
+feed instead of being requested from the upstream a second time.
+
+Each batch is bucketed with NumPy: for every timeframe the trades are sorted
+by (symbol, bucket, time) once and reduced per bucket with ufunc.reduceat
+(open = first, close = last, high = max, low = min, volume and price*volume
+sums). The per-batch partial bars are then merged into the open bars, which
+is associative, so batches can split a bar anywhere.
+
+Late and out-of-order trades: the aggregator tracks the newest trade time
+seen (event time). A bar is closed and emitted once its end is older than
+that time minus the watermark. Trades that arrive out of order but inside
+the watermark are merged into their still-open bar; trades for bars that
+were already emitted are dropped and counted in `late_trades`.
+
+Example:
+    agg = BarAggregator(timeframes=('1s', '1m', '5m'), watermark_seconds=2)
+    for batch in trade_batches:                 # DataFrames: symbol, timestamp, price, size
+        for bar in agg.add_batch(batch):        # bars closed by this batch
+            ...
+    remaining = agg.flush()                     # close everything at shutdown
+"""
+
+import numpy as np
+import pandas as pd
+
+# Timeframe label -> width in nanoseconds
+TIMEFRAME_NS = {
+    '1s': 1_000_000_000,
+    '5s': 5_000_000_000,
+    '1m': 60_000_000_000,
+    '5m': 300_000_000_000,
+    '15m': 900_000_000_000,
+    '1h': 3_600_000_000_000,
+}
+
+# bar_store.py names for the timeframes it stores
+STORE_TIMEFRAMES = {'1m': '1Min', '5m': '5Min', '1h': '1Hour'}
+
+BAR_FIELDS = ['timeframe', 'symbol', 'timestamp', 'open', 'high', 'low', 'close',
+              'volume', 'vwap', 'trade_count']
+
+
+class _OpenBar:
+    """Running aggregate of one (timeframe, symbol, bucket)."""
+
+    __slots__ = ('open', 'high', 'low', 'close', 'volume', 'notional', 'count',
+                 'first_ns', 'last_ns')
+
+    def __init__(self, open_, high, low, close, volume, notional, count, first_ns, last_ns):
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.notional = notional
+        self.count = count
+        self.first_ns = first_ns
+        self.last_ns = last_ns
+
+    def merge(self, open_, high, low, close, volume, notional, count, first_ns, last_ns):
+        # Open/close come from whichever side has the earlier/later trade, so
+        # out-of-order batches still give the right values
+        if first_ns < self.first_ns:
+            self.open, self.first_ns = open_, first_ns
+        if last_ns >= self.last_ns:
+            self.close, self.last_ns = close, last_ns
+        self.high = max(self.high, high)
+        self.low = min(self.low, low)
+        self.volume += volume
+        self.notional += notional
+        self.count += count
+
+
+class BarAggregator:
+    """
+    Incremental trade -> bar aggregation at several timeframes.
+
+    Args:
+        timeframes (tuple): labels from TIMEFRAME_NS
+        watermark_seconds (float): how long to wait for late trades before
+                                   a bar is closed
+    """
+
+    def __init__(self, timeframes=('1s', '1m', '5m'), watermark_seconds=2.0):
+        unknown = [tf for tf in timeframes if tf not in TIMEFRAME_NS]
+        if unknown:
+            raise ValueError(f'unknown timeframes {unknown} (expected {", ".join(TIMEFRAME_NS)})')
+        # Finest first: a trade too late for it is what late_trades counts
+        self.timeframes = tuple(sorted(timeframes, key=TIMEFRAME_NS.get))
+        self.watermark_ns = int(watermark_seconds * 1e9)
+        self._bars = {tf: {} for tf in self.timeframes}  # tf -> {(symbol, bucket_ns): _OpenBar}
+        self._closed_until = {tf: np.iinfo(np.int64).min for tf in self.timeframes}
+        self.max_event_ns = None
+        self.trades = 0
+        self.late_trades = 0
+        self.bars_emitted = 0
+
+    # ----- input -----
+
+    def add_batch(self, trades):
+        """
+        Add a batch of trades and return the bars it closed.
+
+        Args:
+            trades (DataFrame): columns symbol, timestamp, price, size. An
+                                Alpaca trades frame (MultiIndex symbol,
+                                timestamp) works as is.
+
+        Returns:
+            list: closed bars as dicts (see BAR_FIELDS), oldest first
+        """
+        if isinstance(trades.index, pd.MultiIndex) or 'timestamp' not in trades.columns:
+            trades = trades.reset_index()
+        if trades.empty:
+            return []
+        ts = pd.to_datetime(trades['timestamp'], utc=True)
+        return self.add_arrays(
+            trades['symbol'].to_numpy(dtype=object),
+            ts.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').view(np.int64),
+            trades['price'].to_numpy(dtype=np.float64),
+            trades['size'].to_numpy(dtype=np.float64),
+        )
+
+    def consume(self, trades, batch_size=1000):
+        """
+        Aggregate an iterator of single trades (dicts with symbol, timestamp,
+        price, size), batching them internally. Yields closed bars.
+        """
+        batch = []
+        for trade in trades:
+            batch.append(trade)
+            if len(batch) >= batch_size:
+                yield from self.add_batch(pd.DataFrame(batch))
+                batch = []
+        if batch:
+            yield from self.add_batch(pd.DataFrame(batch))
+
+    def add_arrays(self, symbols, ts_ns, prices, sizes):
+        """Core of add_batch(): parallel arrays, timestamps as int64 nanoseconds (UTC)."""
+        n = len(ts_ns)
+        if n == 0:
+            return []
+        self.trades += n
+        batch_max = int(ts_ns.max())
+        if self.max_event_ns is None or batch_max > self.max_event_ns:
+            self.max_event_ns = batch_max
+
+        codes, names = pd.factorize(symbols)
+        notional = prices * sizes
+        for tf in self.timeframes:
+            width = TIMEFRAME_NS[tf]
+            buckets = ts_ns - ts_ns % width
+
+            # Trades for bars that were already emitted are too late
+            on_time = buckets >= self._closed_until[tf]
+            if not on_time.all():
+                if tf == self.timeframes[0]:
+                    self.late_trades += int((~on_time).sum())
+                self._merge(tf, codes[on_time], names, buckets[on_time], ts_ns[on_time],
+                            prices[on_time], sizes[on_time], notional[on_time])
+            else:
+                self._merge(tf, codes, names, buckets, ts_ns, prices, sizes, notional)
+        return self._close_ready()
+
+    def _merge(self, tf, codes, names, buckets, ts_ns, prices, sizes, notional):
+        if len(ts_ns) == 0:
+            return
+        # Sort by symbol, then bucket, then time: each group is one bar
+        order = np.lexsort((ts_ns, buckets, codes))
+        codes, buckets, ts_ns = codes[order], buckets[order], ts_ns[order]
+        prices, sizes, notional = prices[order], sizes[order], notional[order]
+
+        new_group = np.empty(len(order), dtype=bool)
+        new_group[0] = True
+        new_group[1:] = (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])
+        starts = np.flatnonzero(new_group)
+        ends = np.append(starts[1:], len(order)) - 1
+
+        highs = np.maximum.reduceat(prices, starts)
+        lows = np.minimum.reduceat(prices, starts)
+        volumes = np.add.reduceat(sizes, starts)
+        notionals = np.add.reduceat(notional, starts)
+        counts = np.diff(np.append(starts, len(order)))
+
+        bars = self._bars[tf]
+        for i, (s, e) in enumerate(zip(starts, ends)):
+            key = (names[codes[s]], int(buckets[s]))
+            values = (prices[s], highs[i], lows[i], prices[e], volumes[i], notionals[i],
+                      int(counts[i]), int(ts_ns[s]), int(ts_ns[e]))
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = _OpenBar(*values)
+            else:
+                bar.merge(*values)
+
+    # ----- output -----
+
+    def _close_ready(self, until_ns=None):
+        """Emit every bar that ends at or before until_ns (default: event time - watermark)."""
+        if until_ns is None:
+            if self.max_event_ns is None:
+                return []
+            until_ns = self.max_event_ns - self.watermark_ns
+        closed = []
+        for tf in self.timeframes:
+            width = TIMEFRAME_NS[tf]
+            # Bars starting before this are complete
+            limit = until_ns - width
+            bars = self._bars[tf]
+            ready = sorted(key for key in bars if key[1] <= limit)
+            for key in ready:
+                closed.append(self._to_dict(tf, key, bars.pop(key)))
+            # Buckets before the newest fully-elapsed one can't receive trades anymore
+            self._closed_until[tf] = max(self._closed_until[tf], limit - limit % width + width)
+        closed.sort(key=lambda b: (b['timestamp'], TIMEFRAME_NS[b['timeframe']], b['symbol']))
+        self.bars_emitted += len(closed)
+        return closed
+
+    def flush(self):
+        """Close and return every open bar (at shutdown: later trades count as late)."""
+        return self._close_ready(until_ns=np.iinfo(np.int64).max // 2)
+
+    @staticmethod
+    def _to_dict(tf, key, bar):
+        symbol, bucket_ns = key
+        return {
+            'timeframe': tf,
+            'symbol': symbol,
+            'timestamp': pd.Timestamp(bucket_ns),
+            'open': float(bar.open),
+            'high': float(bar.high),
+            'low': float(bar.low),
+            'close': float(bar.close),
+            'volume': float(bar.volume),
+            'vwap': float(bar.notional / bar.volume) if bar.volume else float(bar.close),
+            'trade_count': bar.count,
+        }
+
+    def open_bars(self, tf):
+        """Current (not yet closed) bars of one timeframe, as dicts."""
+        return [self._to_dict(tf, key, bar) for key, bar in sorted(self._bars[tf].items())]
+
+    def stats(self):
+        return {
+            'trades': self.trades,
+            'lateTrades': self.late_trades,
+            'barsEmitted': self.bars_emitted,
+            'openBars': {tf: len(bars) for tf, bars in self._bars.items()},
+        }
+
+
+def bars_to_frame(bars):
+    """Closed bars (list of dicts) as a DataFrame with BAR_FIELDS columns."""
+    return pd.DataFrame(bars, columns=BAR_FIELDS)
+
+
+def append_to_store(store, bars):
+    """
+    Append closed bars to a bar_store.BarStore, one store timeframe at a time.
+
+    Timeframes the store doesn't keep (e.g. 1s) are skipped.
+
+    Returns:
+        dict: store timeframe -> {symbol: rows written}
+    """
+    frame = bars_to_frame(bars)
+    written = {}
+    for tf, rows in frame.groupby('timeframe'):
+        store_tf = STORE_TIMEFRAMES.get(tf)
+        if store_tf is not None:
+            written[store_tf] = store.append(rows.drop(columns=['timeframe']), store_tf)
+    return written
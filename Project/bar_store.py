@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local partitioned store of OHLCV bars with incremental ingestion.
+
+Layout on disk (one directory tree per timeframe):
+
+    <root>/<timeframe>/symbol=<SYMBOL>/date=<PERIOD>/part-<id>.parquet
+    <root>/_meta/<timeframe>.json          high-water marks per symbol
+
+PERIOD is the month (2024-05) for daily bars and the day (2024-05-17) for
+intraday bars, so a partition holds a few hundred to a few thousand rows.
+Symbols are URL-quoted in directory names (BTC/USD -> BTC%2FUSD).
+
+Every bar has the columns timestamp (UTC, tz-naive), symbol, open, high,
+low, close, volume, the same layout as stock_data_since_2016.parquet, so
+forecast_model_final.load_and_prepare() reads a store directory directly.
+
+Ingestion is incremental: the store remembers the newest timestamp written
+per symbol (the high-water mark), the ingestor asks the upstream for bars
+from it onwards, and rows before it are dropped on append. The bar *at* the
+mark is fetched again on purpose: the last bar of a run is often still
+forming (today's daily bar, the current minute), so a newer version of it
+replaces the stored one (reads keep the newest part file's copy of a
+timestamp). Each append writes small part files; compact() merges them into
+one file per partition.
+
+One writer per store at a time (the ingestion job); any number of readers.
+
+Example:
+    # Crypto minute bars from Alpaca, only what's new since the last run
+    python bar_store.py ingest --store ./bars --timeframe 1Min --source alpaca \\
+        --symbols BTC/USD,ETH/USD --start 2024-01-01
+
+    # Daily stock bars through the configured provider (FINSIGHT_PROVIDER)
+    python bar_store.py ingest --store ./bars --timeframe 1Day --source provider \\
+        --symbols AAPL,MSFT,NVDA
+
+    # Seed the store from the existing snapshot, then merge small files
+    python bar_store.py import --store ./bars --parquet stock_data_since_2016.parquet
+    python bar_store.py compact --store ./bars
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+BAR_COLUMNS = ['timestamp', 'symbol', 'open', 'high', 'low', 'close', 'volume']
+
+# Length of one bar for each supported timeframe
+TIMEFRAMES = {
+    '1Min': timedelta(minutes=1),
+    '5Min': timedelta(minutes=5),
+    '1Hour': timedelta(hours=1),
+    '1Day': timedelta(days=1),
+}
+
+
+def normalize_bars(df, symbol=None):
+    """
+    Bring a bar DataFrame into the store layout.
+
+    Accepts yfinance frames (DatetimeIndex, capitalized columns), Alpaca
+    frames (MultiIndex symbol/timestamp) and plain frames with a timestamp
+    or date column. Timestamps are converted to UTC and made tz-naive.
+    """
+    if isinstance(df.index, (pd.MultiIndex, pd.DatetimeIndex)) or df.index.name is not None:
+        df = df.reset_index()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    df = df.rename(columns={'date': 'timestamp', 'datetime': 'timestamp', 'ticker': 'symbol'})
+    if 'timestamp' not in df.columns and 'index' in df.columns:
+        df = df.rename(columns={'index': 'timestamp'})
+    if symbol is not None:
+        df['symbol'] = symbol
+    missing = [c for c in BAR_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f'bars are missing columns {missing}')
+    ts = pd.to_datetime(df['timestamp'], errors='coerce', utc=True)
+    df = df.assign(timestamp=ts.dt.tz_localize(None))[BAR_COLUMNS]
+    df = df.dropna(subset=['timestamp', 'close'])
+    df['symbol'] = df['symbol'].astype(str).str.upper()
+    df['volume'] = df['volume'].astype('float64')
+    return df.sort_values(['symbol', 'timestamp']).reset_index(drop=True)
+
+
+class BarStore:
+    """
+    Symbol- and date-partitioned parquet store of bars.
+
+    Args:
+        root (str): directory of the store (created on first write)
+        compact_min_files (int): append() compacts a partition once it has
+                                 this many part files (0 disables that)
+    """
+
+    def __init__(self, root, compact_min_files=8):
+        self.root = root
+        self.compact_min_files = int(compact_min_files)
+        self._lock = threading.Lock()
+
+    # ----- paths -----
+
+    @staticmethod
+    def _check_timeframe(timeframe):
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"unknown timeframe '{timeframe}' (expected one of {', '.join(TIMEFRAMES)})")
+
+    @staticmethod
+    def period_of(timestamps, timeframe):
+        """Partition label of each timestamp: month for daily bars, day for intraday."""
+        return timestamps.dt.strftime('%Y-%m' if timeframe == '1Day' else '%Y-%m-%d')
+
+    def _symbol_dir(self, timeframe, symbol):
+        return os.path.join(self.root, timeframe, f'symbol={quote(symbol, safe="")}')
+
+    def _meta_path(self, timeframe):
+        return os.path.join(self.root, '_meta', f'{timeframe}.json')
+
+    def symbols(self, timeframe='1Day'):
+        base = os.path.join(self.root, timeframe)
+        if not os.path.isdir(base):
+            return []
+        return sorted(unquote(name.split('=', 1)[1]) for name in os.listdir(base)
+                      if name.startswith('symbol='))
+
+    def _partitions(self, timeframe, symbol):
+        """[(period, directory)] of one symbol, oldest first."""
+        sym_dir = self._symbol_dir(timeframe, symbol)
+        if not os.path.isdir(sym_dir):
+            return []
+        return sorted((name.split('=', 1)[1], os.path.join(sym_dir, name))
+                      for name in os.listdir(sym_dir) if name.startswith('date='))
+
+    @staticmethod
+    def _parts(partition_dir):
+        return sorted(os.path.join(partition_dir, f) for f in os.listdir(partition_dir)
+                      if f.endswith('.parquet'))
+
+    # ----- high-water marks -----
+
+    def high_water_marks(self, timeframe='1Day'):
+        """{symbol: newest stored timestamp}."""
+        try:
+            with open(self._meta_path(timeframe), encoding='utf-8') as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return {}
+        return {symbol: pd.Timestamp(ts) for symbol, ts in raw.items()}
+
+    def high_water_mark(self, symbol, timeframe='1Day'):
+        return self.high_water_marks(timeframe).get(symbol.upper())
+
+    def _save_high_water_marks(self, timeframe, marks):
+        path = self._meta_path(timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({s: ts.isoformat() for s, ts in sorted(marks.items())}, f, indent=1)
+        os.replace(tmp_path, path)
+
+    def version(self, timeframe='1Day'):
+        """Changes whenever bars are appended or compacted (used to key caches)."""
+        try:
+            return os.path.getmtime(self._meta_path(timeframe))
+        except FileNotFoundError:
+            return 0.0
+
+    # ----- writing -----
+
+    @staticmethod
+    def _write_part(partition_dir, frame):
+        os.makedirs(partition_dir, exist_ok=True)
+        # Names sort by write time down to the microsecond: a replaced bar
+        # must sort after the part holding its previous version
+        now = time.time()
+        stamp = f'{time.strftime("%Y%m%dT%H%M%S", time.localtime(now))}{int(now % 1 * 1e6):06d}'
+        name = f'part-{stamp}-{uuid.uuid4().hex[:8]}.parquet'
+        tmp_path = os.path.join(partition_dir, f'.{name}.tmp')
+        frame.to_parquet(tmp_path, index=False)
+        # Readers only pick up *.parquet, so they never see a half-written file
+        os.replace(tmp_path, os.path.join(partition_dir, name))
+
+    def append(self, bars, timeframe='1Day'):
+        """
+        Append bars, skipping anything before each symbol's high-water mark.
+
+        A bar at the mark replaces the stored one unless it is unchanged.
+
+        Returns:
+            dict: symbol -> number of new or replaced rows written
+        """
+        self._check_timeframe(timeframe)
+        bars = normalize_bars(bars)
+        written = {}
+        with self._lock:
+            marks = self.high_water_marks(timeframe)
+            touched = set()
+            for symbol, rows in bars.groupby('symbol', sort=True):
+                mark = marks.get(symbol)
+                rows = rows.drop_duplicates('timestamp', keep='last')
+                if mark is not None:
+                    rows = rows[rows['timestamp'] >= mark]
+                    if len(rows) and rows['timestamp'].iloc[0] == mark and self._same_as_stored(
+                            rows.iloc[:1], symbol, timeframe):
+                        rows = rows.iloc[1:]
+                if rows.empty:
+                    continue
+                periods = self.period_of(rows['timestamp'], timeframe)
+                for period, chunk in rows.groupby(periods, sort=True):
+                    partition_dir = os.path.join(self._symbol_dir(timeframe, symbol), f'date={period}')
+                    self._write_part(partition_dir, chunk)
+                    touched.add(partition_dir)
+                marks[symbol] = rows['timestamp'].max()
+                written[symbol] = len(rows)
+            if written:
+                # Written after the data: a crash in between only means the
+                # next run re-fetches those bars, and compaction dedupes them
+                self._save_high_water_marks(timeframe, marks)
+            if self.compact_min_files:
+                for partition_dir in touched:
+                    if len(self._parts(partition_dir)) >= self.compact_min_files:
+                        self._compact_partition(partition_dir)
+        return written
+
+    def _same_as_stored(self, row, symbol, timeframe):
+        """True if a one-row frame equals the stored bar at the same timestamp."""
+        stored = self.latest(symbol, timeframe)
+        if stored.empty or stored['timestamp'].iloc[0] != row['timestamp'].iloc[0]:
+            return False
+        cols = ['open', 'high', 'low', 'close', 'volume']
+        return bool((stored[cols].to_numpy(dtype=float) == row[cols].to_numpy(dtype=float)).all())
+
+    def _compact_partition(self, partition_dir):
+        parts = self._parts(partition_dir)
+        if len(parts) < 2:
+            return False
+        frame = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+        frame = frame.drop_duplicates('timestamp', keep='last').sort_values('timestamp')
+        self._write_part(partition_dir, frame.reset_index(drop=True))
+        for path in parts:
+            os.remove(path)
+        return True
+
+    def compact(self, timeframe='1Day', min_files=2):
+        """Merge the part files of every partition that has at least min_files of them."""
+        self._check_timeframe(timeframe)
+        merged = 0
+        with self._lock:
+            for symbol in self.symbols(timeframe):
+                for _, partition_dir in self._partitions(timeframe, symbol):
+                    if len(self._parts(partition_dir)) >= min_files:
+                        merged += self._compact_partition(partition_dir)
+            if merged:
+                # Bump the version so caches keyed on it reload
+                self._save_high_water_marks(timeframe, self.high_water_marks(timeframe))
+        return merged
+
+    # ----- reading -----
+
+    def read(self, symbols=None, start=None, end=None, timeframe='1Day'):
+        """
+        Bars as one DataFrame (BAR_COLUMNS), sorted by symbol and timestamp.
+
+        Only the partitions overlapping [start, end] are opened.
+        """
+        self._check_timeframe(timeframe)
+        symbols = self.symbols(timeframe) if symbols is None else [s.upper() for s in symbols]
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        fmt = '%Y-%m' if timeframe == '1Day' else '%Y-%m-%d'
+        lo = start.strftime(fmt) if start is not None else None
+        hi = end.strftime(fmt) if end is not None else None
+
+        frames = []
+        for symbol in symbols:
+            for period, partition_dir in self._partitions(timeframe, symbol):
+                if (lo is not None and period < lo) or (hi is not None and period > hi):
+                    continue
+                frames.extend(pd.read_parquet(p) for p in self._parts(partition_dir))
+        if not frames:
+            return pd.DataFrame({c: pd.Series(dtype='float64') for c in BAR_COLUMNS})
+        df = pd.concat(frames, ignore_index=True)
+        if start is not None:
+            df = df[df['timestamp'] >= start]
+        if end is not None:
+            df = df[df['timestamp'] <= end]
+        df = df.drop_duplicates(['symbol', 'timestamp'], keep='last')
+        return df.sort_values(['symbol', 'timestamp']).reset_index(drop=True)
+
+    def latest(self, symbol, timeframe='1Day', n=1):
+        """The last n bars of a symbol (reads only its newest partitions)."""
+        rows = []
+        for _, partition_dir in reversed(self._partitions(timeframe, symbol.upper())):
+            rows.extend(pd.read_parquet(p) for p in self._parts(partition_dir))
+            if sum(len(r) for r in rows) >= n:
+                break
+        if not rows:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        df = pd.concat(rows, ignore_index=True).drop_duplicates('timestamp', keep='last')
+        return df.sort_values('timestamp').tail(n).reset_index(drop=True)
+
+
+def is_bar_store(path):
+    """True if path is a BarStore directory (as opposed to a single parquet file)."""
+    return os.path.isdir(os.path.join(path, '_meta'))
+
+
+# ============================================================================
+# UPSTREAM FETCHERS
+# ============================================================================
+
+class AlpacaCryptoFetcher:
+    """Crypto bars from Alpaca's historical API (no keys needed)."""
+
+    def __init__(self):
+        self._client = None
+
+    def fetch(self, symbols, start, timeframe):
+        from alpaca.data.historical import CryptoHistoricalDataClient
+        from alpaca.data.requests import CryptoBarsRequest
+        from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
+        if self._client is None:
+            self._client = CryptoHistoricalDataClient()
+        alpaca_timeframe = {
+            '1Min': TimeFrame.Minute,
+            '5Min': TimeFrame(5, TimeFrameUnit.Minute),
+            '1Hour': TimeFrame.Hour,
+            '1Day': TimeFrame.Day,
+        }[timeframe]
+        bars = self._client.get_crypto_bars(CryptoBarsRequest(
+            symbol_or_symbols=list(symbols),
+            timeframe=alpaca_timeframe,
+            start=start.to_pydatetime(),
+        ))
+        return bars.df
+
+
+class ProviderDailyFetcher:
+    """
+    Daily stock bars through a providers.py provider (one bulk download).
+
+    The provider API takes a period rather than a start date, so the
+    smallest period covering the gap is requested and append() drops the
+    rows the store already has.
+    """
+
+    PERIODS = [('5d', 5), ('1mo', 30), ('3mo', 90), ('6mo', 180), ('1y', 365),
+               ('2y', 730), ('5y', 1825), ('10y', 3650), ('max', None)]
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def fetch(self, symbols, start, timeframe):
+        if timeframe != '1Day':
+            raise ValueError('the provider fetcher only supports 1Day bars')
+        from market_cache import split_download
+        gap_days = (pd.Timestamp.now() - start).days + 1
+        period = next(p for p, days in self.PERIODS if days is None or days >= gap_days)
+        symbols = list(symbols)
+        data = self.provider.download(symbols, period)
+        frames = [normalize_bars(frame, symbol)
+                  for symbol, frame in split_download(data, symbols).items() if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=BAR_COLUMNS)
+
+
+class BarIngestor:
+    """
+    Pulls the bars from each symbol's high-water mark onwards into a store.
+
+    The bar at the mark is fetched again so a bar that was still forming on
+    the previous run gets its final values.
+
+    Symbols with the same starting point share one upstream request.
+
+    Args:
+        store (BarStore): destination
+        fetcher: object with fetch(symbols, start, timeframe) -> DataFrame
+        timeframe (str): one of TIMEFRAMES
+    """
+
+    def __init__(self, store, fetcher, timeframe='1Day'):
+        BarStore._check_timeframe(timeframe)
+        self.store = store
+        self.fetcher = fetcher
+        self.timeframe = timeframe
+
+    def ingest(self, symbols, default_start):
+        """
+        Fetch and append new bars.
+
+        Args:
+            symbols (list): symbols to update
+            default_start: where to start for symbols not in the store yet
+
+        Returns:
+            dict: symbol -> number of new or replaced rows
+        """
+        marks = self.store.high_water_marks(self.timeframe)
+        by_start = {}
+        for symbol in (s.upper() for s in symbols):
+            mark = marks.get(symbol)
+            start = mark if mark is not None else pd.Timestamp(default_start)
+            by_start.setdefault(start, []).append(symbol)
+
+        written = {}
+        for start, group in sorted(by_start.items()):
+            if start > pd.Timestamp.now():
+                continue  # already up to date
+            bars = self.fetcher.fetch(group, start, self.timeframe)
+            if bars is not None and len(bars):
+                written.update(self.store.append(bars, self.timeframe))
+        return written
+
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def main():
+    ap = argparse.ArgumentParser(description='Incremental bar ingestion into a local parquet store.')
+    sub = ap.add_subparsers(dest='command', required=True)
+
+    ingest = sub.add_parser('ingest', help='fetch bars from the high-water marks onwards')
+    ingest.add_argument('--store', default='./bars')
+    ingest.add_argument('--symbols', required=True, help='comma separated, e.g. BTC/USD,ETH/USD')
+    ingest.add_argument('--timeframe', default='1Day', choices=list(TIMEFRAMES))
+    ingest.add_argument('--source', default='alpaca', choices=['alpaca', 'provider'])
+    ingest.add_argument('--start', default='2016-01-01', help='start for symbols not in the store yet')
+    ingest.add_argument('--watch', type=float, default=0,
+                        help='repeat every N seconds instead of running once')
+
+    imp = sub.add_parser('import', help='load an existing parquet snapshot into the store')
+    imp.add_argument('--store', default='./bars')
+    imp.add_argument('--parquet', default='./stock_data_since_2016.parquet')
+    imp.add_argument('--timeframe', default='1Day', choices=list(TIMEFRAMES))
+
+    compact = sub.add_parser('compact', help='merge small part files')
+    compact.add_argument('--store', default='./bars')
+    compact.add_argument('--timeframe', default='1Day', choices=list(TIMEFRAMES))
+
+    args = ap.parse_args()
+    store = BarStore(args.store)
+
+    if args.command == 'import':
+        written = store.append(pd.read_parquet(args.parquet), args.timeframe)
+        merged = store.compact(args.timeframe)
+        print(f'Imported {sum(written.values())} bars for {len(written)} symbols '
+              f'({merged} partitions compacted)')
+        return
+
+    if args.command == 'compact':
+        print(f'Compacted {store.compact(args.timeframe)} partitions')
+        return
+
+    if args.source == 'alpaca':
+        fetcher = AlpacaCryptoFetcher()
+    else:
+        from providers import get_provider
+        fetcher = ProviderDailyFetcher(get_provider())
+    ingestor = BarIngestor(store, fetcher, args.timeframe)
+    symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+
+    while True:
+        written = ingestor.ingest(symbols, args.start)
+        summary = ', '.join(f'{s}: +{n}' for s, n in written.items()) or 'no new bars'
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {summary}")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == '__main__':
+    main()
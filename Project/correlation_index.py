@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Precomputed "similar stocks" index: top-k most correlated tickers per ticker.
+
+Offline job (run after the price dataset is updated, e.g. nightly):
+    python correlation_index.py --parquet stock_data_since_2016.parquet \
+        --out correlation_index.npz --k 20 --lookback 756
+
+How it is built:
+- daily log returns over the last `lookback` trading days, one column per
+  ticker; each pair is correlated over the days both tickers traded
+- the correlation matrix is never held in full: for each block of
+  `block_size` tickers, one matrix product gives their correlations with the
+  whole universe (block_size x N), the top k per row are kept and the block
+  is discarded. Memory stays O(block_size * N) whatever the universe size.
+- pairs that traded together on fewer than `min_overlap` days are ignored
+
+The result is stored as an .npz (tickers, neighbor indices, correlations and
+build metadata). CorrelationIndex.load() reads it back, and neighbors() is a
+dict lookup plus a slice.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from forecast_model_final import dataset_version, load_and_prepare
+
+DEFAULT_INDEX_PATH = 'correlation_index.npz'
+
+
+def daily_returns(parquet_path, lookback=756):
+    """Daily log returns (dates x tickers) over the last `lookback` trading days."""
+    df = load_and_prepare(parquet_path)
+    closes = df.pivot_table(index='date', columns='ticker', values='close', aggfunc='last').sort_index()
+    closes = closes.tail(lookback + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.log(closes / closes.shift(1)).iloc[1:]
+    return returns.replace([np.inf, -np.inf], np.nan)
+
+
+def top_k_correlations(returns, k=20, block_size=512, min_overlap=60):
+    """
+    Top-k correlated tickers per ticker, computed block by block.
+
+    Args:
+        returns (DataFrame): dates x tickers, NaN where a ticker has no return
+        k (int): neighbors kept per ticker
+        block_size (int): tickers per block (bounds memory)
+        min_overlap (int): minimum number of common days for a pair
+
+    Returns:
+        tuple: (tickers, neighbors int32 [N, k], correlations float32 [N, k]);
+               rows with fewer than k valid neighbors are padded with -1 / NaN
+    """
+    tickers = [str(t) for t in returns.columns]
+    values = returns.to_numpy(dtype=np.float64)
+    present = ~np.isnan(values)
+
+    # Centered on each column's mean (numerical stability), 0 where missing
+    counts = present.sum(axis=0)
+    means = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), 0.0)
+    x = np.where(present, values - means, 0.0)
+    x2 = x * x
+    mask = present.astype(np.float64)
+
+    n = len(tickers)
+    k = min(k, max(n - 1, 0))
+    neighbors = np.full((n, k), -1, dtype=np.int32)
+    correlations = np.full((n, k), np.nan, dtype=np.float32)
+    if k == 0:
+        return tickers, neighbors, correlations
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        rows = np.arange(start, stop)
+        # Pearson correlation of this block vs. everything, each pair over the
+        # days both traded: sums of a, b, a^2, b^2 and a*b restricted to the
+        # common days are all matrix products with the presence mask
+        xb, mb = x[:, start:stop], mask[:, start:stop]
+        overlap = mb.T @ mask
+        sum_a = xb.T @ mask
+        sum_b = mb.T @ x
+        cov = overlap * (xb.T @ x) - sum_a * sum_b
+        var_a = overlap * (x2[:, start:stop].T @ mask) - sum_a ** 2
+        var_b = overlap * (mb.T @ x2) - sum_b ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.sqrt(var_a * var_b)
+        np.clip(corr, -1.0, 1.0, out=corr)
+        corr[(overlap < min_overlap) | ~np.isfinite(corr)] = -np.inf
+        corr[rows - start, rows] = -np.inf  # not its own neighbor
+
+        # Top k without sorting the whole row, then sort just those k
+        top = np.argpartition(-corr, k - 1, axis=1)[:, :k]
+        top_corr = np.take_along_axis(corr, top, axis=1)
+        order = np.argsort(-top_corr, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_corr = np.take_along_axis(top_corr, order, axis=1)
+
+        valid = np.isfinite(top_corr)
+        neighbors[start:stop] = np.where(valid, top, -1)
+        correlations[start:stop] = np.where(valid, top_corr, np.nan)
+    return tickers, neighbors, correlations
+
+
+def build_index(parquet_path, out_path=DEFAULT_INDEX_PATH, k=20, lookback=756,
+                block_size=512, min_overlap=60):
+    """Compute the index from a dataset and write it atomically to out_path."""
+    started = time.time()
+    returns = daily_returns(parquet_path, lookback)
+    tickers, neighbors, correlations = top_k_correlations(returns, k, block_size, min_overlap)
+    meta = {
+        'builtAt': pd.Timestamp.now().isoformat(),
+        'asOf': returns.index[-1].isoformat() if len(returns) else None,
+        'datasetVersion': dataset_version(parquet_path),
+        'lookbackDays': int(len(returns)),
+        'k': int(neighbors.shape[1]),
+        'minOverlap': int(min_overlap),
+        'seconds': round(time.time() - started, 2),
+    }
+    tmp = out_path + '.tmp.npz'
+    np.savez(tmp, tickers=np.array(tickers, dtype=str), neighbors=neighbors,
+             correlations=correlations, meta=np.array(json.dumps(meta)))
+    os.replace(tmp, out_path)
+    return meta
+
+
+class CorrelationIndex:
+    """
+    Read side of the index: constant-time neighbor lookups.
+
+    Args:
+        tickers (list): row labels
+        neighbors (ndarray): [N, k] indices into tickers (-1 = none)
+        correlations (ndarray): [N, k] correlation with each neighbor
+        meta (dict): build metadata
+    """
+
+    def __init__(self, tickers, neighbors, correlations, meta):
+        self.tickers = list(tickers)
+        self.rows = {t: i for i, t in enumerate(self.tickers)}
+        self.neighbor_rows = neighbors
+        self.correlations = correlations
+        self.meta = meta
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['tickers'].tolist(), data['neighbors'], data['correlations'],
+                       json.loads(str(data['meta'])))
+
+    def __contains__(self, ticker):
+        return ticker.upper() in self.rows
+
+    def neighbors(self, ticker, n=10):
+        """
+        Most correlated tickers, highest first.
+
+        Raises:
+            KeyError: ticker not in the index
+        """
+        row = self.rows[ticker.upper()]
+        result = []
+        for j, corr in zip(self.neighbor_rows[row, :n], self.correlations[row, :n]):
+            if j < 0:
+                break
+            result.append({'ticker': self.tickers[j], 'correlation': round(float(corr), 4)})
+        return result
+
+
+class CorrelationIndexFile:
+    """
+    A CorrelationIndex loaded from disk and reloaded when the file changes.
+
+    The file's mtime is checked at most every `check_interval` seconds, so
+    lookups stay constant-time while a rebuilt index is picked up without a
+    restart.
+    """
+
+    def __init__(self, path, check_interval=30.0):
+        self.path = path
+        self.check_interval = float(check_interval)
+        self._index = None
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current index, or None if the file has not been built yet."""
+        now = time.monotonic()
+        if self._index is not None and now - self._checked < self.check_interval:
+            return self._index
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return self._index
+            if mtime != self._mtime:
+                self._index = CorrelationIndex.load(self.path)
+                self._mtime = mtime
+            return self._index
+
+    def stats(self):
+        index = self._index
+        if index is None:
+            return {'loaded': False, 'path': self.path}
+        return {'loaded': True, 'path': self.path, 'tickers': len(index.tickers), **index.meta}
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Build the top-k correlated tickers index.')
+    ap.add_argument('--parquet', default='./stock_data_since_2016.parquet',
+                    help='parquet file or bar_store directory')
+    ap.add_argument('--out', default=DEFAULT_INDEX_PATH)
+    ap.add_argument('--k', type=int, default=20, help='neighbors kept per ticker')
+    ap.add_argument('--lookback', type=int, default=756, help='trading days of returns')
+    ap.add_argument('--block_size', type=int, default=512, help='tickers per block')
+    ap.add_argument('--min_overlap', type=int, default=60, help='minimum common trading days')
+    ap.add_argument('--show', default=None, help='print the neighbors of this ticker afterwards')
+    args = ap.parse_args()
+
+    meta = build_index(args.parquet, args.out, args.k, args.lookback, args.block_size, args.min_overlap)
+    print(json.dumps(meta, indent=2))
+    if args.show:
+        for entry in CorrelationIndex.load(args.out).neighbors(args.show):
+            print(f"{entry['ticker']:<8}{entry['correlation']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,15 @@
 "use client";
 
-import { useState, useEffect } from 'react';
-import { getPortfolioData } from '../../lib/api';
+import { useState, useEffect, useRef } from 'react';
+import { getPortfolioData, subscribePrices } from '../../lib/api';
 import './IndexPerformance.css';
 
 export default function IndexPerformance() {
   const [indices, setIndices] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  // { version, epoch } of the last /api/portfolio response, for delta refreshes
+  const syncRef = useRef(null);
 
   const indexMapping = {
     'SPY': 'S&P 500',
@@ -16,6 +18,15 @@ export default function IndexPerformance() {
   };
 
   useEffect(() => {
+    const toIndex = (stock) => ({
+      name: indexMapping[stock.ticker],
+      ticker: stock.ticker,
+      price: stock.currentPrice,
+      previousClose: stock.previousClose,
+      change: ((stock.currentPrice - stock.previousClose) / stock.previousClose * 100),
+      volume: stock.volume
+    });
+
     const fetchIndices = async () => {
       setLoading(true);
       setError(null);
@@ -23,17 +34,8 @@ export default function IndexPerformance() {
       try {
         // Fetch all indices in one request
         const data = await getPortfolioData(['SPY', 'QQQ', 'DIA']);
-        
-        // Transform the data
-        const indexData = data.portfolio.map(stock => ({
-          name: indexMapping[stock.ticker],
-          ticker: stock.ticker,
-          price: stock.currentPrice,
-          change: ((stock.currentPrice - stock.previousClose) / stock.previousClose * 100),
-          volume: stock.volume
-        }));
-        
-        setIndices(indexData);
+        syncRef.current = { version: data.version, epoch: data.epoch };
+        setIndices(data.portfolio.map(toIndex));
       } catch (err) {
         setError('Failed to fetch index data');
         console.error(err);
@@ -42,7 +44,48 @@ export default function IndexPerformance() {
       }
     };
 
+    // Periodic refresh of the full entries (previous close, volume), asking
+    // only for what changed since the last response
+    const refreshIndices = async () => {
+      try {
+        const data = await getPortfolioData(['SPY', 'QQQ', 'DIA'], syncRef.current);
+        syncRef.current = { version: data.version, epoch: data.epoch };
+        const updated = data.portfolio.map(toIndex);
+        const unavailable = new Set(data.unavailable || []);
+        if (!data.delta) {
+          setIndices(updated);
+        } else if (updated.length > 0 || unavailable.size > 0) {
+          // Replace changed rows, drop the ones the server has no data for now,
+          // and add back rows that were dropped earlier and have data again
+          const byTicker = Object.fromEntries(updated.map(index => [index.ticker, index]));
+          setIndices(current => {
+            const kept = current.filter(index => !unavailable.has(index.ticker));
+            const known = new Set(kept.map(index => index.ticker));
+            return [...kept.map(index => byTicker[index.ticker] || index),
+                    ...updated.filter(index => !known.has(index.ticker))];
+          });
+        }
+      } catch (err) {
+        console.error(err);
+      }
+    };
+
     fetchIndices();
+    const interval = setInterval(refreshIndices, 60000);
+
+    // Live updates pushed by the server instead of polling
+    const unsubscribe = subscribePrices(Object.keys(indexMapping), (update) => {
+      setIndices(current => current.map(index => index.ticker !== update.symbol ? index : {
+        ...index,
+        price: update.price,
+        change: ((update.price - index.previousClose) / index.previousClose * 100)
+      }));
+    });
+
+    return () => {
+      clearInterval(interval);
+      unsubscribe();
+    };
   }, []);
 
   if (loading) {
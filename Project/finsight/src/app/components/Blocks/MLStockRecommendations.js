@@ -20,7 +20,7 @@ export default function MLStockRecommendations() {
       try {
         // Fetch forecast data for all stocks in parallel
         const promises = stocksToAnalyze.map(ticker =>
-          getDetailedForecast(ticker, 5, 10) // 5 day forecast
+          getDetailedForecast(ticker, 5) // 5 day forecast, tuned lags
             .catch(err => {
               console.log(`Skipping ${ticker}: ${err.message}`);
               return null; // Return null for failed requests
@@ -34,7 +34,7 @@ export default function PortfolioPerformance() {
         if (selectedTicker === "PORTFOLIO") {
           // Fetch data for all portfolio stocks
           const promises = portfolioStocks.map(ticker =>
-            getDetailedForecast(ticker, horizon, 10).catch(err => {
+            getDetailedForecast(ticker, horizon).catch(err => {
               console.log(`Skipping ${ticker}: ${err.message}`);
               return null;
             })
@@ -85,7 +85,7 @@ export default function PortfolioPerformance() {
 
         } else {
           // Fetch data for single stock
-          const forecast = await getDetailedForecast(selectedTicker, horizon, 10);
+          const forecast = await getDetailedForecast(selectedTicker, horizon);
 
           // Transform forecast data for the chart
           const transformedData = forecast.forecast.map((item) => {
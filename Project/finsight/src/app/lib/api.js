@@ -17,34 +17,79 @@ export const checkHealth = async () => {
 };
 
 // ============ STOCK DATA & PREDICTION ============
+// GET endpoints are cached server-side and send an ETag, so the browser
+// revalidates repeat requests and gets a bodyless 304 when nothing changed.
 export const getStockPrediction = async (ticker) => {
-  const response = await api.post('/api/stock/predict', { ticker });
+  const response = await api.get('/api/stock/predict', { params: { ticker } });
   return response.data;
 };
 
 // ============ DETAILED FORECAST ============
-export const getDetailedForecast = async (ticker, horizon = 20, lags = 10) => {
-  const response = await api.post('/api/stock/forecast', {
-    ticker,
-    horizon,
-    lags
+// Without lags the server uses the per-ticker settings tuned offline.
+export const getDetailedForecast = async (ticker, horizon = 20, lags = null) => {
+  const response = await api.get('/api/stock/forecast', {
+    params: { ticker, horizon, ...(lags ? { lags } : {}) }
   });
   return response.data;
 };
 
+// ============ COMBINED SIGNAL ============
+// Quote, forecast and news sentiment in one request, computed concurrently
+// on the server and blended into signal.score / signal.label.
+export const getStockSignal = async (ticker, horizon = 20, budgetMs = null) => {
+  const response = await api.post('/api/stock/signal', {
+    ticker, horizon, ...(budgetMs ? { budgetMs } : {})
+  });
+  return response.data;
+};
+
+// ============ TICKER SEARCH ============
+// Autocomplete over the symbols the forecast model has data for.
+// Each result is { symbol, name, match } (match: exact, prefix, name or fuzzy).
+export const searchTickers = async (query, limit = 10) => {
+  const response = await api.get('/api/tickers/search', { params: { q: query, limit } });
+  return response.data.results;
+};
+
 // ============ NEWS SENTIMENT ============
-export const getNewsSentiment = async (ticker, keyword = null) => {
-  const response = await api.post('/api/news/sentiment', {
-    ticker,
-    keyword: keyword || ticker
+// budgetMs (optional) asks the server for a best-effort answer within that many
+// milliseconds; check `partial` in the response to see if it was cut short.
+export const getNewsSentiment = async (ticker, keyword = null, budgetMs = null) => {
+  const response = await api.get('/api/news/sentiment', {
+    params: {
+      ticker,
+      keyword: keyword || ticker,
+      ...(budgetMs ? { budgetMs } : {})
+    }
   });
   return response.data;
 };
 
 // ============ PORTFOLIO ============
-export const getPortfolioData = async (tickers) => {
-  const response = await api.post('/api/portfolio', { tickers });
+// Pass the { version, epoch } of the previous response as `since` to get only
+// the tickers whose data changed (response.delta === true). When delta is
+// false the response holds the full list and replaces what the caller has.
+export const getPortfolioData = async (tickers, since = null) => {
+  const response = await api.post('/api/portfolio', {
+    tickers,
+    ...(since ? { sinceVersion: since.version, epoch: since.epoch } : {})
+  });
   return response.data;
 };
 
+// ============ LIVE PRICES ============
+// Opens a Server-Sent Events stream; the server polls each symbol once and
+// pushes every price change to all subscribers. onPrice receives
+// { symbol, price, volume, asOf }. Returns a function that closes the stream.
+// EventSource reconnects by itself after network errors.
+export const subscribePrices = (symbols, onPrice, onError = null) => {
+  const url = `${API_BASE_URL}/api/stream/prices?symbols=${encodeURIComponent(symbols.join(','))}`;
+  const source = new EventSource(url);
+  source.addEventListener('price', (event) => onPrice(JSON.parse(event.data)));
+  if (onError) {
+    source.onerror = onError;
+  }
+  return () => source.close();
+};
+
 export default api;
\ No newline at end of file
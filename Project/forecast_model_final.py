@@ -3,7 +3,12 @@
 
 import argparse
 import json
-from typing import Dict, Any, List
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -14,10 +19,16 @@ from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import mean_squared_error
 
+from bar_store import BarStore, is_bar_store
+from ticker_index import TickerIndex, dataset_symbols
+
 
 def load_and_prepare(parquet_path: str) -> pd.DataFrame:
-    """Load parquet data and normalize key columns."""
-    df = pd.read_parquet(parquet_path)
+    """Load parquet data (a single file or a bar_store directory) and normalize key columns."""
+    if is_bar_store(parquet_path):
+        df = BarStore(parquet_path).read(timeframe="1Day")
+    else:
+        df = pd.read_parquet(parquet_path)
     df.columns = [str(c).strip().lower() for c in df.columns]
     if "timestamp" in df.columns:
         df = df.rename(columns={"timestamp": "date"})
@@ -32,6 +43,73 @@ def load_and_prepare(parquet_path: str) -> pd.DataFrame:
     return df
 
 
+# Prepared datasets split by ticker, keyed by parquet path.
+# Each entry remembers the dataset version so an updated file or store is reloaded.
+_DATASETS: Dict[str, Tuple[float, Dict[str, pd.DataFrame]]] = {}
+# Reads in progress, keyed by parquet path: concurrent callers wait on the same
+# read instead of repeating it, and the lock is only held to swap entries.
+_DATASET_LOADS: Dict[str, Tuple[float, Future]] = {}
+_DATASETS_LOCK = threading.Lock()
+
+
+def load_dataset(parquet_path: str) -> Dict[str, pd.DataFrame]:
+    """Load the parquet once and split it by ticker (cached until the data changes)."""
+    key = os.path.abspath(parquet_path)
+    version = dataset_version(parquet_path)
+    with _DATASETS_LOCK:
+        cached = _DATASETS.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        pending = _DATASET_LOADS.get(key)
+        if pending is not None and pending[0] == version:
+            future, owner = pending[1], False
+        else:
+            future, owner = Future(), True
+            _DATASET_LOADS[key] = (version, future)
+    if not owner:
+        return future.result()
+    try:
+        df = load_and_prepare(parquet_path)
+        groups = {str(t): g.reset_index(drop=True) for t, g in df.groupby("ticker", sort=True)}
+    except BaseException as e:
+        with _DATASETS_LOCK:
+            if _DATASET_LOADS.get(key, (None, None))[1] is future:
+                del _DATASET_LOADS[key]
+        future.set_exception(e)
+        raise
+    with _DATASETS_LOCK:
+        _DATASETS[key] = (version, groups)
+        if _DATASET_LOADS.get(key, (None, None))[1] is future:
+            del _DATASET_LOADS[key]
+    future.set_result(groups)
+    return groups
+
+
+def dataset_version(parquet_path: str) -> float:
+    """Modification time of the dataset, used to key caches derived from it."""
+    if is_bar_store(parquet_path):
+        return BarStore(parquet_path).version("1Day")
+    return os.path.getmtime(os.path.abspath(parquet_path))
+
+
+# Ticker indexes keyed by parquet path, rebuilt when the dataset version changes.
+_TICKER_INDEXES: Dict[str, Tuple[float, TickerIndex]] = {}
+
+
+def load_ticker_index(parquet_path: str) -> TickerIndex:
+    """Sorted symbol index of the dataset (reads only the symbol column; cached)."""
+    key = os.path.abspath(parquet_path)
+    version = dataset_version(parquet_path)
+    with _DATASETS_LOCK:
+        cached = _TICKER_INDEXES.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    index = TickerIndex(dataset_symbols(parquet_path))
+    with _DATASETS_LOCK:
+        _TICKER_INDEXES[key] = (version, index)
+    return index
+
+
 def make_supervised(series: pd.Series, n_lags: int):
     """Convert close series into supervised learning format."""
     df = pd.DataFrame({"y": series.values})
@@ -50,6 +128,14 @@ def fit_pipe(X, y) -> Pipeline:
     return pipe
 
 
+def linear_coefficients(pipe: Pipeline) -> Tuple[np.ndarray, float]:
+    """Scaler + regression folded into one affine map: predict(X) == X @ w + b."""
+    scaler, lr = pipe.named_steps["scaler"], pipe.named_steps["lr"]
+    w = lr.coef_ / scaler.scale_
+    b = float(lr.intercept_ - np.dot(w, scaler.mean_))
+    return w, b
+
+
 def forecast_recursive(last_values: np.ndarray, model: Pipeline, n_steps: int) -> np.ndarray:
     """Generate multi-step forecasts recursively."""
     preds: List[float] = []
@@ -77,14 +163,133 @@ def backtest_rmse(close: pd.Series, n_lags: int, n_splits: int = 5) -> float:
     return float(np.mean(rmses)) if len(rmses) else 0.0
 
 
-def evaluate_decision(last_close: float, y_pred: np.ndarray, rmse_day: float, horizon: int) -> Dict[str, Any]:
-    """Generate a simple trading decision report."""
+# Fitted pipelines, backtest RMSE and in-sample residuals per (dataset, ticker, lags, per_rows).
+# Fitting is cheap next to the 5-fold backtest, but both are skipped on a hit.
+MODEL_CACHE_SIZE = 256
+_MODELS: "OrderedDict[tuple, Tuple[Pipeline, float, np.ndarray]]" = OrderedDict()
+_MODELS_LOCK = threading.Lock()
+
+
+def fit_cached(key: tuple, close: pd.Series, n_lags: int) -> Tuple[Pipeline, float, np.ndarray]:
+    """Return (fitted pipeline, backtest RMSE, residuals) for a close series, fitting on a miss."""
+    with _MODELS_LOCK:
+        hit = _MODELS.get(key)
+        if hit is not None:
+            _MODELS.move_to_end(key)
+            return hit
+    X, y = make_supervised(close, n_lags)
+    pipe = fit_pipe(X, y)
+    rmse_day = backtest_rmse(close, n_lags)
+    residuals = (y - pipe.predict(X)).astype(np.float32)
+    with _MODELS_LOCK:
+        _MODELS[key] = (pipe, rmse_day, residuals)
+        while len(_MODELS) > MODEL_CACHE_SIZE:
+            _MODELS.popitem(last=False)
+    return pipe, rmse_day, residuals
+
+
+def model_cache_size() -> int:
+    with _MODELS_LOCK:
+        return len(_MODELS)
+
+
+# Per-ticker settings written by hyperparam_sweep.py, used when run_forecast()
+# is called without lags/per_rows. Defaults apply to tickers it doesn't cover.
+DEFAULT_LAGS = 10
+DEFAULT_PER_ROWS = 5000
+FORECAST_PARAMS_PATH = os.environ.get("FINSIGHT_FORECAST_PARAMS", "forecast_params.json")
+_PARAMS: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def load_forecast_params(path: str = FORECAST_PARAMS_PATH) -> Dict[str, Any]:
+    """Sweep results by ticker ({} if the file doesn't exist; reloaded when it changes)."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _PARAMS.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            cached = (mtime, json.load(f).get("tickers", {}))
+        _PARAMS[path] = cached
+    return cached[1]
+
+
+def tuned_params(ticker: str, horizon: int, path: str = FORECAST_PARAMS_PATH) -> Optional[Dict[str, Any]]:
+    """Best {lags, per_rows, ...} for a ticker at the closest tuned horizon, or None."""
+    by_horizon = load_forecast_params(path).get(ticker, {}).get("horizons", {})
+    if not by_horizon:
+        return None
+    closest = min(by_horizon, key=lambda h: abs(int(h) - horizon))
+    return by_horizon[closest]
+
+
+def simulate_paths(last_values: np.ndarray, model: Pipeline, residuals: np.ndarray, n_steps: int,
+                   n_paths: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Forecast paths [n_paths, n_steps] by bootstrapping residuals through the AR recurrence.
+
+    Same recursion as forecast_recursive(), for all paths at once: each step
+    adds a resampled in-sample residual and feeds the result back as a lag.
+    """
+    w, b = linear_coefficients(model)
+    n_lags = len(last_values)
+    # Laid out like forecast_recursive()'s buf: the features of step s are
+    # columns s .. s+n_lags-1, reversed
+    buf = np.empty((n_paths, n_lags + n_steps))
+    buf[:, :n_lags] = np.asarray(last_values, dtype=float)
+    shocks = residuals[rng.integers(0, len(residuals), size=(n_paths, n_steps))]
+    w_rev = w[::-1]
+    for step in range(n_steps):
+        buf[:, n_lags + step] = buf[:, step:step + n_lags] @ w_rev + b + shocks[:, step]
+    return buf[:, n_lags:]
+
+
+# Percentiles reported for the simulated bands and distributions
+SIM_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def summarize_paths(paths: np.ndarray, last_close: float) -> Dict[str, Any]:
+    """Percentile bands per step, terminal return and max drawdown distributions."""
+    bands = np.percentile(paths, SIM_PERCENTILES, axis=0)
+    terminal = paths[:, -1] / last_close - 1.0
+    prices = np.column_stack([np.full(len(paths), last_close), paths])
+    peak = np.maximum.accumulate(prices, axis=1)
+    max_dd = ((peak - prices) / peak).max(axis=1)
+    return {
+        "paths": int(len(paths)),
+        "bands": {f"p{p}": band.tolist() for p, band in zip(SIM_PERCENTILES, bands)},
+        "terminal_return": {
+            "mean": float(terminal.mean()),
+            "std": float(terminal.std()),
+            "prob_gain": float((terminal > 0).mean()),
+            **{f"p{p}": float(v) for p, v in zip(SIM_PERCENTILES, np.percentile(terminal, SIM_PERCENTILES))},
+        },
+        "max_drawdown": {
+            "mean": float(max_dd.mean()),
+            **{f"p{p}": float(v) for p, v in zip(SIM_PERCENTILES, np.percentile(max_dd, SIM_PERCENTILES))},
+        },
+    }
+
+
+def evaluate_decision(last_close: float, y_pred: np.ndarray, rmse_day: float, horizon: int,
+                      simulation: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Generate a simple trading decision report.
+
+    With a simulation (summarize_paths()), uncertainty is the std of the
+    simulated horizon return and the drawdown test uses the median path
+    drawdown, instead of sqrt(horizon) * rmse_day and the single predicted path.
+    """
     R_h = float(y_pred[-1] / last_close - 1.0)
-    uncert = float(np.sqrt(horizon) * rmse_day / last_close) if last_close > 0 else 0.0
+    if simulation is not None:
+        uncert = simulation["terminal_return"]["std"]
+        max_dd_pred = simulation["max_drawdown"]["p50"]
+    else:
+        uncert = float(np.sqrt(horizon) * rmse_day / last_close) if last_close > 0 else 0.0
+        s = pd.Series(y_pred)
+        dd = (s.cummax() - s) / s.cummax()
+        max_dd_pred = float(dd.max()) if len(s) else 0.0
     slope = float(np.polyfit(np.arange(len(y_pred)), y_pred, 1)[0])
-    s = pd.Series(y_pred)
-    dd = (s.cummax() - s) / s.cummax()
-    max_dd_pred = float(dd.max()) if len(s) else 0.0
 
     cond1 = R_h > 2 * uncert
     cond2 = (slope > 0) and (R_h > 0.03)
@@ -111,18 +316,39 @@ def evaluate_decision(last_close: float, y_pred: np.ndarray, rmse_day: float, ho
 def run_forecast(
     ticker: str,
     parquet_path: str = "./stock_data_since_2016.parquet",
-    lags: int = 10,
+    lags: Optional[int] = None,
     horizon: int = 20,
-    per_rows: int = 5000,
+    per_rows: Optional[int] = None,
+    params_path: str = FORECAST_PARAMS_PATH,
+    simulate: int = 0,
+    seed: Optional[int] = None,
 ) -> Dict[str, Any]:
-    """Main callable function for API/frontend use."""
-    df = load_and_prepare(parquet_path)
-
-    if ticker not in set(df["ticker"].unique()):
-        sample = df["ticker"].drop_duplicates().head(20).tolist()
-        raise ValueError(f"ticker '{ticker}' not found. sample: {sample}")
-
-    g = df[df["ticker"] == ticker].copy()
+    """Main callable function for API/frontend use.
+
+    With lags and per_rows both None, both come from the sweep results
+    (hyperparam_sweep.py) for this ticker and horizon ("tuned": True). The two
+    were tuned together, so when only one is given the other is
+    DEFAULT_LAGS/DEFAULT_PER_ROWS and the result is not tuned.
+
+    simulate > 0 adds a Monte Carlo "simulation" (that many bootstrapped
+    paths, see summarize_paths()) and bases the decision on it. The default
+    seed depends on the ticker and last date, so repeated calls agree.
+    """
+    index = load_ticker_index(parquet_path)
+    if ticker not in index:
+        suggestions = index.suggest(ticker)
+        hint = f" did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        raise ValueError(f"ticker '{ticker}' not found.{hint}")
+
+    tuned = tuned_params(ticker, horizon, params_path) if lags is None and per_rows is None else None
+    if lags is None:
+        lags = int(tuned["lags"]) if tuned else DEFAULT_LAGS
+    if per_rows is None:
+        per_rows = int(tuned["per_rows"]) if tuned else DEFAULT_PER_ROWS
+
+    groups = load_dataset(parquet_path)
+
+    g = groups[ticker]
     if per_rows and per_rows > 0:
         g = g.tail(per_rows)
 
@@ -130,8 +356,8 @@ def run_forecast(
     if len(close) <= lags + 5:
         raise ValueError("not enough history for the chosen lags.")
 
-    X, y = make_supervised(close, lags)
-    pipe = fit_pipe(X, y)
+    key = (os.path.abspath(parquet_path), dataset_version(parquet_path), ticker, lags, per_rows)
+    pipe, rmse_day, residuals = fit_cached(key, close, lags)
 
     last_lags = close.tail(lags).values[::-1]
     preds = forecast_recursive(last_lags, pipe, horizon)
@@ -139,8 +365,14 @@ def run_forecast(
     last_date = pd.to_datetime(g["date"].iloc[-1]).normalize()
     future_dates = pd.bdate_range(last_date + pd.Timedelta(days=1), periods=horizon)
 
-    rmse_day = backtest_rmse(close, lags)
-    decision_report = evaluate_decision(float(close.iloc[-1]), preds, rmse_day, horizon)
+    simulation = None
+    if simulate > 0:
+        if seed is None:
+            seed = zlib.crc32(f"{ticker}:{last_date.date()}".encode())
+        paths = simulate_paths(last_lags, pipe, residuals, horizon, simulate, np.random.default_rng(seed))
+        simulation = summarize_paths(paths, float(close.iloc[-1]))
+
+    decision_report = evaluate_decision(float(close.iloc[-1]), preds, rmse_day, horizon, simulation)
 
     forecast_list = [
         {
@@ -157,18 +389,23 @@ def run_forecast(
         "pred_last": float(preds[-1]),
         "horizon": horizon,
         "lags": lags,
+        "per_rows": per_rows,
+        "tuned": tuned is not None,
         "forecast": forecast_list,
         "decision": decision_report,
+        **({"simulation": simulation} if simulation is not None else {}),
     }
 
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--ticker", required=True)
-    ap.add_argument("--parquet", default="./stock_data_since_2016.parquet")
-    ap.add_argument("--lags", type=int, default=10)
+    ap.add_argument("--parquet", default="./stock_data_since_2016.parquet",
+                    help="parquet file or bar_store directory")
+    ap.add_argument("--lags", type=int, default=None, help="default: tuned, else 10")
     ap.add_argument("--horizon", type=int, default=20)
-    ap.add_argument("--per_rows", type=int, default=5000)
+    ap.add_argument("--per_rows", type=int, default=None, help="default: tuned, else 5000")
+    ap.add_argument("--simulate", type=int, default=0, help="Monte Carlo paths (0 = off)")
     ap.add_argument("--out_csv", default=None)
     ap.add_argument("--save_decision_json", default=None)
     ap.add_argument("--no_plot", action="store_true")
@@ -180,6 +417,7 @@ def main():
         lags=args.lags,
         horizon=args.horizon,
         per_rows=args.per_rows,
+        simulate=args.simulate,
     )
 
     import os
@@ -0,0 +1,23 @@
+# Gunicorn configuration for production serving
+#     gunicorn -c gunicorn.conf.py
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('FINSIGHT_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('FINSIGHT_WORKERS', 4))
+threads = int(os.environ.get('FINSIGHT_THREADS', 4))
+
+# Import wsgi.py (and warm everything up) once in the master, then fork.
+# Workers start with the models and dataset already in memory.
+preload_app = True
+
+# Warm-up can take a while on a cold machine (model download, parquet read)
+timeout = int(os.environ.get('FINSIGHT_TIMEOUT', 120))
+
+
+def post_fork(server, worker):
+    # FINSIGHT_PRELOAD=background: the master skipped the warm-up (wsgi.py),
+    # so each worker warms up in its own thread and reports 503 until ready
+    if os.environ.get('FINSIGHT_PRELOAD', '').lower() == 'background':
+        import server as finsight
+        finsight.start_background_warm_up()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-ticker hyperparameter sweep for the forecast model.
+
+Evaluates a grid of lags x per_rows x horizon for every ticker with the
+time-series cross-validation of backtest_rmse(), extended to multi-step
+recursive forecasts: the score for horizon h is the RMSE of the 1..h step
+ahead predictions, averaged over the steps (for h = 1 it is exactly
+backtest_rmse()). The best (lags, per_rows) per ticker and horizon is written
+to a JSON file that run_forecast() picks up when lags/per_rows are not given.
+
+- the lag matrix is built once per ticker at the largest lag and window;
+  every (lags, per_rows) combination is a slice of it
+- one fit per (lags, per_rows, fold) serves all horizons
+- tickers are spread over a process pool; each worker loads the dataset once
+
+Example:
+    python hyperparam_sweep.py --parquet stock_data_since_2016.parquet \\
+        --lags 5,10,15,20,30 --per_rows 500,1000,2000,5000 --horizons 5,20 \\
+        --workers 8 --out forecast_params.json
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from sklearn.model_selection import TimeSeriesSplit
+
+from forecast_model_final import (
+    DEFAULT_LAGS,
+    DEFAULT_PER_ROWS,
+    FORECAST_PARAMS_PATH,
+    dataset_version,
+    fit_pipe,
+    linear_coefficients,
+    load_dataset,
+)
+
+
+def lag_matrix(close: np.ndarray, max_lag: int) -> np.ndarray:
+    """Row t holds close[t-1], ..., close[t-max_lag] (NaN before the series starts)."""
+    n = len(close)
+    m = np.full((n, max_lag), np.nan)
+    for k in range(1, min(max_lag, n - 1) + 1):
+        m[k:, k - 1] = close[:-k]
+    return m
+
+
+def recursive_cv_rmse(X: np.ndarray, y: np.ndarray, max_horizon: int, n_splits: int = 5) -> np.ndarray:
+    """
+    RMSE of the 1..max_horizon step recursive forecasts, averaged over CV folds.
+
+    Every test row is a forecast origin; all origins of a fold are rolled
+    forward together, feeding predictions back in as lags. The fitted
+    pipeline is applied through its affine form (same predictions, without
+    sklearn's per-call overhead).
+    """
+    sums = np.zeros(max_horizon)
+    folds = 0
+    for tr, te in TimeSeriesSplit(n_splits=n_splits).split(X):
+        w, b = linear_coefficients(fit_pipe(X[tr], y[tr]))
+        window = X[te].copy()
+        actual = y[te]
+        rmse = np.empty(max_horizon)
+        for step in range(max_horizon):
+            live = len(te) - step  # origins whose target is still inside the fold
+            if live <= 0:
+                rmse[step:] = rmse[step - 1]
+                break
+            pred = window[:live] @ w + b
+            rmse[step] = np.sqrt(np.mean((pred - actual[step:]) ** 2))
+            window = np.column_stack([pred, window[:live, :-1]])
+        sums += rmse
+        folds += 1
+    return sums / max(folds, 1)
+
+
+def sweep_series(close: np.ndarray, lags_grid: List[int], rows_grid: List[int],
+                 horizons: List[int], n_splits: int = 5) -> List[Dict]:
+    """Score every grid point for one close series."""
+    max_lag, max_h = max(lags_grid), max(horizons)
+    close = np.asarray(close, dtype=float)[-max(rows_grid):]
+    lags_all = lag_matrix(close, max_lag)  # built once, sliced below
+    rows = []
+    for per_rows in rows_grid:
+        start = len(close) - min(per_rows, len(close))
+        for n_lags in lags_grid:
+            X, y = lags_all[start + n_lags:, :n_lags], close[start + n_lags:]
+            if len(X) < max(10, n_splits + 5) + max_h:
+                continue
+            step_rmse = recursive_cv_rmse(X, y, max_h, n_splits)
+            for h in horizons:
+                rows.append({"lags": n_lags, "per_rows": per_rows, "horizon": h,
+                             "rmse": float(step_rmse[:h].mean())})
+    return rows
+
+
+def best_params(rows: List[Dict], horizons: List[int]) -> Dict[str, Dict]:
+    """Lowest-RMSE (lags, per_rows) per horizon, with the default settings' RMSE for reference."""
+    best = {}
+    for h in horizons:
+        candidates = [r for r in rows if r["horizon"] == h]
+        if not candidates:
+            continue
+        top = min(candidates, key=lambda r: r["rmse"])
+        default = next((r["rmse"] for r in candidates
+                        if r["lags"] == DEFAULT_LAGS and r["per_rows"] == DEFAULT_PER_ROWS), None)
+        best[str(h)] = {"lags": top["lags"], "per_rows": top["per_rows"],
+                        "rmse": round(top["rmse"], 6),
+                        "default_rmse": round(default, 6) if default is not None else None}
+    return best
+
+
+# ----- process pool -----
+
+_WORKER: Dict[str, object] = {}
+
+
+def _init_worker(parquet_path: str, lags_grid, rows_grid, horizons, n_splits) -> None:
+    _WORKER.update(groups=load_dataset(parquet_path), lags_grid=lags_grid, rows_grid=rows_grid,
+                   horizons=horizons, n_splits=n_splits)
+
+
+def _sweep_ticker(ticker: str):
+    close = _WORKER["groups"][ticker]["close"].to_numpy(dtype=float)
+    try:
+        rows = sweep_series(close, _WORKER["lags_grid"], _WORKER["rows_grid"],
+                            _WORKER["horizons"], _WORKER["n_splits"])
+    except Exception as e:  # one bad series shouldn't stop the sweep
+        return ticker, {}, str(e)
+    return ticker, best_params(rows, _WORKER["horizons"]), None
+
+
+def run_sweep(parquet_path: str, lags_grid: List[int], rows_grid: List[int], horizons: List[int],
+              tickers: Optional[List[str]] = None, workers: Optional[int] = None,
+              n_splits: int = 5) -> Dict:
+    """Sweep every ticker (or the given ones) and return the params document."""
+    started = time.time()
+    groups = load_dataset(parquet_path)
+    tickers = sorted(groups) if not tickers else [t for t in tickers if t in groups]
+    # Always score the current defaults so the file shows what tuning gained
+    lags_grid = sorted(set(lags_grid) | {DEFAULT_LAGS})
+    rows_grid = sorted(set(rows_grid) | {DEFAULT_PER_ROWS})
+    horizons = sorted(set(horizons))
+
+    results, errors = {}, {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(parquet_path, lags_grid, rows_grid, horizons, n_splits)) as pool:
+        for ticker, best, error in pool.map(_sweep_ticker, tickers, chunksize=4):
+            if error:
+                errors[ticker] = error
+            elif best:
+                results[ticker] = {"horizons": best}
+
+    return {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parquet": os.path.abspath(parquet_path),
+        "dataset_version": dataset_version(parquet_path),
+        "metric": "mean RMSE of 1..h step recursive forecasts, time-series CV",
+        "grid": {"lags": lags_grid, "per_rows": rows_grid, "horizons": horizons, "n_splits": n_splits},
+        "seconds": round(time.time() - started, 1),
+        "tickers": results,
+        "errors": errors,
+    }
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Tune lags/per_rows per ticker and horizon.")
+    ap.add_argument("--parquet", default="./stock_data_since_2016.parquet",
+                    help="parquet file or bar_store directory")
+    ap.add_argument("--lags", type=_int_list, default=[5, 10, 15, 20, 30])
+    ap.add_argument("--per_rows", type=_int_list, default=[500, 1000, 2000, 5000])
+    ap.add_argument("--horizons", type=_int_list, default=[5, 20],
+                    help="horizons to tune for (the server uses 5 for predict, 20 for forecast)")
+    ap.add_argument("--tickers", type=lambda s: [t.strip().upper() for t in s.split(",") if t.strip()],
+                    default=None, help="comma-separated subset (default: all)")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    ap.add_argument("--n_splits", type=int, default=5)
+    ap.add_argument("--out", default=FORECAST_PARAMS_PATH)
+    args = ap.parse_args()
+
+    doc = run_sweep(args.parquet, args.lags, args.per_rows, args.horizons,
+                    args.tickers, args.workers, args.n_splits)
+    tmp = args.out + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    os.replace(tmp, args.out)
+
+    gains = [(v["default_rmse"] - v["rmse"]) / v["default_rmse"]
+             for t in doc["tickers"].values() for v in t["horizons"].values()
+             if v["default_rmse"]]
+    print(f"Tuned {len(doc['tickers'])} tickers in {doc['seconds']}s "
+          f"({len(doc['errors'])} errors) -> {os.path.abspath(args.out)}")
+    if gains:
+        print(f"Median RMSE reduction vs lags={DEFAULT_LAGS}, per_rows={DEFAULT_PER_ROWS}: "
+              f"{np.median(gains):.1%}")
+
+
+if __name__ == "__main__":
+    main()
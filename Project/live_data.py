@@ -1,17 +1,32 @@
 #polling for crypto data every 30 seconds (no streaming support in free tier)
 from alpaca.data.historical import CryptoHistoricalDataClient
-from alpaca.data.requests import CryptoBarsRequest, CryptoQuoteRequest, CryptoTradesRequest
-from alpaca.data.timeframe import TimeFrame
-from datetime import datetime, timedelta
+from alpaca.data.requests import CryptoTradesRequest
+from datetime import datetime, timedelta, timezone
 import time
 
+from bar_aggregator import BarAggregator, append_to_store
+from bar_store import BarStore
+from ring_buffer import RecentBars
+
 # No API keys needed for crypto historical data
 client = CryptoHistoricalDataClient()
 
+# Seconds the aggregator waits for late trades before closing a bar
+WATERMARK_SECONDS = 5
+
+# Time of the newest trade seen so far. Trades can be published a little after
+# their timestamp, so each poll starts WATERMARK_SECONDS before it and drops the
+# trades it has already seen (a late trade older than that is too late for its
+# bar anyway)
+last_trade_time = datetime.now(timezone.utc) - timedelta(minutes=10)  # first poll: last 10 minutes
+OVERLAP = timedelta(seconds=WATERMARK_SECONDS)
+seen_trades = {}  # (symbol, trade id) -> timestamp, for the trades inside the overlap
+
 def get_recent_trades():
-    """Get recent trades (polling instead of streaming)"""
-    end = datetime.now()
-    start = end - timedelta(minutes=10)  # Last 10 minutes
+    """Get the trades since the previous poll (polling instead of streaming)"""
+    global last_trade_time
+    start = last_trade_time - OVERLAP
+    end = datetime.now(timezone.utc)
     
     request = CryptoTradesRequest(
         symbol_or_symbols=["BTC/USD", "ETH/USD"],
@@ -19,23 +34,41 @@ def get_recent_trades():
         end=end
     )
     
-    trades = client.get_crypto_trades(request)
-    return trades
+    trades = client.get_crypto_trades(request).df
+    if trades.empty:
+        return trades
+
+    # Drop trades already returned by the previous poll
+    symbols = trades.index.get_level_values('symbol')
+    timestamps = trades.index.get_level_values('timestamp')
+    keys = list(zip(symbols, trades['id'])) if 'id' in trades.columns \
+        else list(zip(symbols, timestamps, trades['price'], trades['size']))
+    new = [key not in seen_trades for key in keys]
+    for key, ts in zip(keys, timestamps):
+        seen_trades[key] = ts
+    for key in [k for k, ts in seen_trades.items() if ts < start]:
+        del seen_trades[key]
+
+    last_trade_time = max(last_trade_time, timestamps.max())
+    return trades[new]
+
+# Bars are built locally from the trades (1m and 5m, waiting 5 seconds for
+# late trades) instead of being requested from Alpaca a second time.
+# Finished bars go into the local bar store (see bar_store.py)
+store = BarStore("./bars")
+aggregator = BarAggregator(timeframes=("1m", "5m"), watermark_seconds=WATERMARK_SECONDS)
+
+# Last 24 hours of 1-minute bars per symbol in memory (fixed size, O(1) latest price)
+recent = RecentBars(capacity=1440)
 
 def get_recent_bars():
-    """Get recent price bars"""
-    end = datetime.now()
-    start = end - timedelta(hours=1)  # Last hour
-    
-    request = CryptoBarsRequest(
-        symbol_or_symbols=["BTC/USD", "ETH/USD"],
-        timeframe=TimeFrame.Minute,
-        start=start,
-        end=end
-    )
-    
-    bars = client.get_crypto_bars(request)
-    return bars
+    """Aggregate the new trades into bars. Returns {symbol: new 1-minute bars stored}"""
+    closed = aggregator.add_batch(get_recent_trades())
+    # Finished bars, then the bar still being built (it has the most recent price
+    # and is replaced in place until it closes)
+    recent.append_bars([bar for bar in closed if bar["timeframe"] == "1m"])
+    recent.append_bars(aggregator.open_bars("1m"))
+    return append_to_store(store, closed).get("1Min", {})
 
 # Poll for data every 30 seconds
 print("Polling for crypto data every 30 seconds...")
@@ -46,12 +79,15 @@ try:
         print(f"\n=== {datetime.now().strftime('%H:%M:%S')} ===")
         
         # Get and display recent bars
-        bars = get_recent_bars()
-        if not bars.df.empty:
-            latest_btc = bars.df.xs('BTC/USD', level='symbol').iloc[-1]
-            latest_eth = bars.df.xs('ETH/USD', level='symbol').iloc[-1]
-            print(f"BTC: ${latest_btc['close']:.2f}")
-            print(f"ETH: ${latest_eth['close']:.2f}")
+        new_rows = get_recent_bars()
+        latest_btc = recent.latest("BTC/USD")
+        latest_eth = recent.latest("ETH/USD")
+        if latest_btc is not None and latest_eth is not None:
+            # 15-minute average straight from the ring buffer (no copy, no DataFrame)
+            print(f"BTC: ${latest_btc.close:.2f} (15m avg ${recent.window('BTC/USD', 15).mean():.2f}, "
+                  f"+{new_rows.get('BTC/USD', 0)} bars)")
+            print(f"ETH: ${latest_eth.close:.2f} (15m avg ${recent.window('ETH/USD', 15).mean():.2f}, "
+                  f"+{new_rows.get('ETH/USD', 0)} bars)")
         else:
             print("No data received")
         
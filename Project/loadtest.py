@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load generator for the API server with per-endpoint latency reporting.
+
+Drives /api/stock/predict, /api/stock/forecast, /api/news/sentiment,
+/api/portfolio and /api/health with a weighted request mix. Tickers are
+drawn from a Zipf distribution over a fixed universe, so a few names get
+most of the traffic like on the real dashboard.
+
+By default the server is started as a subprocess against local stand-ins:
+the synthetic upstream provider (providers.py), the keyword sentiment stub
+and a generated price dataset covering the ticker universe. Nothing touches
+the network, so runs are repeatable and can be compared with each other.
+Pass --url to load an already running server instead.
+
+Example:
+    python loadtest.py --concurrency 32 --duration 30 \\
+        --mix predict=40,forecast=15,sentiment=20,portfolio=20,health=5 \\
+        --out_json loadtest.json
+
+The report has throughput, latency percentiles (p50/p95/p99/max) and error
+rate for every endpoint plus the totals. A request counts as an error if it
+fails to connect or returns a status of 400 or above.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+import pandas as pd
+
+ENDPOINTS = {
+    'predict': '/api/stock/predict',
+    'forecast': '/api/stock/forecast',
+    'sentiment': '/api/news/sentiment',
+    'portfolio': '/api/portfolio',
+    'health': '/api/health',
+}
+
+DEFAULT_MIX = 'predict=40,forecast=15,sentiment=20,portfolio=20,health=5'
+
+
+def parse_mix(text):
+    """Parse 'predict=40,forecast=15,...' into {endpoint: weight}."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint '{name}' (expected one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not any(w > 0 for w in mix.values()):
+        raise ValueError('request mix needs at least one positive weight')
+    return mix
+
+
+def make_universe(n):
+    """Ticker names T0000, T0001, ... (T0000 is the most popular)."""
+    return [f'T{i:04d}' for i in range(n)]
+
+
+def zipf_weights(n, s):
+    """Probability of each rank under a Zipf law with exponent s."""
+    ranks = np.arange(1, n + 1, dtype=float)
+    weights = ranks ** -s
+    return weights / weights.sum()
+
+
+def write_synthetic_dataset(path, tickers, days=1500, seed=0):
+    """Write a price parquet in the same layout as stock_data_since_2016.parquet."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=days)
+    frames = []
+    for ticker in tickers:
+        close = rng.uniform(20, 500) * np.exp(np.cumsum(rng.normal(0.0004, 0.015, size=days)))
+        frames.append(pd.DataFrame({
+            'timestamp': dates,
+            'symbol': ticker,
+            'open': close * 0.998,
+            'high': close * 1.01,
+            'low': close * 0.99,
+            'close': close,
+            'volume': rng.integers(1_000_000, 20_000_000, size=days),
+        }))
+    pd.concat(frames, ignore_index=True).to_parquet(path, index=False)
+
+
+# ============================================================================
+# SERVER UNDER TEST
+# ============================================================================
+
+def wait_until_up(host, port, timeout=120.0):
+    """Poll /api/health until the server answers (any status: it may still be warming up)."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/api/health')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f'server on {host}:{port} did not come up')
+
+
+def start_server(args, workdir, port):
+    """Start the server on the local stand-ins and return the process."""
+    parquet_path = os.path.join(workdir, 'loadtest_prices.parquet')
+    write_synthetic_dataset(parquet_path, make_universe(args.tickers), seed=args.seed)
+
+    env = dict(
+        os.environ,
+        FINSIGHT_PROVIDER='synthetic',
+        FINSIGHT_REPLAY_LATENCY_MS=str(args.latency_ms),
+        FINSIGHT_SENTIMENT_MODEL='stub',
+        FINSIGHT_SENTIMENT_LATENCY_MS=str(args.sentiment_latency_ms),
+        FINSIGHT_PARQUET_PATH=parquet_path,
+        UPSTREAM_RATE_LIMIT='0',  # the synthetic upstream doesn't throttle
+    )
+    if args.server == 'asgi':
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi_server:app',
+               '--port', str(port), '--log-level', 'warning']
+    elif args.server == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', '-w', str(args.workers),
+               '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'server:app']
+    else:
+        cmd = [sys.executable, '-c',
+               f'import server; server.app.run(port={port}, threaded=True)']
+    proc = subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        wait_until_up('127.0.0.1', port)
+    except Exception:
+        proc.terminate()
+        raise
+    return proc
+
+
+# ============================================================================
+# LOAD GENERATION
+# ============================================================================
+
+def build_request(endpoint, rng, universe, weights, args):
+    """Return (method, path, body) for one request to endpoint."""
+    def pick():
+        return universe[rng.choices(range(len(universe)), weights)[0]]
+
+    path = ENDPOINTS[endpoint]
+    if endpoint == 'health':
+        return 'GET', path, None
+    if endpoint == 'portfolio':
+        names = sorted({pick() for _ in range(args.portfolio_size)})
+        return 'POST', path, {'tickers': names}
+
+    params = {'ticker': pick()}
+    if endpoint == 'forecast':
+        params['horizon'] = args.horizon
+    if endpoint == 'sentiment' and args.budget_ms:
+        params['budgetMs'] = args.budget_ms
+    if args.method == 'get':
+        return 'GET', f'{path}?{urlencode(params)}', None
+    return 'POST', path, params
+
+
+class Recorder:
+    """Thread-safe collection of (latency, status) samples per endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.statuses = {name: Counter() for name in ENDPOINTS}
+
+    def add(self, endpoint, seconds, status):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+
+
+def run_load(host, port, mix, args):
+    """Closed-loop load: each client sends its next request when the last one returns."""
+    universe = make_universe(args.tickers)
+    weights = list(zipf_weights(args.tickers, args.zipf_s))
+    names, mix_weights = zip(*mix.items())
+    recorder = Recorder()
+    measure_from = time.perf_counter() + args.warmup
+    stop_at = measure_from + args.duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection(host, port, timeout=args.timeout)
+        while time.perf_counter() < stop_at:
+            endpoint = rng.choices(names, mix_weights)[0]
+            method, path, body = build_request(endpoint, rng, universe, weights, args)
+            started = time.perf_counter()
+            try:
+                if body is None:
+                    conn.request(method, path)
+                else:
+                    conn.request(method, path, json.dumps(body), {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=args.timeout)
+                status = 'connection_error'
+            elapsed = time.perf_counter() - started
+            # Requests that started during warm-up are not measured
+            if started >= measure_from:
+                recorder.add(endpoint, elapsed, status)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(args.seed + i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder
+
+
+def summarize(latencies, statuses, duration):
+    """Throughput, latency percentiles and error rate for one set of samples."""
+    n = len(latencies)
+    errors = sum(count for status, count in statuses.items()
+                 if status == 'connection_error' or status >= 400)
+    summary = {
+        'requests': n,
+        'errors': errors,
+        'error_rate': round(errors / n, 4) if n else 0.0,
+        'throughput_rps': round(n / duration, 2),
+        'status_codes': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+    if n:
+        lat_ms = np.asarray(latencies) * 1000.0
+        p50, p95, p99 = np.percentile(lat_ms, [50, 95, 99])
+        summary.update(
+            mean_ms=round(float(lat_ms.mean()), 1),
+            p50_ms=round(float(p50), 1),
+            p95_ms=round(float(p95), 1),
+            p99_ms=round(float(p99), 1),
+            max_ms=round(float(lat_ms.max()), 1),
+        )
+    return summary
+
+
+def build_report(recorder, mix, args, target):
+    endpoints = {
+        name: summarize(recorder.latencies[name], recorder.statuses[name], args.duration)
+        for name in ENDPOINTS if recorder.latencies[name]
+    }
+    all_latencies = [x for name in ENDPOINTS for x in recorder.latencies[name]]
+    all_statuses = Counter()
+    for name in ENDPOINTS:
+        all_statuses.update(recorder.statuses[name])
+    return {
+        'target': target,
+        'config': {
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'method': args.method,
+            'mix': mix,
+            'tickers': args.tickers,
+            'zipf_s': args.zipf_s,
+            'portfolio_size': args.portfolio_size,
+            'horizon': args.horizon,
+            'budget_ms': args.budget_ms,
+            'upstream_latency_ms': args.latency_ms if not args.url else None,
+            'sentiment_latency_ms': args.sentiment_latency_ms if not args.url else None,
+            'seed': args.seed,
+        },
+        'total': summarize(all_latencies, all_statuses, args.duration),
+        'endpoints': endpoints,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Load-test the FinSight API.')
+    ap.add_argument('--url', default=None,
+                    help='load an already running server (e.g. http://127.0.0.1:5001) '
+                         'instead of starting one on local stand-ins')
+    ap.add_argument('--server', choices=['werkzeug', 'gunicorn', 'asgi'], default='werkzeug',
+                    help='how to run the server when --url is not given')
+    ap.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    ap.add_argument('--port', type=int, default=5201)
+    ap.add_argument('--concurrency', type=int, default=16)
+    ap.add_argument('--duration', type=float, default=20.0, help='measured seconds')
+    ap.add_argument('--warmup', type=float, default=3.0, help='unmeasured seconds before measuring')
+    ap.add_argument('--mix', default=DEFAULT_MIX, help='endpoint=weight pairs')
+    ap.add_argument('--method', choices=['post', 'get'], default='post',
+                    help='POST bodies or the cached GET variants for predict/forecast/sentiment')
+    ap.add_argument('--tickers', type=int, default=200, help='size of the ticker universe')
+    ap.add_argument('--zipf_s', type=float, default=1.1, help='Zipf exponent (0 = uniform)')
+    ap.add_argument('--portfolio_size', type=int, default=5)
+    ap.add_argument('--horizon', type=int, default=20)
+    ap.add_argument('--budget_ms', type=int, default=None, help='latency budget for sentiment requests')
+    ap.add_argument('--latency_ms', type=float, default=50.0, help='synthetic upstream latency')
+    ap.add_argument('--sentiment_latency_ms', type=float, default=5.0,
+                    help='per-article latency of the sentiment stub')
+    ap.add_argument('--timeout', type=float, default=60.0)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--out_json', default=None)
+    args = ap.parse_args()
+
+    mix = parse_mix(args.mix)
+    proc = None
+    with tempfile.TemporaryDirectory(prefix='loadtest-') as workdir:
+        if args.url:
+            parsed = urlparse(args.url)
+            host, port = parsed.hostname, parsed.port or 80
+            target = args.url
+        else:
+            host, port = '127.0.0.1', args.port
+            proc = start_server(args, workdir, port)
+            target = f'{args.server} on local stand-ins'
+        try:
+            print(f'Loading {target} with {args.concurrency} clients for '
+                  f'{args.warmup:g}s warm-up + {args.duration:g}s ...')
+            recorder = run_load(host, port, mix, args)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+    report = build_report(recorder, mix, args, target)
+    print(f"{'endpoint':<10} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for name, s in list(report['endpoints'].items()) + [('total', report['total'])]:
+        print(f"{name:<10} {s['throughput_rps']:>8} {s.get('p50_ms', '-'):>8} "
+              f"{s.get('p95_ms', '-'):>8} {s.get('p99_ms', '-'):>8} {s['error_rate']:>7.2%}")
+    if args.out_json:
+        with open(args.out_json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Saved report -> {args.out_json}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Market data cache for the yfinance lookups made by server.py.
+
+Every request used to call yf.Ticker(t).info and .history(...) directly, so
+twenty users watching AAPL meant twenty identical upstream fetches. This
+module puts a small cache in front of those calls:
+
+- quotes (price history) and company info have separate TTLs, because info
+  barely changes during the day while prices go stale in seconds
+- each cache is bounded and evicts the least recently used entry
+- concurrent misses for the same key are coalesced ("single-flight"): one
+  thread calls the upstream and every other waiter shares its result
+- hit/miss counters are kept so we can see how well the cache is doing
+
+Multi-ticker requests (the portfolio endpoint) use get_histories(), which
+fetches every missing ticker in a single bulk download (joining downloads
+already in flight for some of them), and get_infos(),
+which runs the info lookups on a bounded thread pool.
+
+The upstream is a provider from providers.py (or any object with info(ticker),
+history(ticker, period) and download(tickers, period) methods), so a local
+stand-in provider can be swapped in for testing.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from providers import YFinanceProvider
+
+
+class _Flight:
+    """An upstream call that is currently in progress for one key."""
+
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a fixed TTL.
+
+    get_or_load() coalesces concurrent misses: only one loader runs per key
+    and the other callers block until it finishes. Loader errors are passed
+    to every waiter and are not cached.
+    """
+
+    def __init__(self, ttl, max_entries=1024, clock=time.monotonic):
+        self.ttl = float(ttl)
+        self.max_entries = int(max_entries)
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._flights = {}  # key -> _Flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() on a miss."""
+        return self._load(key, loader, force=False)
+
+    def refresh(self, key, loader):
+        """
+        Reload key even if it is still fresh, replacing the cached value.
+
+        Used by background pre-warming. Requests keep getting the old value
+        until the new one is stored; if a load for the key is already in
+        progress, its result is shared instead of starting another.
+        """
+        return self._load(key, loader, force=True)
+
+    def _load(self, key, loader, force):
+        with self._lock:
+            entry = self._entries.get(key)
+            if not force and entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                # Someone is already fetching this key, wait for their result
+                if not force:
+                    self.coalesced += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                if not force:  # refreshes aren't requests, keep them out of the hit rate
+                    self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            self.put(key, flight.value)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+        return flight.value
+
+    def get_or_load_many(self, keys, loader, cacheable=None):
+        """
+        Values for many keys, loading every miss with one loader call.
+
+        Keys another caller is already loading are waited for instead of
+        being loaded again, so concurrent multi-key requests that overlap
+        share one upstream call per key.
+
+        Args:
+            keys (list): keys to look up
+            loader: function(missing_keys) -> {key: value}; a key absent
+                    from its result is reported as a KeyError
+            cacheable: optional predicate; values it rejects are returned
+                       but not stored
+
+        Returns:
+            dict: key -> value, or the exception its load raised (a loader
+                  error is reported for each of its keys instead of raised)
+        """
+        result = {}
+        flights = {}
+        own = []
+        with self._lock:
+            now = self.clock()
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    result[key] = entry[1]
+                elif key in self._flights:
+                    self.coalesced += 1
+                    flights[key] = self._flights[key]
+                else:
+                    self.misses += 1
+                    flights[key] = self._flights[key] = _Flight()
+                    own.append(key)
+
+        if own:
+            try:
+                values = loader(own)
+                error = None
+            except Exception as e:
+                values, error = {}, e
+            try:
+                for key in own:
+                    flight = flights[key]
+                    if error is not None:
+                        flight.error = error
+                    elif key not in values:
+                        flight.error = KeyError(key)
+                    else:
+                        flight.value = values[key]
+                        if cacheable is None or cacheable(flight.value):
+                            self.put(key, flight.value)
+            finally:
+                with self._lock:
+                    for key in own:
+                        self._flights.pop(key, None)
+                for key in own:
+                    flights[key].event.set()
+
+        for key, flight in flights.items():
+            flight.event.wait()
+            result[key] = flight.error if flight.error is not None else flight.value
+        return result
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def lookup(self, key):
+        """Return the cached value (None on a miss), counting the hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def peek(self, key):
+        """Return the cached value without loading or counting a hit (None if absent/expired)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                return None
+            return entry[1]
+
+    def ttl_remaining(self, key):
+        """Seconds until the entry expires (0 if it is missing or already expired)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return 0.0
+            return max(0.0, entry[0] - self.clock())
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything if key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hitRate': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def split_download(data, tickers):
+    """
+    Split a yf.download() frame into one history frame per ticker.
+
+    Multi-ticker downloads have (field, ticker) column pairs, so each ticker's
+    slice looks like the Open/High/Low/Close/Volume frame .history() returns.
+    Tickers with no rows come back as empty frames.
+    """
+    frames = {}
+    multi = data.columns.nlevels > 1
+    for ticker in tickers:
+        if multi:
+            if ticker in data.columns.get_level_values(-1):
+                frame = data.xs(ticker, axis=1, level=-1)
+            else:
+                frame = data.iloc[:, :0]
+        else:
+            # Single ticker downloads may come back with flat columns
+            frame = data if len(tickers) == 1 else data.iloc[:, :0]
+        frames[ticker] = frame.dropna(how='all')
+    return frames
+
+
+class MarketDataCache:
+    """
+    Caches company info and price history per ticker.
+
+    Args:
+        provider: object with info(ticker), history(ticker, period) and
+                  download(tickers, period)
+        info_workers (int): size of the pool used by get_infos()
+        quote_ttl (float): seconds a price history stays fresh
+        info_ttl (float): seconds company info stays fresh
+        max_entries (int): maximum entries kept in each of the two caches
+
+    Returned objects are shared between requests, so callers must treat
+    them as read-only.
+    """
+
+    def __init__(self, provider=None, quote_ttl=15.0, info_ttl=3600.0, max_entries=1024,
+                 info_workers=8, clock=time.monotonic):
+        self.provider = provider or YFinanceProvider()
+        self.quotes = TTLCache(quote_ttl, max_entries, clock)
+        self.infos = TTLCache(info_ttl, max_entries, clock)
+        # Bounded pool for metadata lookups in multi-ticker requests
+        self.info_executor = ThreadPoolExecutor(max_workers=info_workers,
+                                                thread_name_prefix='market-info')
+
+    @classmethod
+    def from_env(cls, provider=None):
+        """Build a cache configured from MARKET_CACHE_* environment variables."""
+        return cls(
+            provider=provider,
+            quote_ttl=float(os.environ.get('MARKET_CACHE_QUOTE_TTL', 15)),
+            info_ttl=float(os.environ.get('MARKET_CACHE_INFO_TTL', 3600)),
+            max_entries=int(os.environ.get('MARKET_CACHE_MAX_ENTRIES', 1024)),
+            info_workers=int(os.environ.get('MARKET_CACHE_INFO_WORKERS', 8)),
+        )
+
+    def get_info(self, ticker):
+        """Company info dict for a ticker (longName, marketCap, previousClose, ...)."""
+        ticker = ticker.upper()
+        return self.infos.get_or_load(ticker, lambda: self.provider.info(ticker))
+
+    def get_history(self, ticker, period='5d'):
+        """Daily price history DataFrame for a ticker."""
+        ticker = ticker.upper()
+        return self.quotes.get_or_load((ticker, period),
+                                       lambda: self.provider.history(ticker, period))
+
+    def refresh_history(self, ticker, period='5d'):
+        """Re-fetch a price history before it expires (see TTLCache.refresh)."""
+        ticker = ticker.upper()
+        return self.quotes.refresh((ticker, period),
+                                   lambda: self.provider.history(ticker, period))
+
+    def get_histories(self, tickers, period='1d'):
+        """
+        Price history for many tickers at once.
+
+        Cached tickers are served from the quote cache; all the misses are
+        fetched together with one bulk download and cached individually.
+        Tickers another request is already fetching are waited for rather
+        than downloaded again.
+
+        Returns:
+            dict: ticker -> history DataFrame (empty if upstream had no data),
+                  or the exception raised while fetching it
+        """
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+
+        def download(keys):
+            missing = [ticker for ticker, _ in keys]
+            frames = split_download(self.provider.download(missing, period), missing)
+            return {(ticker, period): frames[ticker] for ticker in missing}
+
+        # Don't cache empty frames so a transient upstream gap isn't pinned for a TTL
+        histories = self.quotes.get_or_load_many([(t, period) for t in tickers], download,
+                                                 cacheable=lambda hist: not hist.empty)
+        return {ticker: histories[(ticker, period)] for ticker in tickers}
+
+    def get_infos(self, tickers):
+        """
+        Company info for many tickers, looked up in parallel on the info pool.
+
+        Returns:
+            dict: ticker -> info dict, or the exception raised for that ticker
+        """
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        futures = {t: self.info_executor.submit(self.get_info, t) for t in tickers}
+        result = {}
+        for ticker, future in futures.items():
+            try:
+                result[ticker] = future.result()
+            except Exception as e:
+                result[ticker] = e
+        return result
+
+    def stats(self):
+        return {'quotes': self.quotes.stats(), 'info': self.infos.stats()}
@@ -1,7 +1,14 @@
 import yfinance as yf
-import pandas as pd
+import numpy as np
 from datetime import datetime
 
+from market_cache import split_download
+from valuation import PositionBook, value_book, price_vectors
+from risk import RiskModel
+
+# Daily price history used for the risk figures
+PARQUET_PATH = "stock_data_since_2016.parquet"
+
 # ---------------------------------------
 # Mock portfolio (replace later with real user data)
 # ---------------------------------------
@@ -14,20 +21,14 @@ portfolio = [
 ]
 
 # ---------------------------------------
-# Fetch live market data using yfinance
+# Fetch latest and previous closes using yfinance
 # ---------------------------------------
 def fetch_market_data(portfolio):
+    # Daily bars for the last few days: the last close is the current price
+    # and the one before it the previous close (no need for a day of 1m bars)
     tickers = [p["ticker"] for p in portfolio]
-    data = yf.download(tickers, period="1d", interval="1m", progress=False)
-
-    # Get the most recent price for each ticker
-    latest_prices = {}
-    for ticker in tickers:
-        try:
-            latest_prices[ticker] = data["Close"][ticker].dropna().iloc[-1]
-        except Exception:
-            latest_prices[ticker] = None
-    return latest_prices
+    data = yf.download(tickers, period="5d", interval="1d", progress=False)
+    return split_download(data, tickers)
 
 
 # ---------------------------------------
@@ -37,24 +38,51 @@ def display_portfolio(portfolio):
     print(f"\n📊 Portfolio Overview ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
     print("=" * 70)
 
-    prices = fetch_market_data(portfolio)
-    total_value = 0
+    # Same engine the bulk valuation endpoint uses, here with a single portfolio
+    book = PositionBook.from_portfolios([
+        {"id": "me", "holdings": {p["ticker"]: p["shares"] for p in portfolio}}
+    ])
+    prices, previous_closes = price_vectors(book.tickers, fetch_market_data(portfolio))
+    result = value_book(book, prices, previous_closes)
 
     print(f"{'Company':<20}{'Ticker':<8}{'Shares':<8}{'Price ($)':<12}{'Value ($)':<12}")
     print("-" * 70)
 
     for p in portfolio:
         ticker = p["ticker"]
-        price = prices.get(ticker)
-        if price:
+        price = prices[book.tickers.index(ticker.upper())]
+        if not np.isnan(price):
             value = price * p["shares"]
-            total_value += value
             print(f"{p['company']:<20}{ticker:<8}{p['shares']:<8}{price:<12.2f}{value:<12.2f}")
         else:
             print(f"{p['company']:<20}{ticker:<8}{p['shares']:<8}{'N/A':<12}{'N/A':<12}")
 
     print("-" * 70)
-    print(f"{'Total Portfolio Value:':<50}${total_value:,.2f}")
+    print(f"{'Total Portfolio Value:':<50}${result.market_value[0]:,.2f}")
+    print(f"{'Day P&L:':<50}${result.day_pnl[0]:,.2f} ({result.day_pnl_pct[0]:+.2f}%)")
+    print("=" * 70)
+
+
+# ---------------------------------------
+# Display risk figures from the price history
+# ---------------------------------------
+def display_risk(portfolio, parquet_path=PARQUET_PATH, confidence=0.95):
+    book = PositionBook.from_portfolios([
+        {"id": "me", "holdings": {p["ticker"]: p["shares"] for p in portfolio}}
+    ])
+    model = RiskModel(parquet_path)
+    risk = model.portfolio_risk(book, confidence=confidence)[0]
+
+    print(f"\n⚠️  Risk (last {model.window} trading days, as of {model.last_date:%Y-%m-%d})")
+    print("=" * 70)
+    print(f"{'Annual volatility:':<50}{risk['volatility']['annual']:.2%}")
+    print(f"{f'1-day VaR {confidence:.0%} (parametric):':<50}${risk['var']['parametric']:,.2f}")
+    print(f"{f'1-day VaR {confidence:.0%} (historical):':<50}${risk['var']['historical']:,.2f}")
+    print(f"{'Beta:':<50}{risk['beta']:.2f}")
+    print("-" * 70)
+    print(f"{'Ticker':<8}{'Weight':<12}{'Risk share':<12}")
+    for ticker, c in risk["contributions"].items():
+        print(f"{ticker:<8}{c['weight']:<12.2%}{c['riskContribution']:<12.2%}")
     print("=" * 70)
 
 
@@ -63,3 +91,4 @@ def display_portfolio(portfolio):
 # ---------------------------------------
 if __name__ == "__main__":
     display_portfolio(portfolio)
+    display_risk(portfolio)
@@ -0,0 +1,283 @@
+"""
+Popularity-driven background pre-warming.
+
+A handful of tickers gets most of the traffic. Instead of letting their
+cached quotes, forecasts and sentiment expire and making the next request
+pay for the recomputation, a background scheduler refreshes them shortly
+before they expire.
+
+- PopularityTracker counts requests per ticker with exponential decay, so
+  the top-N list follows what users are looking at right now
+- PrewarmScheduler periodically takes the top-N tickers and, for each
+  registered job (quote, forecast, sentiment, ...), refreshes entries whose
+  remaining TTL has dropped below a lead time
+- refreshes run on a small thread pool (bounded concurrency), and the
+  scheduler stops submitting work while the refreshes have used more CPU
+  than their budget over the recent window
+
+Jobs are plain callables, so this module knows nothing about Flask or the
+caches; server.py registers the jobs (see build_prewarm_jobs there).
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PopularityTracker:
+    """
+    Request counter per ticker with exponential decay.
+
+    A request adds 1 to the ticker's score; scores halve every half_life
+    seconds. Internally each count is stored scaled by exp(rate * t) so
+    recording is O(1) and no periodic decay pass is needed.
+
+    Args:
+        half_life (float): seconds for a score to halve
+        max_tracked (int): keep at most this many tickers (lowest scores are dropped)
+    """
+
+    def __init__(self, half_life=600.0, max_tracked=5000, clock=time.monotonic):
+        self.rate = math.log(2) / float(half_life)
+        self.max_tracked = int(max_tracked)
+        self.clock = clock
+        self._origin = clock()
+        self._scaled = {}  # ticker -> score * exp(rate * (t - origin))
+        self._lock = threading.Lock()
+
+    def _growth(self, now):
+        return math.exp(self.rate * (now - self._origin))
+
+    def _rebase(self, now):
+        """Move the origin to now so the scaled values don't overflow."""
+        factor = self._growth(now)
+        self._scaled = {t: v / factor for t, v in self._scaled.items()}
+        self._origin = now
+
+    def record(self, ticker, weight=1.0):
+        ticker = str(ticker).upper()
+        if not ticker:
+            return
+        now = self.clock()
+        with self._lock:
+            if self.rate * (now - self._origin) > 50:
+                self._rebase(now)
+            self._scaled[ticker] = self._scaled.get(ticker, 0.0) + weight * self._growth(now)
+            if len(self._scaled) > self.max_tracked:
+                # Drop the coldest tenth in one go rather than one per request
+                keep = sorted(self._scaled.items(), key=lambda kv: kv[1], reverse=True)
+                self._scaled = dict(keep[:int(self.max_tracked * 0.9)])
+
+    def score(self, ticker):
+        now = self.clock()
+        with self._lock:
+            return self._scaled.get(str(ticker).upper(), 0.0) / self._growth(now)
+
+    def top(self, n, min_score=0.0):
+        """The n highest-scoring tickers as [(ticker, score), ...]."""
+        now = self.clock()
+        with self._lock:
+            growth = self._growth(now)
+            ranked = sorted(self._scaled.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(t, round(v / growth, 3)) for t, v in ranked if v / growth > min_score]
+
+    def __len__(self):
+        return len(self._scaled)
+
+
+class PrewarmJob:
+    """
+    One kind of cached data to keep warm.
+
+    Args:
+        name (str): label used in stats ('quote', 'forecast', ...)
+        ttl (float): TTL of the cache the job fills, in seconds
+        ttl_remaining: function(ticker) -> seconds until the entry expires
+                       (0 if it isn't cached)
+        refresh: function(ticker) that recomputes and stores the entry
+    """
+
+    def __init__(self, name, ttl, ttl_remaining, refresh):
+        self.name = name
+        self.ttl = float(ttl)
+        self.ttl_remaining = ttl_remaining
+        self.refresh = refresh
+
+
+class PrewarmScheduler:
+    """
+    Background thread that keeps the hottest tickers' cache entries fresh.
+
+    Every `interval` seconds it looks at the top_n tickers of the tracker and
+    submits a refresh for each (job, ticker) whose entry expires within the
+    lead time: lead_fraction of the job's TTL, but never less than two
+    intervals so an entry can't expire between two passes.
+
+    Args:
+        tracker (PopularityTracker): request counts
+        jobs (list): PrewarmJob instances
+        top_n (int): how many tickers to keep warm
+        interval (float): seconds between scheduling passes
+        lead_fraction (float): refresh when this fraction of the TTL is left
+        max_workers (int): concurrent refreshes
+        cpu_budget (float): CPU seconds per wall second the refreshes may use
+                            (0.5 = half a core), measured over cpu_window seconds
+        min_score (float): ignore tickers with a lower decayed request count
+    """
+
+    def __init__(self, tracker, jobs, top_n=20, interval=5.0, lead_fraction=0.25,
+                 max_workers=2, cpu_budget=0.5, cpu_window=30.0, min_score=1.0):
+        self.tracker = tracker
+        self.jobs = list(jobs)
+        self.top_n = int(top_n)
+        self.interval = float(interval)
+        self.lead_fraction = float(lead_fraction)
+        self.max_workers = int(max_workers)
+        self.cpu_budget = float(cpu_budget)
+        self.cpu_window = float(cpu_window)
+        self.min_score = float(min_score)
+
+        self._executor = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._in_flight = set()  # (job name, ticker)
+        self._cpu_samples = deque()  # (finished_at, cpu seconds)
+        self.refreshed = {job.name: 0 for job in self.jobs}
+        self.failed = {job.name: 0 for job in self.jobs}
+        self.skipped_for_budget = 0
+        self.passes = 0
+
+    @classmethod
+    def from_env(cls, tracker, jobs):
+        """Build a scheduler configured from PREWARM_* environment variables."""
+        return cls(
+            tracker, jobs,
+            top_n=int(os.environ.get('PREWARM_TOP_N', 20)),
+            interval=float(os.environ.get('PREWARM_INTERVAL', 5)),
+            lead_fraction=float(os.environ.get('PREWARM_LEAD_FRACTION', 0.25)),
+            max_workers=int(os.environ.get('PREWARM_WORKERS', 2)),
+            cpu_budget=float(os.environ.get('PREWARM_CPU_BUDGET', 0.5)),
+            min_score=float(os.environ.get('PREWARM_MIN_SCORE', 1)),
+        )
+
+    # ----- lifecycle -----
+
+    def start(self):
+        """
+        Start the scheduler thread (no-op if it is already running).
+
+        Safe to call again after a fork: threads don't survive fork, so a
+        gunicorn worker starts its own scheduler.
+        """
+        if self.running:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._in_flight.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='prewarm')
+            self._thread = threading.Thread(target=self._run, name='prewarm-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Prewarm: scheduling pass failed: {e}")
+
+    # ----- scheduling -----
+
+    def cpu_used(self):
+        """CPU seconds per wall second used by refreshes over the recent window."""
+        cutoff = time.monotonic() - self.cpu_window
+        with self._lock:
+            while self._cpu_samples and self._cpu_samples[0][0] < cutoff:
+                self._cpu_samples.popleft()
+            return sum(cpu for _, cpu in self._cpu_samples) / self.cpu_window
+
+    def due(self):
+        """(job, ticker) pairs of hot tickers whose entries expire within the lead time."""
+        pairs = []
+        for ticker, _ in self.tracker.top(self.top_n, self.min_score):
+            for job in self.jobs:
+                lead = max(job.ttl * self.lead_fraction, 2 * self.interval)
+                if job.ttl_remaining(ticker) <= lead:
+                    pairs.append((job, ticker))
+        return pairs
+
+    def run_once(self, wait=False):
+        """
+        One scheduling pass. Returns the number of refreshes submitted.
+
+        With wait=True, blocks until they finish (handy for scripts and tests).
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='prewarm')
+        self.passes += 1
+        futures = []
+        for job, ticker in self.due():
+            if self.cpu_used() >= self.cpu_budget:
+                self.skipped_for_budget += 1
+                break
+            key = (job.name, ticker)
+            with self._lock:
+                # Don't queue more than max_workers at once, the rest waits for the next pass
+                if key in self._in_flight or len(self._in_flight) >= self.max_workers:
+                    continue
+                self._in_flight.add(key)
+            futures.append(self._executor.submit(self._refresh, job, ticker))
+        if wait:
+            for future in futures:
+                future.result()
+        return len(futures)
+
+    def _refresh(self, job, ticker):
+        cpu_started = time.thread_time()
+        ok = False
+        try:
+            job.refresh(ticker)
+            ok = True
+        except Exception as e:
+            # Errors (unknown ticker, upstream down, ...) are not cached; the
+            # next pass or a real request will try again
+            print(f"Prewarm: {job.name} refresh for {ticker} failed: {e}")
+        finally:
+            cpu = time.thread_time() - cpu_started
+            with self._lock:
+                (self.refreshed if ok else self.failed)[job.name] += 1
+                self._cpu_samples.append((time.monotonic(), cpu))
+                self._in_flight.discard((job.name, ticker))
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'topN': self.top_n,
+            'trackedTickers': len(self.tracker),
+            'hotTickers': self.tracker.top(min(self.top_n, 10), self.min_score),
+            'refreshed': dict(self.refreshed),
+            'failed': dict(self.failed),
+            'inFlight': len(self._in_flight),
+            'cpuUsed': round(self.cpu_used(), 3),
+            'cpuBudget': self.cpu_budget,
+            'skippedForBudget': self.skipped_for_budget,
+            'passes': self.passes,
+        }
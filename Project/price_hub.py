@@ -0,0 +1,402 @@
+"""
+Live price hub: one upstream poller per symbol, fanned out to many clients.
+
+The dashboard used to poll the REST endpoints from every open browser tab,
+and live_data.py polled Alpaca in a blocking loop. With the hub, the server
+polls each subscribed symbol once per interval no matter how many clients
+are watching it, and pushes every change to all of them (server.py exposes
+this as a Server-Sent Events stream at /api/stream/prices).
+
+- Subscriptions: a client subscribes to a set of symbols. The first
+  subscriber of a symbol starts its poller; when the last one leaves, the
+  poller keeps running for idle_grace seconds (quick reconnects stay warm)
+  and then stops.
+- Backpressure: a subscription holds at most one pending update per symbol.
+  If a client reads slower than prices change, older updates for the same
+  symbol are replaced by the newest one ("conflation"), so a slow client
+  never makes the server buffer more and simply sees fewer ticks.
+- Heartbeats: Subscription.get() returns None after `heartbeat` seconds
+  without updates, so the stream can send a keep-alive comment and notice
+  disconnected clients.
+
+Price sources are small objects with a fetch(symbol) method:
+
+- ProviderPriceSource  stocks, through a providers.py provider (yfinance,
+                       replay or synthetic)
+- AlpacaCryptoSource   crypto pairs such as BTC/USD, latest Alpaca bar
+- SimulatedPriceSource deterministic random walk, for tests and local runs
+- RoutingSource        crypto pairs to one source, everything else to another
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+# ============================================================================
+# PRICE SOURCES
+# ============================================================================
+
+class ProviderPriceSource:
+    """Latest daily close (and volume) of a stock from an upstream provider."""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def fetch(self, symbol):
+        hist = self.provider.history(symbol, '1d')
+        if hist is None or hist.empty:
+            raise ValueError(f'no price data for {symbol}')
+        last = hist.iloc[-1]
+        return {
+            'price': round(float(last['Close']), 4),
+            'volume': int(last['Volume']),
+            'asOf': hist.index[-1].isoformat(),
+        }
+
+
+class AlpacaCryptoSource:
+    """Latest minute bar of a crypto pair from Alpaca (no API keys needed)."""
+
+    def __init__(self):
+        self._client = None
+
+    def fetch(self, symbol):
+        from alpaca.data.historical import CryptoHistoricalDataClient
+        from alpaca.data.requests import CryptoLatestBarRequest
+        if self._client is None:
+            self._client = CryptoHistoricalDataClient()
+        bar = self._client.get_crypto_latest_bar(CryptoLatestBarRequest(symbol_or_symbols=symbol))[symbol]
+        return {
+            'price': round(float(bar.close), 4),
+            'volume': float(bar.volume),
+            'asOf': bar.timestamp.isoformat(),
+        }
+
+
+class SimulatedPriceSource:
+    """
+    Random-walk prices, seeded per symbol so runs are repeatable.
+
+    Each fetch moves the price by one step, so every poll produces an update.
+    """
+
+    def __init__(self, volatility=0.002, seed=0):
+        self.volatility = float(volatility)
+        self.seed = int(seed)
+        self._prices = {}
+        self._rngs = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, symbol):
+        with self._lock:
+            rng = self._rngs.get(symbol)
+            if rng is None:
+                rng = random.Random(zlib.crc32(symbol.encode('utf-8')) + self.seed)
+                self._rngs[symbol] = rng
+                self._prices[symbol] = rng.uniform(20, 500)
+            self._prices[symbol] *= 1.0 + rng.gauss(0.0, self.volatility)
+            return {
+                'price': round(self._prices[symbol], 4),
+                'volume': rng.randrange(100, 10_000),
+                'asOf': datetime.now(timezone.utc).isoformat(),
+            }
+
+
+class RoutingSource:
+    """Send crypto pairs (symbols containing '/') to one source, stocks to another."""
+
+    def __init__(self, stocks, crypto):
+        self.stocks = stocks
+        self.crypto = crypto
+
+    def fetch(self, symbol):
+        return (self.crypto if '/' in symbol else self.stocks).fetch(symbol)
+
+
+# ============================================================================
+# SUBSCRIPTIONS
+# ============================================================================
+
+class Subscription:
+    """
+    One client's view of the hub.
+
+    Holds at most one pending update per symbol (newer updates replace
+    older ones). Read it with get() from a thread, or aget() from an
+    asyncio task if the subscription was created with a loop.
+    """
+
+    def __init__(self, symbols, loop=None):
+        self.symbols = tuple(symbols)
+        self.created_at = time.time()
+        self.delivered = 0
+        self.conflated = 0
+        self.closed = False
+        self._pending = OrderedDict()  # symbol -> latest undelivered update
+        self._cond = threading.Condition()
+        self._loop = loop
+        self._event = asyncio.Event() if loop is not None else None
+
+    def push(self, update):
+        """Called by the pollers. Never blocks, whatever the client is doing."""
+        with self._cond:
+            if self.closed:
+                return
+            symbol = update['symbol']
+            if symbol in self._pending:
+                self.conflated += 1
+                del self._pending[symbol]  # re-insert at the end, after other symbols' updates
+            self._pending[symbol] = update
+            self._cond.notify()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:  # event loop already closed
+                pass
+
+    def _pop(self):
+        _, update = self._pending.popitem(last=False)
+        self.delivered += 1
+        return update
+
+    def get(self, timeout=None):
+        """
+        Next update, or None if nothing arrived within timeout (time for a
+        heartbeat) or the subscription was closed.
+        """
+        with self._cond:
+            if not self._pending and not self.closed:
+                self._cond.wait(timeout)
+            if self._pending and not self.closed:
+                return self._pop()
+            return None
+
+    async def aget(self, timeout=None):
+        """Async version of get() for subscriptions created with a loop."""
+        if not self._pending and not self.closed:
+            self._event.clear()
+            # Re-check after clearing so an update pushed in between isn't missed
+            if not self._pending:
+                try:
+                    await asyncio.wait_for(self._event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        with self._cond:
+            if self._pending and not self.closed:
+                return self._pop()
+            return None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:
+                pass
+
+
+# ============================================================================
+# HUB
+# ============================================================================
+
+class _Poller:
+    """Polling thread for one symbol."""
+
+    def __init__(self, hub, symbol):
+        self.hub = hub
+        self.symbol = symbol
+        self.subscribers = set()
+        self.idle_since = None  # when the last subscriber left
+        self.polls = 0
+        self.errors = 0
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f'price-poller-{symbol}', daemon=True)
+
+    def _run(self):
+        backoff = self.hub.poll_interval
+        while not self.stop.is_set():
+            try:
+                fields = self.hub.source.fetch(self.symbol)
+                self.polls += 1
+                self.hub._publish(self.symbol, fields)
+                backoff = self.hub.poll_interval
+            except Exception as e:
+                # Upstream hiccup: keep the subscribers, back off up to 8 intervals
+                self.errors += 1
+                backoff = min(backoff * 2, self.hub.poll_interval * 8)
+                print(f"Price hub: fetch for {self.symbol} failed: {e}")
+            if self.hub._retire_if_idle(self):
+                return
+            self.stop.wait(backoff)
+
+
+class PriceHub:
+    """
+    Fans out live prices from one poller per symbol to any number of subscriptions.
+
+    Args:
+        source: object with fetch(symbol) -> {'price': ..., 'volume': ..., 'asOf': ...}
+        poll_interval (float): seconds between upstream polls of a symbol
+        heartbeat (float): seconds of silence before get() returns None
+        idle_grace (float): seconds a poller outlives its last subscriber
+        max_subscribers (int): refuse new subscriptions beyond this
+        max_symbols (int): most symbols a single subscription may ask for
+    """
+
+    def __init__(self, source, poll_interval=5.0, heartbeat=15.0, idle_grace=30.0,
+                 max_subscribers=1000, max_symbols=20):
+        self.source = source
+        self.poll_interval = float(poll_interval)
+        self.heartbeat = float(heartbeat)
+        self.idle_grace = float(idle_grace)
+        self.max_subscribers = int(max_subscribers)
+        self.max_symbols = int(max_symbols)
+        self._pollers = {}  # symbol -> _Poller
+        self._subscriptions = set()
+        self._latest = {}  # symbol -> last published update
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @classmethod
+    def from_env(cls, source):
+        """Build a hub configured from PRICE_HUB_* environment variables."""
+        return cls(
+            source,
+            poll_interval=float(os.environ.get('PRICE_HUB_POLL_INTERVAL', 5)),
+            heartbeat=float(os.environ.get('PRICE_HUB_HEARTBEAT', 15)),
+            idle_grace=float(os.environ.get('PRICE_HUB_IDLE_GRACE', 30)),
+            max_subscribers=int(os.environ.get('PRICE_HUB_MAX_SUBSCRIBERS', 1000)),
+            max_symbols=int(os.environ.get('PRICE_HUB_MAX_SYMBOLS', 20)),
+        )
+
+    def subscribe(self, symbols, loop=None):
+        """
+        Subscribe to symbols (uppercased, duplicates removed).
+
+        The latest known price of each symbol is queued right away, so a new
+        client doesn't wait a full poll interval for its first values.
+
+        Raises:
+            ValueError: no symbols, or more than max_symbols
+            OverflowError: the hub already has max_subscribers subscriptions
+        """
+        symbols = list(dict.fromkeys(str(s).strip().upper() for s in symbols if str(s).strip()))
+        if not symbols:
+            raise ValueError('at least one symbol is required')
+        if len(symbols) > self.max_symbols:
+            raise ValueError(f'at most {self.max_symbols} symbols per subscription')
+
+        subscription = Subscription(symbols, loop=loop)
+        started = []
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                raise OverflowError('too many price stream subscribers')
+            self._subscriptions.add(subscription)
+            for symbol in symbols:
+                poller = self._pollers.get(symbol)
+                if poller is None:
+                    poller = _Poller(self, symbol)
+                    self._pollers[symbol] = poller
+                    started.append(poller)
+                poller.subscribers.add(subscription)
+                poller.idle_since = None
+                if symbol in self._latest:
+                    subscription.push(self._latest[symbol])
+        for poller in started:
+            poller.thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        now = time.monotonic()
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            for symbol in subscription.symbols:
+                poller = self._pollers.get(symbol)
+                if poller is not None:
+                    poller.subscribers.discard(subscription)
+                    if not poller.subscribers:
+                        poller.idle_since = now
+
+    def _publish(self, symbol, fields):
+        with self._lock:
+            previous = self._latest.get(symbol)
+            # Only changes are pushed (a daily close polled every few seconds repeats a lot)
+            if previous is not None and previous['price'] == fields['price'] \
+                    and previous['asOf'] == fields['asOf']:
+                return
+            update = {'symbol': symbol, **fields, 'publishedAt': time.time()}
+            poller = self._pollers.get(symbol)
+            if poller is None:
+                # A poll that finished after close() or after the poller was retired
+                return
+            self._latest[symbol] = update
+            subscribers = list(poller.subscribers)
+            self.published += 1
+        for subscription in subscribers:
+            subscription.push(update)
+
+    def _retire_if_idle(self, poller):
+        """Remove the poller if nobody has watched its symbol for idle_grace seconds."""
+        with self._lock:
+            if poller.subscribers or poller.idle_since is None:
+                return False
+            if time.monotonic() - poller.idle_since < self.idle_grace:
+                return False
+            if self._pollers.get(poller.symbol) is poller:
+                del self._pollers[poller.symbol]
+            return True
+
+    def latest(self, symbol):
+        return self._latest.get(str(symbol).upper())
+
+    def close(self):
+        """Stop every poller and close every subscription."""
+        with self._lock:
+            pollers = list(self._pollers.values())
+            subscriptions = list(self._subscriptions)
+            self._pollers.clear()
+            self._subscriptions.clear()
+        for poller in pollers:
+            poller.stop.set()
+        for subscription in subscriptions:
+            subscription.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscriptions),
+                'symbols': {
+                    symbol: {'subscribers': len(p.subscribers), 'polls': p.polls, 'errors': p.errors}
+                    for symbol, p in self._pollers.items()
+                },
+                'published': self.published,
+                'pollIntervalSeconds': self.poll_interval,
+            }
+
+
+def get_price_source(provider, mode=None):
+    """
+    Build the price source selected by PRICE_HUB_SOURCE.
+
+    - live (default): stocks from the provider, crypto pairs from Alpaca
+    - simulated: random walks for every symbol, no network at all
+    """
+    mode = (mode or os.environ.get('PRICE_HUB_SOURCE', 'live')).lower()
+    if mode == 'live':
+        return RoutingSource(ProviderPriceSource(provider), AlpacaCryptoSource())
+    if mode == 'simulated':
+        return SimulatedPriceSource(
+            volatility=float(os.environ.get('PRICE_HUB_SIM_VOLATILITY', 0.002)),
+            seed=int(os.environ.get('PRICE_HUB_SIM_SEED', 0)),
+        )
+    raise ValueError(f"unknown PRICE_HUB_SOURCE '{mode}' (expected live or simulated)")
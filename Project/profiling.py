@@ -0,0 +1,243 @@
+"""
+Opt-in per-request profiling.
+
+When one request is slow in production, this captures where its time went.
+A request is profiled when
+
+- it carries the header  X-Profile: <PROFILE_TOKEN>  (or ?profile=<token>),
+  for reproducing a slow call on demand, or
+- it is every PROFILE_SAMPLE_EVERY-th request, for catching slow requests
+  nobody is watching
+
+The handler runs under cProfile; the result is written to PROFILE_DIR as
+<id>.prof (load with pstats or snakeviz) next to <id>.json holding the
+request metadata (method, path, status, duration, trigger) and the top
+functions by cumulative time. Only the newest PROFILE_MAX_FILES profiles are
+kept.
+
+server.create_app() registers the request hooks and the list/download
+endpoints only when profiling is configured, so with neither PROFILE_TOKEN
+nor PROFILE_SAMPLE_EVERY set there is no per-request cost at all.
+asgi_server.create_app() does the same with a middleware. cProfile only
+sees the thread it runs on, and the event loop interleaves every request,
+so there only the work a request hands to the thread pools is profiled
+(see ActiveProfile.run); the duration still covers the whole request.
+"""
+
+import cProfile
+import hmac
+import io
+import itertools
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_ARG = 'profile'
+
+# Profile ids are generated here; anything else in a download URL is rejected
+_PROFILE_ID = re.compile(r'^[0-9T]+-[0-9a-f]{8}$')
+
+
+class ActiveProfile:
+    """
+    A profiler running over one request.
+
+    profiler covers the thread that started the request (None when it isn't
+    profiled); work the request runs on other threads through run() gets a
+    profiler of its own, merged into the same profile at the end.
+    """
+
+    __slots__ = ('profiler', 'trigger', 'started', 'wall_started', 'id', 'workers')
+
+    def __init__(self, trigger, profile_caller=True):
+        self.profiler = cProfile.Profile() if profile_caller else None
+        self.trigger = trigger
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(self.wall_started))}-{uuid.uuid4().hex[:8]}"
+        self.workers = []
+
+    def run(self, func, *args):
+        """Call func on the current thread under a profiler that joins this profile."""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return func(*args)  # another profiler owns this thread's hook
+        try:
+            return func(*args)
+        finally:
+            profiler.disable()
+            self.workers.append(profiler)
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and stores their profiles.
+
+    Args:
+        directory (str): where .prof/.json files are written
+        token (str): secret that triggers profiling via header/query ('' = off)
+        sample_every (int): profile 1 in N requests (0 = off)
+        max_profiles (int): newest profiles kept on disk
+        top_n (int): functions listed in the metadata summary
+    """
+
+    def __init__(self, directory='profiles', token='', sample_every=0, max_profiles=200, top_n=25):
+        self.directory = directory
+        self.token = token or ''
+        self.sample_every = max(int(sample_every), 0)
+        self.max_profiles = max(int(max_profiles), 1)
+        self.top_n = int(top_n)
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.captured = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a profiler configured from PROFILE_* environment variables."""
+        return cls(
+            directory=os.environ.get('PROFILE_DIR', 'profiles'),
+            token=os.environ.get('PROFILE_TOKEN', ''),
+            sample_every=int(os.environ.get('PROFILE_SAMPLE_EVERY', 0)),
+            max_profiles=int(os.environ.get('PROFILE_MAX_FILES', 200)),
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.token) or self.sample_every > 0
+
+    def authorized(self, supplied):
+        """True if supplied matches the configured token (constant-time compare)."""
+        return bool(self.token) and bool(supplied) and hmac.compare_digest(str(supplied), self.token)
+
+    def start(self, headers, args, profile_caller=True):
+        """
+        Start profiling the current request if it asks for it or is sampled.
+
+        Args:
+            profile_caller (bool): profile the calling thread; False when only
+                                   work passed to ActiveProfile.run() should be
+
+        Returns:
+            ActiveProfile or None
+        """
+        if self.authorized(headers.get(PROFILE_HEADER) or args.get(PROFILE_QUERY_ARG)):
+            trigger = 'header'
+        elif self.sample_every and next(self._counter) % self.sample_every == 0:
+            trigger = 'sample'
+        else:
+            return None
+        active = ActiveProfile(trigger, profile_caller)
+        if active.profiler is None:
+            return active
+        try:
+            active.profiler.enable()
+        except ValueError:
+            # Another profiler owns the interpreter's profiling hook
+            with self._lock:
+                self.skipped += 1
+            return None
+        return active
+
+    def finish(self, active, method, path, query, status):
+        """Stop the profiler and write the profile plus its metadata; returns the metadata."""
+        if active.profiler is not None:
+            active.profiler.disable()
+        duration_ms = (time.perf_counter() - active.started) * 1000.0
+        profile_id = active.id
+
+        profilers = ([active.profiler] if active.profiler is not None else []) + active.workers
+        stats = pstats.Stats(*profilers)
+        meta = {
+            'id': profile_id,
+            'timestamp': active.wall_started,
+            'method': method,
+            'path': path,
+            'query': query,
+            'status': status,
+            'durationMs': round(duration_ms, 2),
+            'trigger': active.trigger,
+            'totalCalls': stats.total_calls,
+            'top': self._top_functions(stats),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile_id)
+        stats.dump_stats(base + '.prof')
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        with self._lock:
+            self.captured += 1
+        self._prune()
+        return meta
+
+    def _top_functions(self, stats):
+        """The top_n functions by cumulative time as plain dicts."""
+        rows = []
+        for (filename, line, name), (cc, nc, tt, ct, _) in stats.stats.items():
+            rows.append({'function': f'{os.path.basename(filename)}:{line}({name})',
+                         'calls': nc, 'totalMs': round(tt * 1000.0, 3), 'cumulativeMs': round(ct * 1000.0, 3)})
+        rows.sort(key=lambda r: r['cumulativeMs'], reverse=True)
+        return rows[:self.top_n]
+
+    def _prune(self):
+        """Delete the oldest profiles beyond max_profiles."""
+        for meta in self.list()[self.max_profiles:]:
+            for ext in ('.prof', '.json'):
+                try:
+                    os.remove(os.path.join(self.directory, meta['id'] + ext))
+                except OSError:
+                    pass
+
+    def list(self):
+        """Metadata of the stored profiles, newest first (without the top functions)."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        profiles = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta.pop('top', None)
+            profiles.append(meta)
+        profiles.sort(key=lambda m: m.get('timestamp', 0), reverse=True)
+        return profiles
+
+    def path(self, profile_id, ext='.prof'):
+        """File path of a stored profile, or None if the id is invalid or unknown."""
+        if not _PROFILE_ID.match(profile_id or ''):
+            return None
+        path = os.path.join(self.directory, profile_id + ext)
+        return path if os.path.exists(path) else None
+
+    def report(self, profile_id, sort='cumulative', limit=60):
+        """pstats text report of a stored profile (None if unknown)."""
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'directory': os.path.abspath(self.directory),
+                'headerTrigger': bool(self.token),
+                'sampleEvery': self.sample_every,
+                'captured': self.captured,
+                'skipped': self.skipped,
+            }
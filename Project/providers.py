@@ -0,0 +1,347 @@
+"""
+Upstream data providers for market data and news.
+
+Everything server.py needs from the internet goes through a provider object
+with four methods:
+
+    info(ticker)              -> dict           (yf.Ticker(t).info)
+    history(ticker, period)   -> DataFrame      (yf.Ticker(t).history(period=...))
+    download(tickers, period) -> DataFrame      (yf.download(tickers, period=...))
+    parse_feed(url)           -> FeedParserDict (feedparser.parse(url))
+
+Four implementations are available, picked with the FINSIGHT_PROVIDER
+environment variable:
+
+- live      (default) talks to Yahoo Finance and the RSS feed directly
+- record    calls the live upstream and saves every response to disk
+- replay    serves saved responses from disk with optional synthetic latency,
+            so load tests and benchmarks run offline and reproducibly
+- synthetic generates deterministic fake data for any ticker, for
+            benchmarks that need more symbols than were recorded
+
+StubSentimentPipeline is the matching stand-in for the sentiment model
+(FINSIGHT_SENTIMENT_MODEL=stub in server.py).
+
+Example:
+    FINSIGHT_PROVIDER=record python server.py     # click around the dashboard
+    FINSIGHT_PROVIDER=replay FINSIGHT_REPLAY_LATENCY_MS=150 python server.py
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import random
+import threading
+import time
+import zlib
+
+
+class YFinanceProvider:
+    """Live provider that talks to Yahoo Finance and the RSS feeds."""
+
+    def info(self, ticker):
+        # Imported here so replay mode works on machines without yfinance installed
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+    def history(self, ticker, period):
+        import yfinance as yf
+        return yf.Ticker(ticker).history(period=period)
+
+    def download(self, tickers, period):
+        import yfinance as yf
+        return yf.download(tickers, period=period, progress=False, threads=True)
+
+    def parse_feed(self, url):
+        import feedparser
+        return feedparser.parse(url)
+
+
+class ReplayMissError(KeyError):
+    """Raised in replay mode when no recording exists for a call."""
+
+
+def _feed_to_plain(feed):
+    """Keep only the parts of a parsed feed that server.py reads, as plain dicts."""
+    return {
+        'bozo': bool(feed.get('bozo', False)),
+        'entries': [dict(entry) for entry in feed.get('entries', [])],
+    }
+
+
+def _plain_to_feed(data):
+    """Rebuild a FeedParserDict (attribute access like entry.title) from a recording."""
+    import feedparser
+    return feedparser.FeedParserDict(
+        bozo=data['bozo'],
+        entries=[feedparser.FeedParserDict(entry) for entry in data['entries']],
+    )
+
+
+class RecordingStore:
+    """
+    On-disk store of recorded upstream responses.
+
+    Each call is saved as one pickle file named after the method and a hash
+    of its arguments, e.g. history-3f2a....pkl. The arguments are stored
+    alongside the value so recordings can be inspected.
+
+    Multi-ticker downloads are saved per ticker (download, ticker, period):
+    which tickers end up in one download depends on cache state and request
+    batching, so keying on the whole list would make replay depend on them.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(method, *args):
+        raw = json.dumps([method, *args], sort_keys=True, default=str)
+        return f"{method}-{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]}"
+
+    def _path(self, key):
+        return os.path.join(self.root, key + '.pkl')
+
+    def save(self, key, args, value):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path(key) + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'args': args, 'value': value}, f)
+            # Rename so a reader never sees a half-written file
+            os.replace(tmp_path, self._path(key))
+
+    def load(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return pickle.load(f)['value']
+        except FileNotFoundError:
+            raise ReplayMissError(key)
+
+
+class RecordingProvider:
+    """Calls another provider and saves every response to a RecordingStore."""
+
+    def __init__(self, inner, store):
+        self.inner = inner
+        self.store = store
+
+    def _record(self, method, args, value):
+        self.store.save(RecordingStore.key(method, *args), list(args), value)
+        return value
+
+    def info(self, ticker):
+        return self._record('info', (ticker,), self.inner.info(ticker))
+
+    def history(self, ticker, period):
+        return self._record('history', (ticker, period), self.inner.history(ticker, period))
+
+    def download(self, tickers, period):
+        from market_cache import split_download
+        tickers = list(tickers)
+        data = self.inner.download(tickers, period)
+        for ticker, frame in split_download(data, tickers).items():
+            self._record('download', (ticker, period), frame)
+        return data
+
+    def parse_feed(self, url):
+        feed = self.inner.parse_feed(url)
+        self._record('parse_feed', (url,), _feed_to_plain(feed))
+        return feed
+
+
+class ReplayProvider:
+    """
+    Serves recorded responses from a RecordingStore.
+
+    Args:
+        store (RecordingStore): where the recordings live
+        latency_ms (float): synthetic delay added to every call
+        jitter_ms (float): extra uniformly random delay in [0, jitter_ms]
+        seed (int): seed for the jitter, so benchmark runs are repeatable
+    """
+
+    def __init__(self, store, latency_ms=0.0, jitter_ms=0.0, seed=None):
+        self.store = store
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _sleep(self):
+        delay_ms = self.latency_ms
+        if self.jitter_ms > 0:
+            with self._rng_lock:
+                delay_ms += self._rng.uniform(0.0, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+
+    def _replay(self, method, *args):
+        self._sleep()
+        return self.store.load(RecordingStore.key(method, *args))
+
+    def _price_frame(self, ticker, period, first, second):
+        """
+        A ticker's recorded price frame from `first` ('history' or 'download'),
+        else from the other one: whether a ticker was fetched on its own or in
+        a batch depends on batching, not on what the request asked for.
+        """
+        try:
+            return self.store.load(RecordingStore.key(first, ticker, period))
+        except ReplayMissError:
+            return self.store.load(RecordingStore.key(second, ticker, period))
+
+    def info(self, ticker):
+        return self._replay('info', ticker)
+
+    def history(self, ticker, period):
+        self._sleep()
+        return self._price_frame(ticker, period, 'history', 'download')
+
+    def download(self, tickers, period):
+        """Rebuild a yf.download() frame ((field, ticker) columns) from per-ticker recordings."""
+        import pandas as pd
+        self._sleep()
+        frames = {ticker: self._price_frame(ticker, period, 'download', 'history') for ticker in tickers}
+        return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+    def parse_feed(self, url):
+        return _plain_to_feed(self._replay('parse_feed', url))
+
+
+# Business days covered by the yfinance period strings we use
+PERIOD_DAYS = {'1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252}
+
+
+class SyntheticProvider:
+    """
+    Generates deterministic fake market data and news for any ticker.
+
+    Prices are a seeded random walk per ticker, so the same ticker always
+    gets the same history. Every call sleeps latency_ms to mimic the
+    upstream round trip.
+    """
+
+    def __init__(self, latency_ms=0.0):
+        self.latency_ms = float(latency_ms)
+
+    def _sleep(self):
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+
+    @staticmethod
+    def _closes(ticker, n_days):
+        import numpy as np
+        rng = np.random.default_rng(zlib.crc32(ticker.encode('utf-8')))
+        start = rng.uniform(20, 500)
+        steps = rng.normal(0.0005, 0.015, size=300)
+        path = start * np.exp(np.cumsum(steps))
+        return path[-n_days:]
+
+    def _frame(self, ticker, period):
+        import numpy as np
+        import pandas as pd
+        n_days = PERIOD_DAYS.get(period, 5)
+        closes = self._closes(ticker, n_days)
+        index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=n_days, name='Date')
+        rng = np.random.default_rng(zlib.crc32(ticker.encode('utf-8')) + 1)
+        return pd.DataFrame({
+            'Open': closes * 0.998,
+            'High': closes * 1.01,
+            'Low': closes * 0.99,
+            'Close': closes,
+            'Volume': rng.integers(1_000_000, 50_000_000, size=n_days),
+        }, index=index)
+
+    def info(self, ticker):
+        self._sleep()
+        closes = self._closes(ticker, 252)
+        return {
+            'longName': f'{ticker} Holdings Inc.',
+            'previousClose': float(round(closes[-2], 2)),
+            'fiftyTwoWeekHigh': float(round(closes.max(), 2)),
+            'fiftyTwoWeekLow': float(round(closes.min(), 2)),
+            'marketCap': int(closes[-1] * 1e9),
+        }
+
+    def history(self, ticker, period):
+        self._sleep()
+        return self._frame(ticker, period)
+
+    def download(self, tickers, period):
+        import pandas as pd
+        self._sleep()
+        frames = {ticker: self._frame(ticker, period) for ticker in tickers}
+        # Same (field, ticker) column layout as yf.download
+        return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+    def parse_feed(self, url):
+        import feedparser
+        self._sleep()
+        ticker = url.split('s=')[-1].split('&')[0] if 's=' in url else 'MARKET'
+        moods = ['beats expectations and shares rally', 'misses estimates as shares fall',
+                 'holds steady ahead of earnings']
+        entries = [
+            feedparser.FeedParserDict(
+                title=f'{ticker} {moods[i % 3]} ({i})',
+                link=f'https://example.com/{ticker}/{i}',
+                published='Mon, 01 Jan 2024 10:00:00',
+                summary=f'{ticker} {moods[i % 3]} according to analysts covering {ticker}, story {i}.',
+            )
+            for i in range(10)
+        ]
+        return feedparser.FeedParserDict(bozo=False, entries=entries)
+
+
+class StubSentimentPipeline:
+    """
+    Keyword-based stand-in for the transformers sentiment pipeline.
+
+    Returns the same [{'label', 'score'}] shape as the real model and sleeps
+    latency_ms per call to mimic inference time. Used by load tests so they
+    don't need to download or run the real model.
+    """
+
+    POSITIVE = ('beat', 'rally', 'rallies', 'gain', 'surge', 'upgrade', 'record', 'strong')
+    NEGATIVE = ('miss', 'fall', 'falls', 'drop', 'plunge', 'downgrade', 'weak', 'lawsuit')
+
+    def __init__(self, latency_ms=0.0):
+        self.latency_ms = float(latency_ms)
+
+    def __call__(self, text):
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+        words = text.lower()
+        score = sum(w in words for w in self.POSITIVE) - sum(w in words for w in self.NEGATIVE)
+        label = 'POS' if score > 0 else 'NEG' if score < 0 else 'NEU'
+        return [{'label': label, 'score': 0.9 if score else 0.6}]
+
+
+def get_provider(mode=None):
+    """
+    Build the provider selected by FINSIGHT_PROVIDER (live, record, replay
+    or synthetic).
+
+    Recordings are kept in FINSIGHT_PROVIDER_DIR (default ./recordings).
+    Replay and synthetic latency is set with FINSIGHT_REPLAY_LATENCY_MS
+    (plus FINSIGHT_REPLAY_JITTER_MS for replay).
+    """
+    mode = (mode or os.environ.get('FINSIGHT_PROVIDER', 'live')).lower()
+    root = os.environ.get('FINSIGHT_PROVIDER_DIR', './recordings')
+
+    if mode == 'live':
+        return YFinanceProvider()
+    if mode == 'record':
+        return RecordingProvider(YFinanceProvider(), RecordingStore(root))
+    if mode == 'replay':
+        return ReplayProvider(
+            RecordingStore(root),
+            latency_ms=float(os.environ.get('FINSIGHT_REPLAY_LATENCY_MS', 0)),
+            jitter_ms=float(os.environ.get('FINSIGHT_REPLAY_JITTER_MS', 0)),
+            seed=int(os.environ.get('FINSIGHT_REPLAY_SEED', 0)),
+        )
+    if mode == 'synthetic':
+        return SyntheticProvider(latency_ms=float(os.environ.get('FINSIGHT_REPLAY_LATENCY_MS', 0)))
+    raise ValueError(f"unknown FINSIGHT_PROVIDER '{mode}' (expected live, record, replay or synthetic)")
@@ -0,0 +1,72 @@
+"""
+Versioned quote book for delta refreshes of /api/portfolio.
+
+Watchlists refresh by re-posting the same tickers every few seconds, and
+most entries are identical to the previous response. The book remembers the
+last entry served for each symbol together with a version number:
+
+- one counter per process, bumped whenever a symbol's entry changes, so
+  versions increase monotonically and "changed since version v" is a
+  comparison
+- a client sends the version (and epoch) of its last response and gets back
+  only the entries whose version is newer
+
+The epoch is a random id per book. Versions from another process (a
+restarted server, or another gunicorn worker) are meaningless here, so a
+request whose epoch doesn't match gets the full list instead of a delta.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+
+
+class QuoteBook:
+    """
+    Thread-safe symbol -> (version, entry) map with a global version counter.
+
+    Args:
+        max_entries (int): symbols kept; the least recently updated are
+                           dropped (a dropped symbol comes back with a new
+                           version, so clients just receive it again)
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = int(max_entries)
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        self._entries = OrderedDict()  # symbol -> (version, entry)
+        self._lock = threading.Lock()
+
+    def update(self, entries, key='ticker'):
+        """
+        Record the latest entries and return their versions.
+
+        An entry equal to the stored one keeps its version; anything else
+        gets a new one.
+
+        Returns:
+            tuple: (versions aligned with entries, book version after the update);
+                   every later change gets a version above the book version
+        """
+        versions = []
+        with self._lock:
+            for entry in entries:
+                symbol = entry[key]
+                stored = self._entries.get(symbol)
+                if stored is not None and stored[1] == entry:
+                    version = stored[0]
+                else:
+                    self.version += 1
+                    version = self.version
+                    self._entries[symbol] = (version, entry)
+                self._entries.move_to_end(symbol)
+                versions.append(version)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return versions, self.version
+
+    def stats(self):
+        with self._lock:
+            return {'epoch': self.epoch, 'version': self.version,
+                    'symbols': len(self._entries), 'maxEntries': self.max_entries}
@@ -0,0 +1,165 @@
+"""
+Server-side cache of rendered JSON responses for the GET endpoints.
+
+Each endpoint has its own TTL. Entries are keyed on the endpoint's
+normalized parameters (uppercase ticker, integer horizon, ...), store the
+encoded body once, and carry a strong ETag computed from that body. A client
+that sends the ETag back in If-None-Match gets a 304 without the server
+recomputing or re-encoding anything.
+
+Concurrent misses for the same key are coalesced through market_cache's
+TTLCache, so a burst of identical requests runs the computation once.
+"""
+
+import hashlib
+import os
+import time
+
+from market_cache import TTLCache
+from serialization import compress, dumps
+
+# Default TTL (seconds) per endpoint, overridable with RESPONSE_CACHE_TTL_<NAME>
+DEFAULT_TTLS = {
+    'predict': 30.0,
+    'forecast': 300.0,
+    'sentiment': 120.0,
+}
+
+
+class CachedResponse:
+    """An encoded JSON response body with its ETag."""
+
+    __slots__ = ('payload', 'body', 'etag', 'created_at', 'variants')
+
+    def __init__(self, payload, body):
+        self.payload = payload
+        self.body = body
+        # Strong validator: any change in the bytes changes the tag
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.created_at = time.time()
+        # Compressed copies of body, made on first request for each encoding
+        self.variants = {}
+
+    def variant(self, encoding):
+        """Body compressed with encoding ('br', 'gzip' or None), compressed only once."""
+        if encoding is None:
+            return self.body
+        data = self.variants.get(encoding)
+        if data is None:
+            data = compress(self.body, encoding)
+            self.variants[encoding] = data
+        return data
+
+    def variant_etag(self, encoding):
+        """Strong ETag of one representation (each encoding gets its own tag)."""
+        return self.etag if encoding is None else f'{self.etag}-{encoding}'
+
+
+class UncacheableResponse(Exception):
+    """
+    Raised by a compute function for a result that must not be cached
+    (errors, or partial results that ran out of latency budget).
+    """
+
+    def __init__(self, payload, status):
+        super().__init__(status)
+        self.payload = payload
+        self.status = status
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True if an If-None-Match header value matches the (unquoted) etag.
+
+    Used by the ASGI server; Flask does this with request.if_none_match.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    Per-endpoint TTL caches of CachedResponse objects.
+
+    Args:
+        ttls (dict): endpoint name -> TTL in seconds
+        max_entries (int): maximum entries per endpoint
+        encode: function turning a payload dict into response bytes
+    """
+
+    def __init__(self, ttls=None, max_entries=2048, encode=dumps, clock=time.monotonic):
+        ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.encode = encode
+        self.caches = {name: TTLCache(ttl, max_entries, clock) for name, ttl in ttls.items()}
+
+    @classmethod
+    def from_env(cls, encode=dumps):
+        """Build a cache with TTLs from RESPONSE_CACHE_TTL_<ENDPOINT> variables."""
+        ttls = {
+            name: float(os.environ.get(f'RESPONSE_CACHE_TTL_{name.upper()}', ttl))
+            for name, ttl in DEFAULT_TTLS.items()
+        }
+        return cls(ttls, max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 2048)),
+                   encode=encode)
+
+    def get_or_compute(self, endpoint, params, compute, coalesce=True):
+        """
+        Return the CachedResponse for (endpoint, params), computing it on a miss.
+
+        Args:
+            endpoint (str): one of the configured endpoint names
+            params (tuple): normalized, hashable request parameters
+            compute: function returning (payload, status)
+            coalesce (bool): share the computation with concurrent misses for
+                             the same key. Pass False when compute() depends
+                             on the caller (e.g. its latency budget): the miss
+                             is computed by this caller alone, and only a
+                             cacheable result is stored for later requests.
+
+        Raises:
+            UncacheableResponse: if compute() returned a non-200 status or
+                                 raised UncacheableResponse itself
+        """
+        cache = self.caches[endpoint]
+        if coalesce:
+            return cache.get_or_load(params, self._loader(compute))
+        entry = cache.lookup(params)
+        if entry is None:
+            entry = self._loader(compute)()
+            cache.put(params, entry)
+        return entry
+
+    def refresh(self, endpoint, params, compute):
+        """Recompute an entry before it expires, replacing the cached response."""
+        return self.caches[endpoint].refresh(params, self._loader(compute))
+
+    def _loader(self, compute):
+        def load():
+            payload, status = compute()
+            if status != 200:
+                raise UncacheableResponse(payload, status)
+            return CachedResponse(payload, self.encode(payload))
+        return load
+
+    def ttl(self, endpoint):
+        return self.caches[endpoint].ttl
+
+    def ttl_remaining(self, endpoint, params):
+        return self.caches[endpoint].ttl_remaining(params)
+
+    def invalidate(self, endpoint=None):
+        for name, cache in self.caches.items():
+            if endpoint is None or name == endpoint:
+                cache.invalidate()
+
+    def stats(self):
+        return {name: cache.stats() for name, cache in self.caches.items()}
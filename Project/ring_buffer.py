@@ -0,0 +1,194 @@
+"""
+Fixed-size in-memory history of recent bars per symbol.
+
+Getting the latest price used to mean building a DataFrame from the API
+response and calling xs(...).iloc[-1]. RecentBars keeps the last `capacity`
+bars of every symbol in preallocated NumPy arrays instead:
+
+- append() and latest() are O(1) and allocate nothing
+- window(n) returns the last n values as a zero-copy, read-only view, ready
+  for indicators (moving averages, returns, volatility, ...)
+- memory is fixed by capacity and max_symbols, however long the process runs
+
+Each column is stored twice back to back (a "mirrored" ring): a value
+written at slot i is also written at slot i + capacity. The last n values
+then always sit in one contiguous slice of the doubled array, so a window
+never needs to be stitched together from the two ends of the ring.
+
+Reads take the same lock as append(), so latest() never mixes two bars and
+a window's bounds are consistent. Views alias the buffer, though, so they
+change as new bars arrive. Copy a window (np.array(view)) if it has to
+outlive the next append.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+LatestBar = namedtuple('LatestBar', ('timestamp',) + FIELDS)
+
+
+def _to_ns(timestamp):
+    """Timestamp (pandas, datetime, datetime64 or int nanoseconds) as int64 ns."""
+    if isinstance(timestamp, (int, np.integer)):
+        return int(timestamp)
+    return pd.Timestamp(timestamp).value
+
+
+class RingBuffer:
+    """
+    Last `capacity` bars of one symbol.
+
+    Args:
+        capacity (int): number of bars kept (older bars are overwritten)
+    """
+
+    __slots__ = ('capacity', 'size', 'head', '_ts', '_values', '_lock')
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.capacity = int(capacity)
+        self.size = 0  # bars currently held (<= capacity)
+        self.head = 0  # slot the next bar is written to
+        self._ts = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._values = np.zeros((len(FIELDS), 2 * self.capacity), dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, open_, high, low, close, volume):
+        """Add a bar (O(1)). A bar with the same timestamp as the last one replaces it."""
+        ts = _to_ns(timestamp)
+        with self._lock:
+            if self.size and self._ts[self.head - 1 + self.capacity] == ts:
+                slot = (self.head - 1) % self.capacity  # update of the bar still being built
+            else:
+                slot = self.head
+                self.head = (self.head + 1) % self.capacity
+                self.size = min(self.size + 1, self.capacity)
+            mirror = slot + self.capacity
+            self._ts[slot] = self._ts[mirror] = ts
+            self._values[:, slot] = self._values[:, mirror] = (open_, high, low, close, volume)
+
+    def latest(self):
+        """The newest bar as a LatestBar, or None if empty (O(1))."""
+        with self._lock:
+            if not self.size:
+                return None
+            slot = self.head - 1 + self.capacity
+            ts, values = int(self._ts[slot]), self._values[:, slot].tolist()
+        return LatestBar(pd.Timestamp(ts), *values)
+
+    def _slice(self, n):
+        # Callers hold self._lock
+        n = self.size if n is None else min(int(n), self.size)
+        end = self.head + self.capacity
+        return slice(end - n, end)
+
+    def window(self, n=None, field='close'):
+        """
+        The last n values of a field, oldest first, as a read-only view (no copy).
+
+        Args:
+            n (int): number of bars (default: all held)
+            field (str): one of FIELDS, or 'timestamp' (int64 nanoseconds)
+        """
+        row = None if field == 'timestamp' else FIELDS.index(field)
+        with self._lock:
+            s = self._slice(n)
+        view = self._ts[s] if row is None else self._values[row, s]
+        view.flags.writeable = False
+        return view
+
+    def frame(self, n=None):
+        """The last n bars as a DataFrame (this one copies; for display and debugging)."""
+        with self._lock:
+            s = self._slice(n)
+            ts = self._ts[s].copy()
+            values = self._values[:, s].copy()
+        data = {'timestamp': pd.to_datetime(ts)}
+        data.update({field: values[i] for i, field in enumerate(FIELDS)})
+        return pd.DataFrame(data)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self._ts.nbytes + self._values.nbytes
+
+
+class RecentBars:
+    """
+    One RingBuffer per symbol, with a bounded number of symbols.
+
+    When more than max_symbols symbols are tracked, the one updated least
+    recently is dropped, so memory stays at about
+    max_symbols * capacity * 96 bytes.
+
+    Args:
+        capacity (int): bars kept per symbol
+        max_symbols (int): symbols kept at most
+    """
+
+    __slots__ = ('capacity', 'max_symbols', '_buffers', '_lock')
+
+    def __init__(self, capacity=1440, max_symbols=500):
+        self.capacity = int(capacity)
+        self.max_symbols = int(max_symbols)
+        self._buffers = OrderedDict()  # symbol -> RingBuffer, least recently updated first
+        self._lock = threading.Lock()
+
+    def _buffer_for_write(self, symbol):
+        with self._lock:
+            buffer = self._buffers.get(symbol)
+            if buffer is None:
+                buffer = RingBuffer(self.capacity)
+                self._buffers[symbol] = buffer
+                while len(self._buffers) > self.max_symbols:
+                    self._buffers.popitem(last=False)
+            else:
+                self._buffers.move_to_end(symbol)
+            return buffer
+
+    def append(self, symbol, timestamp, open_, high, low, close, volume):
+        self._buffer_for_write(symbol.upper()).append(timestamp, open_, high, low, close, volume)
+
+    def append_bars(self, bars):
+        """
+        Append many bars: a list of dicts (bar_aggregator output) or a
+        DataFrame with symbol, timestamp and OHLCV columns, oldest first.
+        """
+        rows = bars.to_dict('records') if isinstance(bars, pd.DataFrame) else bars
+        for bar in rows:
+            self.append(bar['symbol'], bar['timestamp'], bar['open'], bar['high'],
+                        bar['low'], bar['close'], bar['volume'])
+
+    def latest(self, symbol):
+        """Newest bar of a symbol (LatestBar) or None."""
+        buffer = self._buffers.get(symbol.upper())
+        return buffer.latest() if buffer is not None else None
+
+    def window(self, symbol, n=None, field='close'):
+        """Last n values of a field as a zero-copy view (empty array for unknown symbols)."""
+        buffer = self._buffers.get(symbol.upper())
+        if buffer is None:
+            return np.empty(0)
+        return buffer.window(n, field)
+
+    def frame(self, symbol, n=None):
+        buffer = self._buffers.get(symbol.upper())
+        return buffer.frame(n) if buffer is not None else pd.DataFrame(columns=('timestamp',) + FIELDS)
+
+    def symbols(self):
+        return list(self._buffers)
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self._buffers
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in list(self._buffers.values()))
@@ -0,0 +1,379 @@
+"""
+Portfolio risk from the historical price dataset.
+
+RiskModel keeps the covariance matrix of daily returns for the whole
+universe (every ticker in the parquet file or bar store) warm in memory:
+
+- RollingCovariance holds the last `window` daily return vectors in a ring
+  together with their running sums and cross-products, so a new daily bar
+  updates the matrix in O(N^2) instead of recomputing it from years of
+  returns
+- RiskModel.sync() checks the dataset version and feeds only the days after
+  the last one applied (read incrementally from a bar store)
+- portfolio_risk() then values any number of portfolios (a valuation
+  PositionBook) against the warm matrix: volatility is the quadratic form
+  w' S w, beta and contribution to risk come from S w
+
+Reported per portfolio: volatility, parametric (normal) and historical VaR
+and expected shortfall, beta against a benchmark, and each holding's share
+of the portfolio variance.
+
+Missing prices are forward-filled, so a ticker that did not trade (or was
+not listed yet) contributes a zero return for that day.
+
+Example:
+    model = RiskModel('stock_data_since_2016.parquet', window=252)
+    model.sync()
+    book = PositionBook.from_portfolios([{'id': 'me', 'holdings': {'AAPL': 10, 'MSFT': 5}}])
+    report = model.portfolio_risk(book, confidence=0.95, horizon_days=1)
+"""
+
+import os
+import threading
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from bar_store import BarStore, is_bar_store
+from forecast_model_final import dataset_version, load_dataset
+
+TRADING_DAYS = 252
+
+# Portfolios processed together when projecting on the covariance matrix
+# (bounds the size of the dense intermediates)
+CHUNK_ROWS = 4096
+
+
+class RollingCovariance:
+    """
+    Covariance of the last `window` return vectors, updated in place.
+
+    Args:
+        n_assets (int): length of each return vector
+        window (int): number of observations kept
+    """
+
+    def __init__(self, n_assets, window=TRADING_DAYS):
+        if window < 2:
+            raise ValueError('window must be at least 2')
+        self.n_assets = int(n_assets)
+        self.window = int(window)
+        self.count = 0
+        self._ring = np.zeros((self.window, self.n_assets))
+        self._head = 0  # row the next observation is written to
+        self._sum = np.zeros(self.n_assets)
+        self._cross = np.zeros((self.n_assets, self.n_assets))
+        self._since_rebuild = 0
+        self._cov = None
+
+    def update(self, returns):
+        """Add one observation, dropping the oldest once the window is full (O(N^2))."""
+        r = np.nan_to_num(np.asarray(returns, dtype=np.float64))
+        if self.count == self.window:
+            old = self._ring[self._head]
+            self._sum -= old
+            self._cross -= np.outer(old, old)
+        else:
+            self.count += 1
+        self._ring[self._head] = r
+        self._sum += r
+        self._cross += np.outer(r, r)
+        self._head = (self._head + 1) % self.window
+        self._cov = None
+        # Adding and removing accumulates rounding error; start over from the
+        # ring once per window
+        self._since_rebuild += 1
+        if self._since_rebuild >= self.window:
+            self._rebuild()
+
+    def extend(self, rows):
+        """Add many observations (oldest first)."""
+        rows = np.asarray(rows, dtype=np.float64)
+        if len(rows) >= self.window:
+            # Only the last `window` rows survive anyway: load them directly
+            rows = np.nan_to_num(rows[-self.window:])
+            self._ring[:] = rows
+            self._head = 0
+            self.count = self.window
+            self._rebuild()
+            return
+        for row in rows:
+            self.update(row)
+
+    def _rebuild(self):
+        r = self.returns()
+        self._sum = r.sum(axis=0)
+        self._cross = r.T @ r
+        self._since_rebuild = 0
+        self._cov = None
+
+    def returns(self):
+        """Observations in the window, oldest first (a copy)."""
+        if self.count < self.window:
+            return self._ring[:self.count].copy()
+        return np.concatenate([self._ring[self._head:], self._ring[:self._head]])
+
+    def mean(self):
+        return self._sum / max(self.count, 1)
+
+    def covariance(self):
+        """Sample covariance matrix (cached until the next update)."""
+        if self.count < 2:
+            return np.zeros((self.n_assets, self.n_assets))
+        if self._cov is None:
+            n = self.count
+            self._cov = (self._cross - np.outer(self._sum, self._sum) / n) / (n - 1)
+        return self._cov
+
+
+class RiskModel:
+    """
+    Warm return covariance for the dataset universe, plus portfolio risk.
+
+    Args:
+        parquet_path (str): parquet file or bar_store directory with daily bars
+        window (int): trading days of returns used for the estimates
+        benchmark (str): ticker used for beta; if it is not in the dataset,
+                         the equal-weighted average of the universe is used
+    """
+
+    def __init__(self, parquet_path, window=TRADING_DAYS, benchmark='SPY'):
+        self.parquet_path = parquet_path
+        self.window = int(window)
+        self.benchmark = benchmark.upper()
+        self.symbols = None
+        self.index = {}
+        self.cov = None  # RollingCovariance over symbols + benchmark (last column)
+        self.benchmark_in_universe = False
+        self.last_date = None
+        self.last_close = None
+        self.version = None
+        self.days_applied = 0
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, parquet_path):
+        """Settings from RISK_WINDOW and RISK_BENCHMARK."""
+        return cls(
+            parquet_path,
+            window=int(os.environ.get('RISK_WINDOW', TRADING_DAYS)),
+            benchmark=os.environ.get('RISK_BENCHMARK', 'SPY'),
+        )
+
+    # ----- keeping the matrix warm -----
+
+    def sync(self):
+        """
+        Bring the model up to date with the dataset.
+
+        Returns:
+            int: number of new trading days applied (0 if nothing changed)
+        """
+        version = dataset_version(self.parquet_path)
+        if version == self.version:
+            return 0
+        with self._lock:
+            if version == self.version:
+                return 0
+            if self.symbols is None:
+                applied = self._rebuild()
+            else:
+                closes = self._closes_since(self.last_date)
+                if set(closes.columns) - set(self.symbols):
+                    # New tickers change the shape of the matrix: start over
+                    applied = self._rebuild()
+                else:
+                    applied = self._apply(closes.reindex(columns=self.symbols))
+            self.version = version
+            return applied
+
+    def _rebuild(self):
+        groups = load_dataset(self.parquet_path)
+        closes = pd.concat(
+            {ticker: g.set_index('date')['close'] for ticker, g in groups.items()}, axis=1
+        ).sort_index()
+        closes = closes[~closes.index.duplicated(keep='last')]
+        self.symbols = [str(s) for s in closes.columns]
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.benchmark_in_universe = self.benchmark in self.index
+        self.cov = RollingCovariance(len(self.symbols) + 1, self.window)
+        self.last_close = np.full(len(self.symbols), np.nan)
+        self.last_date = None
+        self.days_applied = 0
+        self.rebuilds += 1
+        # One extra day: its close is the base of the first return
+        return self._apply(closes.tail(self.window + 1))
+
+    def _closes_since(self, after):
+        """Daily closes (dates x tickers) strictly after a date."""
+        start = after + pd.Timedelta(days=1)
+        if is_bar_store(self.parquet_path):
+            # Only the partitions from that month on are read
+            bars = BarStore(self.parquet_path).read(start=start, timeframe='1Day')
+            bars = bars.rename(columns={'timestamp': 'date', 'symbol': 'ticker'})
+        else:
+            groups = load_dataset(self.parquet_path)
+            bars = pd.concat([g[g['date'] >= start] for g in groups.values()])
+        if bars.empty:
+            return pd.DataFrame()
+        return bars.pivot_table(index='date', columns='ticker', values='close', aggfunc='last').sort_index()
+
+    def _apply(self, closes):
+        """Turn new daily closes into return vectors and feed the covariance."""
+        if closes.empty:
+            return 0
+        prices = closes.to_numpy(dtype=np.float64)
+        # Forward-fill from the last known close of each ticker
+        previous = self.last_close.copy()
+        filled = np.empty_like(prices)
+        for i, row in enumerate(prices):
+            previous = np.where(np.isnan(row), previous, row)
+            filled[i] = previous
+        base = np.vstack([self.last_close, filled[:-1]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = filled / base - 1.0
+        returns[~np.isfinite(returns)] = np.nan
+
+        if self.benchmark_in_universe:
+            market = returns[:, self.index[self.benchmark]]
+        else:
+            # Equal-weighted average of the tickers that have a return that day
+            valid = ~np.isnan(returns)
+            market = np.where(valid, returns, 0.0).sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+        rows = np.column_stack([returns, market])
+
+        # The first row of a rebuild only sets the base prices
+        if self.last_date is None:
+            rows = rows[1:]
+        self.cov.extend(rows)
+
+        self.last_close = filled[-1]
+        self.last_date = pd.Timestamp(closes.index[-1])
+        self.days_applied += len(rows)
+        return len(rows)
+
+    # ----- portfolio risk -----
+
+    def portfolio_risk(self, book, confidence=0.95, horizon_days=1):
+        """
+        Risk of every portfolio in a PositionBook.
+
+        Positions are valued at the last close in the dataset.
+
+        Args:
+            book (valuation.PositionBook): holdings (shares)
+            confidence (float): VaR / expected shortfall confidence level
+            horizon_days (int): horizon, scaled from daily with sqrt(time)
+
+        Returns:
+            list: one dict per portfolio (see server.get_portfolio_risk)
+        """
+        if not 0.5 < confidence < 1:
+            raise ValueError('confidence must be between 0.5 and 1')
+        if horizon_days < 1:
+            raise ValueError('horizonDays must be at least 1')
+        self.sync()
+
+        with self._lock:
+            if self.cov is None or self.cov.count < 2:
+                raise ValueError('not enough price history for risk estimates')
+            cov = self.cov.covariance()
+            mean = self.cov.mean()
+            history = self.cov.returns()
+            last_close = self.last_close.copy()
+
+        columns = np.array([self.index.get(t, -1) for t in book.tickers], dtype=np.int64)
+        known = np.flatnonzero(columns >= 0)
+        universe = columns[known]
+        bench = len(self.symbols)
+
+        # Position values and weights over the known tickers (sparse, portfolios x k)
+        shares = book.matrix[:, known]
+        values = (shares @ _diag(last_close[universe])).tocsr()
+        totals = np.asarray(values.sum(axis=1)).ravel()
+        with np.errstate(divide='ignore'):
+            inverse = np.where(totals != 0, 1.0 / totals, 0.0)
+        weights = (_diag(inverse) @ values).tocsr()
+
+        sigma = cov[np.ix_(universe, universe)]
+        sigma_bench = cov[universe, bench]
+        bench_var = cov[bench, bench]
+        mu = mean[universe]
+        sub_history = history[:, universe]
+
+        z = NormalDist().inv_cdf(confidence)
+        tail = NormalDist().pdf(z) / (1 - confidence)
+        scale = np.sqrt(horizon_days)
+        tail_rank = max(int(np.floor(len(history) * (1 - confidence))), 1)
+
+        results = []
+        for start in range(0, weights.shape[0], CHUNK_ROWS):
+            w = weights[start:start + CHUNK_ROWS]
+            sw = np.asarray(w @ sigma)  # S w for each portfolio (sigma is symmetric)
+            variance = np.asarray(w.multiply(sw).sum(axis=1)).ravel()
+            vol = np.sqrt(np.maximum(variance, 0.0))
+            drift = np.asarray(w @ mu).ravel()
+            beta = np.asarray(w @ sigma_bench).ravel() / bench_var if bench_var > 0 else np.zeros(w.shape[0])
+
+            # Historical simulation: portfolio returns over the window
+            pnl = np.asarray(w @ sub_history.T)  # portfolios x days
+            ordered = np.sort(pnl, axis=1)
+            hist_var = -ordered[:, tail_rank - 1] * scale
+            hist_es = -ordered[:, :tail_rank].mean(axis=1) * scale
+
+            # Share of the variance per holding: w_i (S w)_i / w' S w
+            rows_of = np.repeat(np.arange(w.shape[0]), np.diff(w.indptr))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                shares_of = np.where(variance[rows_of] > 0,
+                                     w.data * sw[rows_of, w.indices] / variance[rows_of], 0.0)
+            names = [self.symbols[universe[c]] for c in w.indices]
+            weight_list = np.round(w.data, 6).tolist()
+            share_list = np.round(shares_of, 6).tolist()
+
+            total = totals[start:start + w.shape[0]]
+            fields = zip(
+                np.round(total, 2).tolist(),
+                np.round(vol, 6).tolist(),
+                np.round(vol * np.sqrt(TRADING_DAYS), 6).tolist(),
+                np.round(total * (z * vol * scale - drift * horizon_days), 2).tolist(),
+                np.round(total * hist_var, 2).tolist(),
+                np.round(total * (tail * vol * scale - drift * horizon_days), 2).tolist(),
+                np.round(total * hist_es, 2).tolist(),
+                np.round(beta, 4).tolist(),
+            )
+            for j, (value, daily, annual, var_p, var_h, es_p, es_h, b) in enumerate(fields):
+                row = start + j
+                lo, hi = w.indptr[j], w.indptr[j + 1]
+                held = book.matrix.indices[book.matrix.indptr[row]:book.matrix.indptr[row + 1]]
+                results.append({
+                    'id': book.portfolio_ids[row],
+                    'value': value,
+                    'volatility': {'daily': daily, 'annual': annual},
+                    'var': {'parametric': var_p, 'historical': var_h},
+                    'expectedShortfall': {'parametric': es_p, 'historical': es_h},
+                    'beta': b,
+                    'contributions': {
+                        names[k]: {'weight': weight_list[k], 'riskContribution': share_list[k]}
+                        for k in range(lo, hi)
+                    },
+                    'missingTickers': [book.tickers[c] for c in held if columns[c] < 0],
+                })
+        return results
+
+    def stats(self):
+        return {
+            'symbols': len(self.symbols) if self.symbols is not None else 0,
+            'window': self.window,
+            'observations': self.cov.count if self.cov is not None else 0,
+            'asOf': self.last_date.isoformat() if self.last_date is not None else None,
+            'benchmark': self.benchmark if self.benchmark_in_universe else 'equal-weighted universe',
+            'daysApplied': self.days_applied,
+            'rebuilds': self.rebuilds,
+        }
+
+
+def _diag(values):
+    return sparse.diags(np.asarray(values, dtype=np.float64))
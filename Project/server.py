@@ -3,16 +3,12 @@
 # ============================================================================
 
 # Flask is the web framework used to create the API server
-from flask import Flask, request, jsonify
+# Routes live on a Blueprint so create_app() can build as many apps as needed
+from flask import Blueprint, Flask, Response, g, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 # CORS (Cross-Origin Resource Sharing) allows frontend apps from different domains to make requests
 from flask_cors import CORS
 
-# yfinance is used to fetch real-time stock market data from Yahoo Finance
-import yfinance as yf
-
-# feedparser is used to parse RSS feeds for financial news
-import feedparser
-
 # ssl module handles secure connections for RSS feed fetching
 import ssl
 
@@ -22,20 +18,74 @@ from transformers import pipeline
 # datetime utilities for timestamps and time-based calculations
 from datetime import datetime, timedelta
 
+# Standard library helpers for latency budgets, caching and background work
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
 # Import the forecast model for advanced stock predictions
-from forecast_model_final import run_forecast
+from forecast_model_final import run_forecast, load_dataset, load_ticker_index, model_cache_size
+
+# Company names for ticker search, learned from info lookups as they happen
+from ticker_index import TickerIndex, company_names
+
+# Historical price dataset used by the forecast model
+# FINSIGHT_PARQUET_PATH points it elsewhere: a bar_store.py directory kept up to
+# date by incremental ingestion, or a synthetic dataset for load tests
+PARQUET_PATH = os.environ.get('FINSIGHT_PARQUET_PATH', 'stock_data_since_2016.parquet')
+
+# TTL cache with request coalescing for yfinance lookups
+from market_cache import MarketDataCache
+
+# Upstream providers (live, record or replay) behind every yfinance/RSS call
+from providers import get_provider, StubSentimentPipeline
+from upstream_batcher import UpstreamBatcher
+
+# Cache of rendered GET responses with ETags
+from response_cache import ResponseCache, UncacheableResponse
+
+# Request popularity tracking and background refresh of hot tickers
+from prewarm import PopularityTracker, PrewarmJob, PrewarmScheduler
+
+# One upstream poller per symbol, pushed to clients over Server-Sent Events
+from price_hub import PriceHub, get_price_source
+
+# Fast JSON encoding (orjson when available) and gzip/brotli compression
+import serialization
+from serialization import negotiate_encoding, should_compress, compress, to_columnar
+
+# Sparse-matrix valuation of many portfolios at once
+import numpy as np
+from valuation import PositionBook, value_book, price_vectors
+
+# Portfolio risk against a warm, incrementally updated return covariance matrix
+from risk import RiskModel
+
+# Precomputed top-k correlated tickers ("similar stocks"), built offline by correlation_index.py
+from correlation_index import CorrelationIndexFile
+
+# Last served portfolio entry per symbol with versions, for delta refreshes
+from quote_book import QuoteBook
+
+# Opt-in cProfile capture of single requests (header trigger or 1-in-N sampling)
+from profiling import PROFILE_HEADER, PROFILE_QUERY_ARG, RequestProfiler
+
+# Layouts accepted by the "format" parameter of forecast and portfolio responses
+RESPONSE_FORMATS = ('rows', 'columnar')
+
+# Field order of a portfolio entry (used for the columnar layout)
+PORTFOLIO_FIELDS = ['ticker', 'company', 'currentPrice', 'previousClose', 'priceChange', 'volume']
 
 # ============================================================================
-# FLASK APP INITIALIZATION
+# API BLUEPRINT
 # ============================================================================
 
-# Create the Flask application instance
-app = Flask(__name__)
-
-# Enable CORS to allow requests from frontend applications running on different ports/domains
-# This is essential for React/Vue/Angular apps that typically run on localhost:3000
-# while the Flask server runs on localhost:5000
-CORS(app)
+# All API routes are registered on this blueprint
+# The Flask app itself is built by create_app() at the bottom of this file
+api = Blueprint('api', __name__)
 
 # ============================================================================
 # SSL CONFIGURATION
@@ -55,6 +105,9 @@ if hasattr(ssl, '_create_unverified_context'):
 # Initially set to None to enable lazy loading (load only when needed)
 sentiment_pipeline = None
 
+# Lock so that concurrent first requests don't load the model twice
+sentiment_pipeline_lock = threading.Lock()
+
 def get_sentiment_pipeline():
     """
     Lazy load the sentiment analysis model to avoid startup delays.
@@ -71,17 +124,209 @@ def get_sentiment_pipeline():
 
     # Check if the model has already been loaded
     if sentiment_pipeline is None:
-        # Load the BERTweet sentiment analysis model
-        # This model can classify text as positive (POS), negative (NEG), or neutral (NEU)
-        sentiment_pipeline = pipeline("sentiment-analysis",
-                                     model="finiteautomata/bertweet-base-sentiment-analysis")
+        with sentiment_pipeline_lock:
+            # Check again: another thread may have loaded it while we waited
+            if sentiment_pipeline is None and os.environ.get('FINSIGHT_SENTIMENT_MODEL') == 'stub':
+                # Keyword-based stand-in for load tests (see providers.py)
+                sentiment_pipeline = StubSentimentPipeline(
+                    latency_ms=float(os.environ.get('FINSIGHT_SENTIMENT_LATENCY_MS', 0)))
+            elif sentiment_pipeline is None:
+                # Load the BERTweet sentiment analysis model
+                # This model can classify text as positive (POS), negative (NEG), or neutral (NEU)
+                sentiment_pipeline = pipeline("sentiment-analysis",
+                                             model="finiteautomata/bertweet-base-sentiment-analysis")
     return sentiment_pipeline
 
+# ============================================================================
+# UPSTREAM PROVIDER AND MARKET DATA CACHE
+# ============================================================================
+
+# All Yahoo Finance and RSS calls go through this provider
+# Set FINSIGHT_PROVIDER=record to save real responses to disk, or
+# FINSIGHT_PROVIDER=replay to serve them offline (see providers.py)
+# Concurrent history lookups for different tickers are collected for a few
+# milliseconds and sent as one bulk download, and every upstream call goes
+# through a rate limiter with backoff (UPSTREAM_* settings, see upstream_batcher.py)
+provider = UpstreamBatcher.from_env(get_provider())
+
+# Shared cache in front of the yfinance info/history calls
+# TTLs and size are configured with MARKET_CACHE_QUOTE_TTL, MARKET_CACHE_INFO_TTL
+# and MARKET_CACHE_MAX_ENTRIES (see market_cache.py)
+market_cache = MarketDataCache.from_env(provider)
+
 # ============================================================================
 # API ENDPOINT: STOCK DATA AND PREDICTION
 # ============================================================================
 
-@app.route('/api/stock/predict', methods=['POST'])
+def ticker_index():
+    """
+    Sorted symbol index of the price dataset (rebuilt when the dataset changes).
+
+    Empty when the dataset is missing or unreadable (a fresh checkout has no
+    parquet file): predict then falls back to the moving-average trend,
+    forecasts answer 404 and search finds nothing, instead of failing with 500.
+    """
+    try:
+        return load_ticker_index(PARQUET_PATH)
+    except (OSError, ValueError):
+        return TickerIndex([])
+
+def unknown_ticker_response(ticker):
+    """404 body for a ticker the price dataset has no history for, with close matches."""
+    return {
+        'error': f'No data available for ticker {ticker}',
+        'suggestions': ticker_index().suggest(ticker)  # Close symbols, for typos
+    }, 404
+
+def run_quick_forecast(ticker):
+    """
+    Run the short-horizon forecast used by /api/stock/predict.
+
+    Returns:
+        dict: run_forecast() result, or None if the model failed
+              (the caller then falls back to a moving-average trend)
+    """
+    # Tickers outside the dataset have no history to fit: skip the model
+    if ticker not in ticker_index():
+        return None
+
+    try:
+        # Run the forecast model
+        # This will analyze historical data and generate predictions
+        # lags and per_rows are left to run_forecast: the per-ticker values
+        # tuned by hyperparam_sweep.py, or 10 lags over the last 5000 rows
+        return run_forecast(
+            ticker=ticker,
+            parquet_path=PARQUET_PATH,
+            lags=None,        # Previous days used for prediction (tuned)
+            horizon=5,        # Predict 5 days ahead for quick trend assessment
+            per_rows=None     # Rows of history used for fitting (tuned)
+        )
+    except Exception as forecast_error:
+        print(f"Forecast model error: {forecast_error}")
+        return None
+
+
+def build_stock_prediction(ticker, info, hist, forecast_result):
+    """
+    Build the /api/stock/predict response from already-fetched data.
+
+    Kept separate from the Flask handler so the async server (asgi_server.py)
+    can fetch the inputs concurrently and reuse the exact same response logic.
+
+    Args:
+        ticker (str): Uppercase stock ticker symbol
+        info (dict): Company info from the market data cache
+        hist (DataFrame): Last 5 days of prices
+        forecast_result (dict): run_quick_forecast() result, or None
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    # Check if we successfully got data
+    if hist.empty:
+        # Return 404 Not Found if no data is available (invalid ticker or data not available)
+        return {'error': 'Unable to fetch stock data'}, 404
+    company_names.learn(ticker, info.get('longName'))  # for ticker search
+
+    # ===== STEP 1: CALCULATE METRICS =====
+    # Get the most recent closing price (last row in the DataFrame)
+    # iloc[-1] gets the last row
+    current_price = hist['Close'].iloc[-1]
+
+    # Get yesterday's closing price for comparison
+    # Try to get it from info first, fallback to second-to-last historical price
+    previous_close = info.get('previousClose', hist['Close'].iloc[-2])
+
+    # Calculate the dollar change from previous close
+    price_change = current_price - previous_close
+
+    # Calculate the percentage change
+    # Formula: (change / previous) * 100
+    price_change_percent = (price_change / previous_close) * 100
+
+    # ===== STEP 2: PERFORM TREND PREDICTION =====
+    # Use the advanced forecast model to predict future prices and generate trading signals
+    if forecast_result is not None:
+        # Extract decision metrics from the forecast
+        decision = forecast_result['decision']
+
+        # Determine trend based on forecast model's buy signal and predicted return
+        # If buy signal is True and predicted return is positive, trend is bullish
+        if decision['buy'] and decision['pred_return_h'] > 0:
+            trend = 'bullish'
+        # If predicted return is significantly negative, trend is bearish
+        elif decision['pred_return_h'] < -0.02:  # More than 2% predicted decline
+            trend = 'bearish'
+        else:
+            trend = 'neutral'
+
+        # Add forecast-specific data
+        predicted_price = forecast_result['pred_last']
+        signal_strength = decision['signal_to_noise']
+
+    else:
+        # If forecast model failed, fall back to simple moving average
+        avg_5d = hist['Close'].mean()
+        trend = 'bullish' if current_price > avg_5d else 'bearish'
+        predicted_price = None
+        signal_strength = None
+
+    # ===== STEP 3: BUILD RESPONSE =====
+    # Create a dictionary with all the calculated data
+    response = {
+        'ticker': ticker,  # Stock symbol
+        'company': info.get('longName', ticker),  # Full company name, fallback to ticker if not available
+        'currentPrice': round(current_price, 2),  # Round to 2 decimal places for currency
+        'previousClose': round(previous_close, 2),
+        'priceChange': round(price_change, 2),
+        'priceChangePercent': round(price_change_percent, 2),
+        'volume': int(hist['Volume'].iloc[-1]),  # Number of shares traded today
+        'trend': trend,  # Our calculated trend (bullish/bearish/neutral)
+        'fiftyTwoWeekHigh': info.get('fiftyTwoWeekHigh'),  # Highest price in last 52 weeks
+        'fiftyTwoWeekLow': info.get('fiftyTwoWeekLow'),  # Lowest price in last 52 weeks
+        'marketCap': info.get('marketCap'),  # Total market value of the company
+        'timestamp': datetime.now().isoformat()  # When this data was generated
+    }
+
+    # Add forecast-specific fields if available
+    if predicted_price is not None:
+        response['predictedPrice'] = round(predicted_price, 2)
+        response['predictedChange'] = round(predicted_price - current_price, 2)
+        response['predictedChangePercent'] = round(((predicted_price - current_price) / current_price) * 100, 2)
+
+    if signal_strength is not None:
+        response['signalStrength'] = round(signal_strength, 2)
+
+    return response, 200
+
+def compute_stock_prediction(ticker):
+    """
+    Fetch market data for a ticker and build the /api/stock/predict response.
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    # Get general information about the stock (company name, market cap, etc.)
+    # info is a dictionary containing metadata about the stock
+    # Both lookups go through the market data cache, so concurrent requests
+    # for the same ticker share one upstream fetch
+    info = market_cache.get_info(ticker)
+
+    # Fetch historical price data for the last 5 days
+    # This returns a DataFrame with columns: Open, High, Low, Close, Volume
+    # We use 5 days to calculate the moving average for trend prediction
+    hist = market_cache.get_history(ticker, period='5d')
+
+    # Check if we successfully got data
+    if hist.empty:
+        # Return 404 Not Found if no data is available (invalid ticker or data not available)
+        return {'error': 'Unable to fetch stock data'}, 404
+
+    forecast_result = run_quick_forecast(ticker)
+    return build_stock_prediction(ticker, info, hist, forecast_result)
+
+@api.route('/api/stock/predict', methods=['POST'])
 def get_stock_data():
     """
     API endpoint to get current stock data and basic trend prediction.
@@ -123,108 +368,13 @@ def get_stock_data():
         if not ticker:
             # Return 400 Bad Request if no ticker is provided
             return jsonify({'error': 'Ticker symbol is required'}), 400
+        popularity.record(ticker)  # for background pre-warming
 
-        # ===== STEP 2: FETCH STOCK DATA =====
-        # Create a yfinance Ticker object for the requested stock
-        # This object provides access to all stock data and methods
-        stock = yf.Ticker(ticker)
-
-        # Get general information about the stock (company name, market cap, etc.)
-        # info is a dictionary containing metadata about the stock
-        info = stock.info
-
-        # Fetch historical price data for the last 5 days
-        # This returns a DataFrame with columns: Open, High, Low, Close, Volume
-        # We use 5 days to calculate the moving average for trend prediction
-        hist = stock.history(period='5d')
-
-        # Check if we successfully got data
-        if hist.empty:
-            # Return 404 Not Found if no data is available (invalid ticker or data not available)
-            return jsonify({'error': 'Unable to fetch stock data'}), 404
-
-        # ===== STEP 3: CALCULATE METRICS =====
-        # Get the most recent closing price (last row in the DataFrame)
-        # iloc[-1] gets the last row
-        current_price = hist['Close'].iloc[-1]
-
-        # Get yesterday's closing price for comparison
-        # Try to get it from info first, fallback to second-to-last historical price
-        previous_close = info.get('previousClose', hist['Close'].iloc[-2])
-
-        # Calculate the dollar change from previous close
-        price_change = current_price - previous_close
-
-        # Calculate the percentage change
-        # Formula: (change / previous) * 100
-        price_change_percent = (price_change / previous_close) * 100
-
-        # ===== STEP 4: PERFORM TREND PREDICTION =====
-        # Use the advanced forecast model to predict future prices and generate trading signals
-        try:
-            # Run the forecast model with default parameters
-            # This will analyze historical data and generate predictions
-            forecast_result = run_forecast(
-                ticker=ticker,
-                parquet_path='stock_data_since_2016.parquet',
-                lags=10,          # Use 10 previous days for prediction
-                horizon=5,        # Predict 5 days ahead for quick trend assessment
-                per_rows=5000     # Use last 5000 rows of historical data
-            )
-
-            # Extract decision metrics from the forecast
-            decision = forecast_result['decision']
-
-            # Determine trend based on forecast model's buy signal and predicted return
-            # If buy signal is True and predicted return is positive, trend is bullish
-            if decision['buy'] and decision['pred_return_h'] > 0:
-                trend = 'bullish'
-            # If predicted return is significantly negative, trend is bearish
-            elif decision['pred_return_h'] < -0.02:  # More than 2% predicted decline
-                trend = 'bearish'
-            else:
-                trend = 'neutral'
-
-            # Add forecast-specific data
-            predicted_price = forecast_result['pred_last']
-            signal_strength = decision['signal_to_noise']
-
-        except Exception as forecast_error:
-            # If forecast model fails, fall back to simple moving average
-            print(f"Forecast model error: {forecast_error}")
-            avg_5d = hist['Close'].mean()
-            trend = 'bullish' if current_price > avg_5d else 'bearish'
-            predicted_price = None
-            signal_strength = None
-
-        # ===== STEP 5: BUILD RESPONSE =====
-        # Create a dictionary with all the calculated data
-        response = {
-            'ticker': ticker,  # Stock symbol
-            'company': info.get('longName', ticker),  # Full company name, fallback to ticker if not available
-            'currentPrice': round(current_price, 2),  # Round to 2 decimal places for currency
-            'previousClose': round(previous_close, 2),
-            'priceChange': round(price_change, 2),
-            'priceChangePercent': round(price_change_percent, 2),
-            'volume': int(hist['Volume'].iloc[-1]),  # Number of shares traded today
-            'trend': trend,  # Our calculated trend (bullish/bearish/neutral)
-            'fiftyTwoWeekHigh': info.get('fiftyTwoWeekHigh'),  # Highest price in last 52 weeks
-            'fiftyTwoWeekLow': info.get('fiftyTwoWeekLow'),  # Lowest price in last 52 weeks
-            'marketCap': info.get('marketCap'),  # Total market value of the company
-            'timestamp': datetime.now().isoformat()  # When this data was generated
-        }
-
-        # Add forecast-specific fields if available
-        if predicted_price is not None:
-            response['predictedPrice'] = round(predicted_price, 2)
-            response['predictedChange'] = round(predicted_price - current_price, 2)
-            response['predictedChangePercent'] = round(((predicted_price - current_price) / current_price) * 100, 2)
-
-        if signal_strength is not None:
-            response['signalStrength'] = round(signal_strength, 2)
+        # ===== STEP 2: FETCH DATA, RUN FORECAST AND BUILD RESPONSE =====
+        response, status = compute_stock_prediction(ticker)
 
         # Return the response as JSON with 200 OK status
-        return jsonify(response)
+        return jsonify(response), status
 
     except Exception as e:
         # ===== ERROR HANDLING =====
@@ -236,7 +386,89 @@ def get_stock_data():
 # API ENDPOINT: DETAILED STOCK FORECAST
 # ============================================================================
 
-@app.route('/api/stock/forecast', methods=['POST'])
+# Upper bound on Monte Carlo paths per forecast request ("simulate")
+# 2000 paths x 20 days take a few milliseconds; the cap keeps one request
+# from tying up a CPU worker
+SIMULATE_MAX_PATHS = 20000
+
+
+def parse_simulate(value):
+    """
+    Validate the "simulate" parameter (number of Monte Carlo paths, 0 = off).
+
+    Raises:
+        ValueError: not an integer between 0 and SIMULATE_MAX_PATHS
+    """
+    if value is None or value == '':
+        return 0
+    try:
+        paths = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('simulate must be an integer')
+    if not 0 <= paths <= SIMULATE_MAX_PATHS:
+        raise ValueError(f'simulate must be between 0 and {SIMULATE_MAX_PATHS}')
+    return paths
+
+
+def build_detailed_forecast(ticker, horizon, lags, fmt='rows', simulate=0):
+    """
+    Run the forecast model and build the /api/stock/forecast response.
+
+    Args:
+        fmt (str): 'rows' (default) returns forecast as a list of
+                   {date, ticker, pred_close} objects; 'columnar' returns
+                   {ticker, dates: [...], pred_close: [...]}, which is much
+                   smaller because the ticker isn't repeated on every row
+        simulate (int): Monte Carlo paths (0 = off); adds 'simulation' with
+                        percentile bands and the decision uses them
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    # Run the advanced forecast model
+    try:
+        forecast_result = run_forecast(
+            ticker=ticker,
+            parquet_path=PARQUET_PATH,
+            lags=lags,
+            horizon=horizon,
+            per_rows=None,  # Tuned per ticker when available (see hyperparam_sweep.py)
+            simulate=simulate  # Bootstrapped residual paths for forecast bands
+        )
+    except Exception as forecast_error:
+        # If forecast fails, return error with 404
+        print(f"Forecast error for {ticker}: {forecast_error}")
+        return {'error': f'No data available for ticker {ticker}'}, 404
+
+    # Add timestamp to the response
+    forecast_result['timestamp'] = datetime.now().isoformat()
+
+    # Rename keys to match camelCase convention for frontend
+    response = {
+        'ticker': forecast_result['ticker'],
+        'lastClose': forecast_result['last_close'],
+        'predictedLast': forecast_result['pred_last'],
+        'horizon': forecast_result['horizon'],
+        'lags': forecast_result['lags'],
+        'perRows': forecast_result['per_rows'],  # Rows of history the model was fit on
+        'tuned': forecast_result['tuned'],  # True if lags and perRows both came from the sweep
+        'forecast': forecast_result['forecast'],
+        'decision': forecast_result['decision'],
+        'timestamp': forecast_result['timestamp']
+    }
+    if 'simulation' in forecast_result:
+        # Bands are lists aligned with the forecast dates
+        response['simulation'] = forecast_result['simulation']
+    if fmt == 'columnar':
+        response['format'] = 'columnar'
+        response['forecast'] = {
+            'ticker': forecast_result['ticker'],
+            'dates': [row['date'] for row in forecast_result['forecast']],
+            'pred_close': [row['pred_close'] for row in forecast_result['forecast']],
+        }
+    return response, 200
+
+@api.route('/api/stock/forecast', methods=['POST'])
 def get_detailed_forecast():
     """
     API endpoint to get detailed stock forecast with trading signals.
@@ -249,9 +481,17 @@ def get_detailed_forecast():
         {
             "ticker": "AAPL",       // Required: Stock ticker symbol
             "horizon": 20,          // Optional: Number of days to forecast (default: 20)
-            "lags": 10              // Optional: Number of historical days to use (default: 10)
+            "lags": 10,             // Optional: Number of historical days to use
+                                    //           (default: tuned per ticker, else 10; giving
+                                    //           lags turns the tuned settings off)
+            "format": "rows",       // Optional: "rows" (default) or "columnar"
+            "simulate": 2000        // Optional: Monte Carlo paths for forecast bands
+                                    //           (default: 0 = off, max SIMULATE_MAX_PATHS)
         }
 
+    With "format": "columnar" the forecast field becomes
+        {"ticker": "AAPL", "dates": [...], "pred_close": [...]}
+
     Response Format (JSON):
         {
             "ticker": "AAPL",
@@ -259,6 +499,8 @@ def get_detailed_forecast():
             "predictedLast": 178.30,
             "horizon": 20,
             "lags": 10,
+            "perRows": 5000,
+            "tuned": false,
             "forecast": [
                 {
                     "date": "2024-11-13",
@@ -278,8 +520,17 @@ def get_detailed_forecast():
                 "stop_loss_rel": -0.0234,
                 "take_profit_rel": 0.0468
             },
+            "simulation": {         // Only with "simulate" > 0
+                "paths": 2000,
+                "bands": {"p5": [...], "p25": [...], "p50": [...], "p75": [...], "p95": [...]},
+                "terminal_return": {"mean": 0.016, "std": 0.041, "prob_gain": 0.64, "p5": -0.05, ...},
+                "max_drawdown": {"mean": 0.031, "p5": 0.004, "p50": 0.025, "p95": 0.08, ...}
+            },
             "timestamp": "2024-11-12T10:30:00"
         }
+
+    With "simulate", uncert_h is the spread of the simulated horizon returns
+    and max_drawdown_pred the median drawdown over the simulated paths.
     """
     try:
         # ===== STEP 1: EXTRACT AND VALIDATE INPUT =====
@@ -289,42 +540,27 @@ def get_detailed_forecast():
         if not ticker:
             return jsonify({'error': 'Ticker symbol is required'}), 400
 
+        # Reject tickers without price history before any model work
+        # (binary search in the ticker index)
+        if ticker not in ticker_index():
+            response, status = unknown_ticker_response(ticker)
+            return jsonify(response), status
+        popularity.record(ticker)  # for background pre-warming
+
         # Optional parameters with defaults
         horizon = data.get('horizon', 20)
-        lags = data.get('lags', 10)
-
-        # ===== STEP 2: RUN FORECAST MODEL =====
-        # Run the advanced forecast model
+        lags = data.get('lags')  # None: tuned per ticker
+        fmt = data.get('format', 'rows')
+        if fmt not in RESPONSE_FORMATS:
+            return jsonify({'error': "format must be 'rows' or 'columnar'"}), 400
         try:
-            forecast_result = run_forecast(
-                ticker=ticker,
-                parquet_path='stock_data_since_2016.parquet',
-                lags=lags,
-                horizon=horizon,
-                per_rows=5000
-            )
-        except Exception as forecast_error:
-            # If forecast fails, return error with 404
-            print(f"Forecast error for {ticker}: {forecast_error}")
-            return jsonify({'error': f'No data available for ticker {ticker}'}), 404
-
-        # ===== STEP 3: BUILD RESPONSE =====
-        # Add timestamp to the response
-        forecast_result['timestamp'] = datetime.now().isoformat()
-
-        # Rename keys to match camelCase convention for frontend
-        response = {
-            'ticker': forecast_result['ticker'],
-            'lastClose': forecast_result['last_close'],
-            'predictedLast': forecast_result['pred_last'],
-            'horizon': forecast_result['horizon'],
-            'lags': forecast_result['lags'],
-            'forecast': forecast_result['forecast'],
-            'decision': forecast_result['decision'],
-            'timestamp': forecast_result['timestamp']
-        }
+            simulate = parse_simulate(data.get('simulate'))
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
 
-        return jsonify(response)
+        # ===== STEP 2: RUN FORECAST MODEL AND BUILD RESPONSE =====
+        response, status = build_detailed_forecast(ticker, horizon, lags, fmt, simulate)
+        return jsonify(response), status
 
     except ValueError as ve:
         # Handle specific forecast model errors (e.g., ticker not found)
@@ -335,11 +571,361 @@ def get_detailed_forecast():
         print(f"Unexpected error in forecast endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
+# ============================================================================
+# LATENCY BUDGETS
+# ============================================================================
+
+# Thread pool used to run blocking upstream I/O (RSS fetches, model loading)
+# so a request can stop waiting on it once its latency budget runs out.
+# Work that already started keeps running in the background and its result
+# is still cached for the next request; work still queued when the budget
+# runs out is cancelled so abandoned requests don't tie up the pool.
+io_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='io')
+
+# Name of the optional header a client can use instead of the "budgetMs" field
+LATENCY_BUDGET_HEADER = 'X-Latency-Budget-Ms'
+
+
+class Deadline:
+    """
+    Tracks how much of a request's latency budget is left.
+
+    A Deadline created without a budget never expires, so code paths that
+    accept a deadline behave exactly as before when the client doesn't ask
+    for one.
+    """
+
+    def __init__(self, budget_ms=None):
+        # time.monotonic() is not affected by system clock changes
+        self.expires_at = None if budget_ms is None else time.monotonic() + budget_ms / 1000.0
+
+    @property
+    def bounded(self):
+        return self.expires_at is not None
+
+    def remaining(self):
+        """Seconds left in the budget (None when there is no budget)."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+def parse_latency_budget(data, headers):
+    """
+    Read the latency budget for this request, in milliseconds.
+
+    The budget can be sent as a "budgetMs" field in the JSON body or as an
+    X-Latency-Budget-Ms header (the body wins if both are present).
+
+    Args:
+        data (dict): Parsed JSON body
+        headers: Request headers (anything with a .get() method)
+
+    Returns:
+        Deadline: the deadline for this request
+
+    Raises:
+        ValueError: if the budget is not a positive number
+    """
+    raw = data.get('budgetMs') if data else None
+    if raw is None:
+        raw = headers.get(LATENCY_BUDGET_HEADER)
+    if raw is None:
+        return Deadline()
+
+    try:
+        budget_ms = float(raw)
+    except (TypeError, ValueError):
+        raise ValueError('budgetMs must be a number of milliseconds')
+    if budget_ms <= 0:
+        raise ValueError('budgetMs must be greater than 0')
+    return Deadline(budget_ms)
+
+# ============================================================================
+# SENTIMENT CACHES
+# ============================================================================
+
+# Sentiment of every article text we have scored, keyed by a hash of the text.
+# When a request runs out of budget, articles that were scored by an earlier
+# request are served from here instead of being dropped.
+SENTIMENT_CACHE_SIZE = 5000
+article_sentiment_cache = OrderedDict()
+
+# Last successfully parsed feed entries per ticker.
+# Used when the feed fetch itself doesn't finish within the budget.
+last_feed_entries = {}
+
+# Protects both caches above (Flask may serve requests on several threads)
+sentiment_cache_lock = threading.Lock()
+
+
+def _sentiment_cache_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def get_cached_sentiment(text):
+    """Return the cached model output for this text, or None."""
+    key = _sentiment_cache_key(text)
+    with sentiment_cache_lock:
+        result = article_sentiment_cache.get(key)
+        if result is not None:
+            article_sentiment_cache.move_to_end(key)
+        return result
+
+
+def store_cached_sentiment(text, result):
+    """Remember the model output for this text, evicting the oldest entries."""
+    key = _sentiment_cache_key(text)
+    with sentiment_cache_lock:
+        article_sentiment_cache[key] = {'label': result['label'], 'score': float(result['score'])}
+        article_sentiment_cache.move_to_end(key)
+        while len(article_sentiment_cache) > SENTIMENT_CACHE_SIZE:
+            article_sentiment_cache.popitem(last=False)
+
+
+def fetch_news_entries(ticker, deadline):
+    """
+    Fetch the Yahoo Finance RSS entries for a ticker within the deadline.
+
+    Returns:
+        tuple: (entries, timed_out)
+               entries is None if the feed could not be parsed and nothing
+               was cached for this ticker.
+    """
+    # Construct the Yahoo Finance RSS feed URL for this ticker
+    rss_url = f'https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US'
+
+    # Run the fetch on the I/O pool so we can stop waiting when the budget is spent
+    # (and don't queue it at all if the budget is already gone)
+    feed = None
+    if not deadline.expired():
+        future = io_executor.submit(provider.parse_feed, rss_url)
+        try:
+            feed = future.result(timeout=deadline.remaining())
+        except FutureTimeout:
+            future.cancel()  # only succeeds while it is still queued
+
+    if feed is None:
+        # Fall back to the entries we saw last time for this ticker (if any)
+        with sentiment_cache_lock:
+            return last_feed_entries.get(ticker, []), True
+
+    # feed.bozo is True if there was a parsing error
+    if feed.bozo:
+        return None, False
+
+    with sentiment_cache_lock:
+        last_feed_entries[ticker] = feed.entries
+    return feed.entries, False
+
+
+def get_sentiment_pipeline_within(deadline):
+    """
+    Get the sentiment pipeline, waiting at most until the deadline.
+
+    Returns None if the model is still loading when the budget runs out.
+    Loading that already started continues in the background so later
+    requests find it warm.
+    """
+    if sentiment_pipeline is not None or not deadline.bounded:
+        return get_sentiment_pipeline()
+    if deadline.expired():
+        return None
+
+    future = io_executor.submit(get_sentiment_pipeline)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except FutureTimeout:
+        future.cancel()  # only succeeds while it is still queued
+        return None
+
+# ============================================================================
+# SENTIMENT ANALYSIS
+# ============================================================================
+
+def analyze_news_sentiment(ticker, keyword, deadline=None):
+    """
+    Fetch news for a ticker and score each article's sentiment.
+
+    Args:
+        ticker (str): Uppercase stock ticker symbol
+        keyword (str): Only articles mentioning this keyword are analyzed
+        deadline (Deadline): Optional latency budget covering the feed fetch
+                             and model inference
+
+    When the deadline runs out, the articles scored so far are returned along
+    with cached sentiment for the remaining articles where it exists, and
+    "partial" is set to True. The overall score is averaged over the articles
+    that actually have a model score (fresh or cached).
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    deadline = deadline or Deadline()
+
+    # ===== STEP 1: FETCH NEWS FEED =====
+    entries, partial = fetch_news_entries(ticker, deadline)
+    if entries is None:
+        return {'error': 'Unable to fetch news feed'}, 500
+
+    # ===== STEP 2: LOAD SENTIMENT MODEL =====
+    # Get the sentiment analysis pipeline (will lazy load if not already loaded)
+    # pipe is None if the model did not finish loading within the budget
+    pipe = get_sentiment_pipeline_within(deadline)
+
+    # ===== STEP 3: SCORE THE ARTICLES =====
+    return score_news_entries(ticker, keyword, entries, pipe, deadline, partial)
+
+
+def score_news_entries(ticker, keyword, entries, pipe, deadline, partial=False):
+    """
+    Score already-fetched feed entries and build the sentiment response.
+
+    Args:
+        entries (list): Feed entries from fetch_news_entries()
+        pipe: Sentiment pipeline, or None if the model isn't loaded yet
+              (only cached scores are used in that case)
+        partial (bool): True if the feed fetch already ran out of budget
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    if pipe is None:
+        partial = True
+
+    # ===== STEP 1: ANALYZE EACH ARTICLE =====
+    # Initialize lists and counters for processing articles
+    articles = []  # Will store article data with sentiment
+    total_score = 0  # Running sum of sentiment scores
+    num_articles = 0  # Count of articles analyzed (excluding neutral)
+    articles_pending = 0  # Articles that had neither a fresh nor a cached score
+
+    # Process the first 10 articles from the feed
+    # We limit to 10 to avoid processing too many articles and slowing down the response
+    for entry in entries[:10]:
+        # Filter articles by keyword if provided
+        # Skip articles that don't mention the keyword in their summary
+        summary_text = entry.get('summary', entry.title)
+        if keyword and keyword.lower() not in summary_text.lower():
+            continue
+
+        try:
+            # Use title if summary is empty or too short
+            text_to_analyze = summary_text if len(summary_text) > 20 else entry.title
+
+            # Truncate text to avoid model errors (max 512 tokens)
+            if len(text_to_analyze) > 500:
+                text_to_analyze = text_to_analyze[:500]
+
+            # Only run the model while there is budget left; otherwise use
+            # whatever an earlier request already computed for this article
+            cached = False
+            if pipe is not None and not deadline.expired():
+                # Returns: [{'label': 'POS'/'NEG'/'NEU', 'score': 0.0-1.0}]
+                sentiment = pipe(text_to_analyze)[0]
+                store_cached_sentiment(text_to_analyze, sentiment)
+            else:
+                partial = True
+                sentiment = get_cached_sentiment(text_to_analyze)
+                if sentiment is None:
+                    articles_pending += 1
+                    continue
+                cached = True
+
+            # ===== MAP MODEL OUTPUT TO BULLISH/BEARISH =====
+            # The model returns 'POS', 'NEG', or 'NEU' labels
+            # We map these to financial terms: bullish, bearish, neutral
+
+            if sentiment["label"] == 'POS':  # Positive sentiment
+                sentiment_label = 'bullish'
+                score = sentiment['score']  # Confidence score (0-1)
+                total_score += score  # Add to total (positive contribution)
+
+            elif sentiment["label"] == 'NEG':  # Negative sentiment
+                sentiment_label = 'bearish'
+                score = sentiment['score']
+                total_score -= score  # Subtract from total (negative contribution)
+
+            else:  # Neutral sentiment (NEU)
+                sentiment_label = 'neutral'
+                score = 0  # Neutral doesn't affect the score
+
+            # Only count positive and negative articles in our total
+            # Neutral articles are included in results but don't affect the overall score
+            num_articles += 1 if sentiment["label"] in ['POS', 'NEG'] else 0
+
+            # ===== BUILD ARTICLE OBJECT =====
+            # Create a dictionary with article information and sentiment
+            articles.append({
+                'title': entry.title,  # Article headline
+                'link': entry.link,  # URL to full article
+                'published': entry.get('published', 'Unknown'),  # Publication date/time
+                # Truncate summary to 200 characters to keep response size manageable
+                'summary': summary_text[:200] + '...' if len(summary_text) > 200 else summary_text,
+                'sentiment': sentiment_label,  # bullish/bearish/neutral
+                'confidence': round(sentiment['score'], 3),  # Model's confidence (0-1)
+                'cached': cached  # True if the score came from an earlier request
+            })
+
+        except Exception as e:
+            # If there's an error processing this article, log it and continue
+            # This ensures one bad article doesn't break the entire request
+            print(f"Error processing article: {e}")
+            import traceback
+            traceback.print_exc()
+            continue
+
+    # ===== STEP 2: CALCULATE OVERALL SENTIMENT =====
+    # Average the sentiment scores across all analyzed articles
+    if num_articles > 0:
+        # Calculate the average sentiment score
+        # Positive scores indicate bullish sentiment, negative scores indicate bearish
+        final_score = total_score / num_articles
+
+        # Classify overall sentiment based on score thresholds
+        # Score > 0.15: Strong positive sentiment = bullish
+        if final_score > 0.15:
+            overall_sentiment = "bullish"
+            recommendation = "Consider investing in this company."
+
+        # Score < -0.15: Strong negative sentiment = bearish
+        elif final_score < -0.15:
+            overall_sentiment = "bearish"
+            recommendation = "Consider avoiding investment in this company for now."
+
+        # Score between -0.15 and 0.15: Mixed or weak sentiment = neutral
+        else:
+            overall_sentiment = "neutral"
+            recommendation = "Hold or wait for more information before investing."
+    else:
+        # No articles were analyzed (all were neutral or filtered out)
+        final_score = 0
+        overall_sentiment = "neutral"
+        recommendation = "Insufficient data to make a recommendation."
+
+    # ===== STEP 3: BUILD RESPONSE =====
+    # Create the final response object with all data
+    response = {
+        'ticker': ticker,  # Stock symbol
+        'overallSentiment': overall_sentiment,  # bullish/bearish/neutral
+        'sentimentScore': round(final_score, 3),  # Average score
+        'articlesAnalyzed': num_articles,  # Number of articles analyzed
+        'recommendation': recommendation,  # Investment recommendation text
+        'articles': articles,  # Array of individual article sentiments
+        'partial': partial,  # True if the latency budget ran out before all articles were scored
+        'articlesPending': articles_pending,  # Articles left unscored because the budget ran out
+        'timestamp': datetime.now().isoformat()  # When this analysis was performed
+    }
+    return response, 200
+
 # ============================================================================
 # API ENDPOINT: NEWS SENTIMENT ANALYSIS
 # ============================================================================
 
-@app.route('/api/news/sentiment', methods=['POST'])
+@api.route('/api/news/sentiment', methods=['POST'])
 def get_news_sentiment():
     """
     API endpoint to analyze news sentiment for a given stock.
@@ -348,11 +934,16 @@ def get_news_sentiment():
     analyzes each article's sentiment using a pre-trained NLP model, and returns
     both individual article sentiments and an overall sentiment score.
 
+    Clients can pass a latency budget ("budgetMs" or the X-Latency-Budget-Ms
+    header) to get a best-effort answer: once the budget is spent the response
+    contains what was scored so far and "partial" is true.
+
     Request Format (JSON):
         POST /api/news/sentiment
         {
             "ticker": "AAPL",      // Required: Stock ticker symbol
-            "keyword": "apple"     // Optional: Filter articles by keyword
+            "keyword": "apple",    // Optional: Filter articles by keyword
+            "budgetMs": 800        // Optional: Latency budget in milliseconds
         }
 
     Response Format (JSON):
@@ -369,10 +960,13 @@ def get_news_sentiment():
                     "published": "Tue, 12 Nov 2024 10:30:00",
                     "summary": "Apple Inc. reported...",
                     "sentiment": "bullish",
-                    "confidence": 0.89
+                    "confidence": 0.89,
+                    "cached": false
                 },
                 ...
             ],
+            "partial": false,
+            "articlesPending": 0,
             "timestamp": "2024-11-12T10:30:00"
         }
     """
@@ -391,136 +985,19 @@ def get_news_sentiment():
         # Validate that a ticker was provided
         if not ticker:
             return jsonify({'error': 'Ticker symbol is required'}), 400
+        popularity.record(ticker)  # for background pre-warming
 
-        # ===== STEP 2: LOAD SENTIMENT MODEL =====
-        # Get the sentiment analysis pipeline (will lazy load if not already loaded)
-        pipe = get_sentiment_pipeline()
-
-        # ===== STEP 3: FETCH NEWS FEED =====
-        # Construct the Yahoo Finance RSS feed URL for this ticker
-        # This feed contains recent news articles about the stock
-        rss_url = f'https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US'
-
-        # Parse the RSS feed
-        # feedparser will fetch the XML and convert it to a Python dictionary
-        feed = feedparser.parse(rss_url)
-
-        # Check if there was an error parsing the feed
-        # feed.bozo is True if there was a parsing error
-        if feed.bozo:
-            return jsonify({'error': 'Unable to fetch news feed'}), 500
-
-        # ===== STEP 4: ANALYZE EACH ARTICLE =====
-        # Initialize lists and counters for processing articles
-        articles = []  # Will store article data with sentiment
-        total_score = 0  # Running sum of sentiment scores
-        num_articles = 0  # Count of articles analyzed (excluding neutral)
-
-        # Process the first 10 articles from the feed
-        # We limit to 10 to avoid processing too many articles and slowing down the response
-        for entry in feed.entries[:10]:
-            # Filter articles by keyword if provided
-            # Skip articles that don't mention the keyword in their summary
-            summary_text = entry.get('summary', entry.title)
-            if keyword and keyword.lower() not in summary_text.lower():
-                continue
-
-            try:
-                # Run the sentiment analysis model on the article summary
-                # Returns: [{'label': 'POS'/'NEG'/'NEU', 'score': 0.0-1.0}]
-                # Use title if summary is empty or too short
-                text_to_analyze = summary_text if len(summary_text) > 20 else entry.title
-
-                # Truncate text to avoid model errors (max 512 tokens)
-                if len(text_to_analyze) > 500:
-                    text_to_analyze = text_to_analyze[:500]
-
-                sentiment = pipe(text_to_analyze)[0]
-
-                # ===== MAP MODEL OUTPUT TO BULLISH/BEARISH =====
-                # The model returns 'POS', 'NEG', or 'NEU' labels
-                # We map these to financial terms: bullish, bearish, neutral
-
-                if sentiment["label"] == 'POS':  # Positive sentiment
-                    sentiment_label = 'bullish'
-                    score = sentiment['score']  # Confidence score (0-1)
-                    total_score += score  # Add to total (positive contribution)
-
-                elif sentiment["label"] == 'NEG':  # Negative sentiment
-                    sentiment_label = 'bearish'
-                    score = sentiment['score']
-                    total_score -= score  # Subtract from total (negative contribution)
-
-                else:  # Neutral sentiment (NEU)
-                    sentiment_label = 'neutral'
-                    score = 0  # Neutral doesn't affect the score
-
-                # Only count positive and negative articles in our total
-                # Neutral articles are included in results but don't affect the overall score
-                num_articles += 1 if sentiment["label"] in ['POS', 'NEG'] else 0
-
-                # ===== BUILD ARTICLE OBJECT =====
-                # Create a dictionary with article information and sentiment
-                articles.append({
-                    'title': entry.title,  # Article headline
-                    'link': entry.link,  # URL to full article
-                    'published': entry.get('published', 'Unknown'),  # Publication date/time
-                    # Truncate summary to 200 characters to keep response size manageable
-                    'summary': summary_text[:200] + '...' if len(summary_text) > 200 else summary_text,
-                    'sentiment': sentiment_label,  # bullish/bearish/neutral
-                    'confidence': round(sentiment['score'], 3)  # Model's confidence (0-1)
-                })
+        # Read the optional latency budget
+        try:
+            deadline = parse_latency_budget(data, request.headers)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
 
-            except Exception as e:
-                # If there's an error processing this article, log it and continue
-                # This ensures one bad article doesn't break the entire request
-                print(f"Error processing article: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
-
-        # ===== STEP 5: CALCULATE OVERALL SENTIMENT =====
-        # Average the sentiment scores across all analyzed articles
-        if num_articles > 0:
-            # Calculate the average sentiment score
-            # Positive scores indicate bullish sentiment, negative scores indicate bearish
-            final_score = total_score / num_articles
-
-            # Classify overall sentiment based on score thresholds
-            # Score > 0.15: Strong positive sentiment = bullish
-            if final_score > 0.15:
-                overall_sentiment = "bullish"
-                recommendation = "Consider investing in this company."
-
-            # Score < -0.15: Strong negative sentiment = bearish
-            elif final_score < -0.15:
-                overall_sentiment = "bearish"
-                recommendation = "Consider avoiding investment in this company for now."
-
-            # Score between -0.15 and 0.15: Mixed or weak sentiment = neutral
-            else:
-                overall_sentiment = "neutral"
-                recommendation = "Hold or wait for more information before investing."
-        else:
-            # No articles were analyzed (all were neutral or filtered out)
-            final_score = 0
-            overall_sentiment = "neutral"
-            recommendation = "Insufficient data to make a recommendation."
-
-        # ===== STEP 6: BUILD RESPONSE =====
-        # Create the final response object with all data
-        response = {
-            'ticker': ticker,  # Stock symbol
-            'overallSentiment': overall_sentiment,  # bullish/bearish/neutral
-            'sentimentScore': round(final_score, 3),  # Average score
-            'articlesAnalyzed': num_articles,  # Number of articles analyzed
-            'recommendation': recommendation,  # Investment recommendation text
-            'articles': articles,  # Array of individual article sentiments
-            'timestamp': datetime.now().isoformat()  # When this analysis was performed
-        }
+        # ===== STEP 2: ANALYZE NEWS =====
+        response, status = analyze_news_sentiment(ticker, keyword, deadline)
 
         # Return the response as JSON
-        return jsonify(response)
+        return jsonify(response), status
 
     except Exception as e:
         # ===== ERROR HANDLING =====
@@ -528,144 +1005,1619 @@ def get_news_sentiment():
         return jsonify({'error': str(e)}), 500
 
 # ============================================================================
-# API ENDPOINT: PORTFOLIO DATA
+# API ENDPOINT: COMBINED SIGNAL (QUOTE + FORECAST + SENTIMENT)
 # ============================================================================
 
-@app.route('/api/portfolio', methods=['POST'])
-def get_portfolio_data():
-    """
-    API endpoint to get current data for multiple stocks in a portfolio.
+# Runs the sub-computations of one signal request side by side. Separate from
+# io_executor because the sentiment task itself waits on io_executor (feed
+# fetch), and a pool must not block on work queued behind it.
+signal_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='signal')
 
-    This endpoint allows you to fetch data for multiple stocks in a single request,
-    which is more efficient than making individual requests for each stock.
-    Useful for displaying a portfolio overview or watchlist.
+# How much each component counts in the blended score. Components that are
+# missing (failed, no articles, out of budget) are left out and the
+# remaining weights are rescaled.
+SIGNAL_WEIGHTS = {'forecast': 0.5, 'sentiment': 0.3, 'momentum': 0.2}
 
-    Request Format (JSON):
-        POST /api/portfolio
-        {
-            "tickers": ["AAPL", "MSFT", "TSLA", "NVDA"]  // Array of stock ticker symbols
-        }
+# Blended scores beyond +/- this are bullish / bearish (same cut-off as sentiment)
+SIGNAL_THRESHOLD = 0.15
 
-    Response Format (JSON):
-        {
-            "portfolio": [
-                {
-                    "ticker": "AAPL",
-                    "company": "Apple Inc.",
-                    "currentPrice": 175.50,
-                    "previousClose": 174.20,
-                    "priceChange": 1.30,
-                    "volume": 50000000
-                },
-                {
-                    "ticker": "MSFT",
-                    "company": "Microsoft Corporation",
-                    "currentPrice": 380.25,
-                    "previousClose": 378.90,
-                    "priceChange": 1.35,
-                    "volume": 25000000
-                },
-                ...
-            ],
-            "timestamp": "2024-11-12T10:30:00"
-        }
-    """
-    try:
-        # ===== STEP 1: EXTRACT AND VALIDATE INPUT =====
-        # Get the JSON data from the request body
-        data = request.get_json()
+# Longest forecast horizon a signal request may ask for (one trading year);
+# the forecast is recursive, so its cost grows with the horizon
+SIGNAL_HORIZON_MAX = 252
 
-        # Extract the array of ticker symbols
-        tickers = data.get('tickers', [])
 
-        # Validate input
-        # - Ensure tickers is provided
-        # - Ensure tickers is actually a list (array)
-        if not tickers or not isinstance(tickers, list):
-            return jsonify({'error': 'Tickers array is required'}), 400
+def run_signal_forecast(ticker, horizon):
+    """Forecast fit for the signal endpoint (raises if the ticker has no history)."""
+    if ticker not in ticker_index():
+        raise ValueError(f'No price history for {ticker}')
+    return run_forecast(ticker=ticker, parquet_path=PARQUET_PATH, lags=None,
+                        horizon=horizon, per_rows=None)
 
-        # ===== STEP 2: FETCH DATA FOR EACH STOCK =====
-        # Initialize list to store portfolio data
-        portfolio_data = []
-
-        # Loop through each ticker symbol in the list
-        for ticker in tickers:
-            try:
-                # Create yfinance Ticker object for this stock
-                stock = yf.Ticker(ticker.upper())
-
-                # Get stock information (company name, previous close, etc.)
-                info = stock.info
-
-                # Get today's price data
-                # We only need 1 day of history to get current price
-                hist = stock.history(period='1d')
-
-                # Check if we got valid data
-                if not hist.empty:
-                    # Extract current price (most recent closing price)
-                    current_price = hist['Close'].iloc[-1]
-
-                    # Build stock data object
-                    portfolio_data.append({
-                        'ticker': ticker.upper(),  # Stock symbol
-                        'company': info.get('longName', ticker),  # Full company name
-                        'currentPrice': round(current_price, 2),  # Current price
-                        'previousClose': info.get('previousClose', 0),  # Yesterday's close
-                        # Calculate price change from previous close
-                        'priceChange': round(current_price - info.get('previousClose', 0), 2),
-                        'volume': int(hist['Volume'].iloc[-1])  # Trading volume today
-                    })
-
-            except Exception as e:
-                # If there's an error fetching data for this ticker, log it and continue
-                # This ensures one bad ticker doesn't break the entire portfolio request
-                print(f"Error fetching data for {ticker}: {e}")
-                continue
 
-        # ===== STEP 3: BUILD AND RETURN RESPONSE =====
-        # Return the array of stock data with timestamp
-        return jsonify({
-            'portfolio': portfolio_data,  # Array of stock data objects
-            'timestamp': datetime.now().isoformat()  # When this data was fetched
-        })
+def _timed(func, *args):
+    """Run func and return (result, milliseconds)."""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, round((time.perf_counter() - started) * 1000.0, 1)
 
-    except Exception as e:
-        # ===== ERROR HANDLING =====
-        # Catch any unexpected errors
-        return jsonify({'error': str(e)}), 500
 
-# ============================================================================
-# API ENDPOINT: HEALTH CHECK
-# ============================================================================
+def signal_tasks(ticker, keyword, horizon, deadline):
+    """The independent sub-computations of a signal request: name -> (func, *args)."""
+    return {
+        'info': (market_cache.get_info, ticker),
+        'history': (market_cache.get_history, ticker, '5d'),  # shared with /api/stock/predict
+        'forecast': (run_signal_forecast, ticker, horizon),
+        'sentiment': (analyze_news_sentiment, ticker, keyword, deadline),
+    }
 
-@app.route('/api/health', methods=['GET'])
-def health_check():
+
+def compute_signal(ticker, keyword, horizon, deadline):
     """
-    Simple health check endpoint to verify the server is running.
+    Run the quote fetch, forecast fit and sentiment analysis concurrently and
+    blend them (see build_signal). Latency is that of the slowest part, capped
+    by the deadline; parts that don't finish in time are reported as missing.
 
-    This endpoint is useful for:
-    - Monitoring tools to check if the server is alive
-    - Frontend to verify backend connectivity before making actual requests
-    - Load balancers to check server health
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    started = time.perf_counter()
+    futures = {name: signal_executor.submit(_timed, *task)
+               for name, task in signal_tasks(ticker, keyword, horizon, deadline).items()}
+    results, errors, timings = {}, {}, {}
+    for name, future in futures.items():
+        try:
+            results[name], timings[name] = future.result(timeout=deadline.remaining())
+        except FutureTimeout:
+            errors[name] = 'latency budget exceeded'
+        except Exception as e:
+            errors[name] = str(e)
+    timings['total'] = round((time.perf_counter() - started) * 1000.0, 1)
+    return build_signal(ticker, horizon, results, errors, timings)
 
-    Request Format:
-        GET /api/health
 
-    Response Format (JSON):
-        {
-            "status": "healthy",
-            "timestamp": "2024-11-12T10:30:00"
-        }
+def build_signal(ticker, horizon, results, errors, timings):
     """
-    return jsonify({
-        'status': 'healthy',  # Server status indicator
-        'timestamp': datetime.now().isoformat()  # Current server time
-    })
+    Blend the sub-results of a signal request into one response.
+
+    Each component is scored in [-1, 1]:
+    - forecast:  tanh(predicted horizon return / its uncertainty)
+    - sentiment: the average article sentiment score
+    - momentum:  tanh(today's % change / 2)
+    and the signal is their weighted average (SIGNAL_WEIGHTS).
+
+    The forecast's predicted return is also applied to the live quote
+    ("targetPrice"), since the model's last close comes from the dataset and
+    can be older than the quote.
+
+    Args:
+        results (dict): 'info', 'history', 'forecast', 'sentiment' results
+                        (missing keys for parts that failed or timed out)
+        errors (dict): part name -> error message
+        timings (dict): part name -> milliseconds
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    hist = results.get('history')
+    if hist is None or hist.empty:
+        return {'error': 'Unable to fetch stock data', 'errors': errors}, 404
+    info = results.get('info') or {}
+    company_names.learn(ticker, info.get('longName'))  # for ticker search
+
+    # ===== STEP 1: QUOTE AND MOMENTUM =====
+    current_price = float(hist['Close'].iloc[-1])
+    previous_close = info.get('previousClose')
+    if not previous_close:
+        previous_close = float(hist['Close'].iloc[-2]) if len(hist) > 1 else current_price
+    change_percent = (current_price / previous_close - 1.0) * 100.0 if previous_close else 0.0
+    components = {'momentum': {'score': float(np.tanh(change_percent / 2.0)),
+                               'priceChangePercent': round(change_percent, 2)}}
+
+    # ===== STEP 2: FORECAST =====
+    forecast_section = None
+    forecast_result = results.get('forecast')
+    if forecast_result is not None:
+        decision = forecast_result['decision']
+        pred_return = decision['pred_return_h']
+        uncert = decision['uncert_h']
+        components['forecast'] = {'score': float(np.tanh(pred_return / uncert)) if uncert > 0 else 0.0,
+                                  'predReturn': round(pred_return, 4),
+                                  'uncertainty': round(uncert, 4),
+                                  'buy': decision['buy']}
+        forecast_section = {
+            'horizon': forecast_result['horizon'],
+            'lastClose': forecast_result['last_close'],  # Last close in the dataset
+            'predictedLast': forecast_result['pred_last'],
+            'targetPrice': round(current_price * (1.0 + pred_return), 2),  # Predicted return on the live price
+            'forecast': forecast_result['forecast'],
+            'decision': decision,
+        }
+
+    # ===== STEP 3: SENTIMENT =====
+    sentiment = None
+    sentiment_partial = False
+    if 'sentiment' in results:
+        sentiment, status = results['sentiment']
+        if status != 200:
+            errors['sentiment'] = sentiment.get('error', 'sentiment analysis failed')
+            sentiment = None
+        else:
+            sentiment_partial = sentiment['partial']
+            if sentiment['articlesAnalyzed'] > 0:
+                components['sentiment'] = {'score': sentiment['sentimentScore'],
+                                           'articlesAnalyzed': sentiment['articlesAnalyzed']}
+
+    # Only now are all component errors known (a failed sentiment adds one above)
+    partial = bool(errors) or sentiment_partial
+
+    # ===== STEP 4: BLEND =====
+    total_weight = sum(SIGNAL_WEIGHTS[name] for name in components)
+    for name, component in components.items():
+        component['weight'] = round(SIGNAL_WEIGHTS[name] / total_weight, 3)
+        component['score'] = round(component['score'], 3)
+    score = sum(SIGNAL_WEIGHTS[name] * c['score'] for name, c in components.items()) / total_weight
+    if score > SIGNAL_THRESHOLD:
+        label = 'bullish'
+    elif score < -SIGNAL_THRESHOLD:
+        label = 'bearish'
+    else:
+        label = 'neutral'
+
+    return {
+        'ticker': ticker,
+        'company': info.get('longName', ticker),
+        'currentPrice': round(current_price, 2),
+        'previousClose': round(previous_close, 2),
+        'priceChangePercent': round(change_percent, 2),
+        'signal': {
+            'score': round(score, 3),  # Weighted blend in [-1, 1]
+            'label': label,  # bullish / bearish / neutral
+            'coverage': round(total_weight / sum(SIGNAL_WEIGHTS.values()), 3),  # Share of the weight that was available
+            'components': components,
+        },
+        'forecast': forecast_section,  # None if the model couldn't run
+        'sentiment': sentiment,  # Same body as /api/news/sentiment, None if it failed
+        'partial': partial,  # True if a part failed or ran out of budget
+        'errors': errors,
+        'timingsMs': timings,  # Per part; total is about the slowest, not the sum
+        'timestamp': datetime.now().isoformat()
+    }, 200
+
+@api.route('/api/stock/signal', methods=['POST'])
+def get_stock_signal():
+    """
+    Quote, forecast and news sentiment for a ticker in one round trip.
+
+    The three are computed concurrently and blended into one signal, so the
+    dashboard no longer calls predict, forecast and sentiment separately.
+
+    Request Format (JSON):
+        POST /api/stock/signal
+        {
+            "ticker": "AAPL",      // Required: Stock ticker symbol
+            "horizon": 20,         // Optional: Forecast days (default: 20, max: 252)
+            "keyword": "apple",    // Optional: News filter (default: ticker)
+            "budgetMs": 1500       // Optional: Latency budget for the whole request
+        }
+
+    Response Format (JSON):
+        {
+            "ticker": "AAPL",
+            "company": "Apple Inc.",
+            "currentPrice": 175.50,
+            "previousClose": 174.20,
+            "priceChangePercent": 0.75,
+            "signal": {
+                "score": 0.31,
+                "label": "bullish",
+                "coverage": 1.0,
+                "components": {
+                    "momentum": {"score": 0.36, "weight": 0.2, "priceChangePercent": 0.75},
+                    "forecast": {"score": 0.45, "weight": 0.5, "predReturn": 0.021, "uncertainty": 0.044, "buy": true},
+                    "sentiment": {"score": 0.12, "weight": 0.3, "articlesAnalyzed": 6}
+                }
+            },
+            "forecast": {"horizon": 20, "lastClose": 174.9, "predictedLast": 178.6,
+                         "targetPrice": 179.2, "forecast": [...], "decision": {...}},
+            "sentiment": {...},    // Same as /api/news/sentiment
+            "partial": false,
+            "errors": {},
+            "timingsMs": {"info": 80.1, "history": 95.3, "forecast": 140.2, "sentiment": 310.4, "total": 311.0},
+            "timestamp": "2024-11-12T10:30:00"
+        }
+    """
+    try:
+        # ===== STEP 1: EXTRACT AND VALIDATE INPUT =====
+        data = request.get_json(silent=True) or {}
+        ticker = str(data.get('ticker', '')).strip().upper()
+        if not ticker:
+            return jsonify({'error': 'Ticker symbol is required'}), 400
+        keyword = str(data.get('keyword', ticker)).lower()
+        try:
+            horizon = int(data.get('horizon', 20))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'horizon must be an integer'}), 400
+        try:
+            deadline = parse_latency_budget(data, request.headers)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        if not 1 <= horizon <= SIGNAL_HORIZON_MAX:
+            return jsonify({'error': f'horizon must be between 1 and {SIGNAL_HORIZON_MAX}'}), 400
+        popularity.record(ticker)  # for background pre-warming
+
+        # ===== STEP 2: RUN THE PARTS CONCURRENTLY AND BLEND =====
+        response, status = compute_signal(ticker, keyword, horizon, deadline)
+        return jsonify(response), status
+
+    except Exception as e:
+        print(f"Unexpected error in signal endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# CACHED GET ENDPOINTS (ETag / 304)
+# ============================================================================
+
+# Rendered responses for the GET variants of predict, forecast and sentiment
+# TTLs per endpoint: RESPONSE_CACHE_TTL_PREDICT / _FORECAST / _SENTIMENT (seconds)
+response_cache = ResponseCache.from_env()
+
+
+def cached_json_response(endpoint, params, compute, coalesce=True):
+    """
+    Serve a GET endpoint from the response cache.
+
+    The body is computed at most once per TTL for the same normalized
+    parameters. Every response carries a strong ETag; when the client sends
+    it back in If-None-Match we answer 304 Not Modified with no body.
+
+    Args:
+        endpoint (str): Response cache name ('predict', 'forecast', 'sentiment')
+        params (tuple): Normalized request parameters (the cache key)
+        compute: Function returning (payload, status) on a cache miss
+        coalesce (bool): Share the computation with concurrent identical
+                         requests (False for requests with a latency budget)
+    """
+    try:
+        entry = response_cache.get_or_compute(endpoint, params, compute, coalesce)
+    except UncacheableResponse as u:
+        # Errors and partial results are returned as-is and never cached
+        return jsonify(u.payload), u.status
+
+    # Compressed copies are kept on the cache entry, so a hit doesn't recompress
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if not should_compress(entry.body, encoding):
+        encoding = None
+    etag = entry.variant_etag(encoding)
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.variant(encoding), mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    # no-cache = the browser may keep it but must revalidate (and get a cheap 304)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _int_arg(name, default):
+    """Read an integer query parameter (raises ValueError if it isn't one)."""
+    raw = request.args.get(name)
+    if raw is None or raw == '':
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+
+
+@api.route('/api/stock/predict', methods=['GET'])
+def get_stock_data_cached():
+    """
+    Cacheable variant of POST /api/stock/predict.
+
+    Request Format:
+        GET /api/stock/predict?ticker=AAPL
+
+    Response Format: same JSON as the POST endpoint, plus an ETag header.
+    """
+    try:
+        ticker = request.args.get('ticker', '').strip().upper()
+        if not ticker:
+            return jsonify({'error': 'Ticker symbol is required'}), 400
+        popularity.record(ticker)  # for background pre-warming
+
+        return cached_json_response('predict', (ticker,),
+                                    lambda: compute_stock_prediction(ticker))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/stock/forecast', methods=['GET'])
+def get_detailed_forecast_cached():
+    """
+    Cacheable variant of POST /api/stock/forecast.
+
+    Request Format:
+        GET /api/stock/forecast?ticker=AAPL&horizon=20&lags=10&format=columnar&simulate=2000
+
+    Response Format: same JSON as the POST endpoint, plus an ETag header.
+    """
+    try:
+        ticker = request.args.get('ticker', '').strip().upper()
+        if not ticker:
+            return jsonify({'error': 'Ticker symbol is required'}), 400
+        if ticker not in ticker_index():
+            response, status = unknown_ticker_response(ticker)
+            return jsonify(response), status
+        popularity.record(ticker)  # for background pre-warming
+
+        try:
+            horizon = _int_arg('horizon', 20)
+            lags = _int_arg('lags', None)  # None: tuned per ticker
+            simulate = parse_simulate(request.args.get('simulate'))
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        fmt = request.args.get('format', 'rows')
+        if fmt not in RESPONSE_FORMATS:
+            return jsonify({'error': "format must be 'rows' or 'columnar'"}), 400
+
+        # Simulations use a fixed seed per ticker and day, so cached and
+        # recomputed responses (and their ETags) agree
+        return cached_json_response('forecast', (ticker, horizon, lags, fmt, simulate),
+                                    lambda: build_detailed_forecast(ticker, horizon, lags, fmt, simulate))
+
+    except Exception as e:
+        print(f"Unexpected error in forecast endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/news/sentiment', methods=['GET'])
+def get_news_sentiment_cached():
+    """
+    Cacheable variant of POST /api/news/sentiment.
+
+    Request Format:
+        GET /api/news/sentiment?ticker=AAPL&keyword=apple&budgetMs=800
+
+    Response Format: same JSON as the POST endpoint, plus an ETag header.
+    Partial results (latency budget ran out) are returned but not cached.
+
+    A request with a budget never waits on another request's computation
+    (which could outlast its budget), and a request without one never gets
+    another request's partial result: budgeted misses are computed on their
+    own and only complete results go into the cache.
+    """
+    try:
+        ticker = request.args.get('ticker', '').strip().upper()
+        if not ticker:
+            return jsonify({'error': 'Ticker symbol is required'}), 400
+        popularity.record(ticker)  # for background pre-warming
+        keyword = request.args.get('keyword', ticker).lower()
+
+        try:
+            deadline = parse_latency_budget(request.args, request.headers)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+
+        def compute():
+            payload, status = analyze_news_sentiment(ticker, keyword, deadline)
+            if status == 200 and payload.get('partial'):
+                raise UncacheableResponse(payload, status)
+            return payload, status
+
+        return cached_json_response('sentiment', (ticker, keyword), compute,
+                                    coalesce=not deadline.bounded)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# API ENDPOINT: TICKER SEARCH (AUTOCOMPLETE)
+# ============================================================================
+
+# Most results a search can return
+TICKER_SEARCH_MAX = 50
+
+@api.route('/api/tickers/search', methods=['GET'])
+def search_tickers():
+    """
+    API endpoint for ticker autocomplete over the symbols in the price dataset.
+
+    Matches are ranked: exact symbol, symbol prefix, company name prefix
+    (names are known once a ticker's info has been looked up, or from the
+    FINSIGHT_TICKER_NAMES file), then close symbols for typos. Lookups are
+    binary searches in a sorted index built once per dataset version.
+
+    Request Format:
+        GET /api/tickers/search?q=app&limit=10
+
+    Response Format (JSON):
+        {
+            "query": "app",
+            "results": [
+                {"symbol": "APP", "name": null, "match": "prefix"},
+                {"symbol": "AAPL", "name": "Apple Inc.", "match": "name"}
+            ],
+            "tickers": 5012   // Symbols in the index
+        }
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+        try:
+            limit = _int_arg('limit', 10)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not 1 <= limit <= TICKER_SEARCH_MAX:
+            return jsonify({'error': f'limit must be between 1 and {TICKER_SEARCH_MAX}'}), 400
+
+        index = ticker_index()
+        return jsonify({
+            'query': query,
+            'results': index.search(query, limit),
+            'tickers': len(index)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# API ENDPOINT: SIMILAR STOCKS
+# ============================================================================
+
+# Index file written by the offline job (python correlation_index.py ...)
+# Reloaded automatically when the job replaces it
+CORRELATION_INDEX_PATH = os.environ.get('FINSIGHT_CORRELATION_INDEX', 'correlation_index.npz')
+correlation_index = CorrelationIndexFile(CORRELATION_INDEX_PATH)
+
+# Most neighbors a request can ask for (the index may hold fewer)
+SIMILAR_MAX = 50
+
+def build_similar_stocks(ticker, n=10):
+    """
+    Build the /api/stock/similar response from the precomputed index.
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    index = correlation_index.get()
+    if index is None:
+        return {'error': 'Similar-stocks index has not been built yet'}, 503
+    if ticker not in index:
+        return {'error': f'No correlation data for {ticker}'}, 404
+
+    return {
+        'ticker': ticker,
+        'similar': index.neighbors(ticker, n),  # Highest correlation first
+        'lookbackDays': index.meta.get('lookbackDays'),  # Trading days of returns used
+        'asOf': index.meta.get('asOf'),  # Last day of the returns
+        'timestamp': datetime.now().isoformat()
+    }, 200
+
+@api.route('/api/stock/similar', methods=['GET'])
+def get_similar_stocks():
+    """
+    API endpoint for "similar stocks": the tickers whose daily returns are
+    most correlated with the requested one.
+
+    Correlations are computed offline for the whole universe (see
+    correlation_index.py), so a request is a dictionary lookup.
+
+    Request Format:
+        GET /api/stock/similar?ticker=AAPL&n=10
+
+    Response Format (JSON):
+        {
+            "ticker": "AAPL",
+            "similar": [
+                {"ticker": "MSFT", "correlation": 0.7213},
+                ...
+            ],
+            "lookbackDays": 756,
+            "asOf": "2025-03-14T00:00:00",
+            "timestamp": "2024-11-12T10:30:00"
+        }
+    """
+    try:
+        # ===== STEP 1: EXTRACT AND VALIDATE INPUT =====
+        ticker = request.args.get('ticker', '').strip().upper()
+        if not ticker:
+            return jsonify({'error': 'Ticker symbol is required'}), 400
+        try:
+            n = _int_arg('n', 10)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not 1 <= n <= SIMILAR_MAX:
+            return jsonify({'error': f'n must be between 1 and {SIMILAR_MAX}'}), 400
+
+        # ===== STEP 2: LOOK UP THE PRECOMPUTED NEIGHBORS =====
+        response, status = build_similar_stocks(ticker, n)
+        return jsonify(response), status
+
+    except Exception as e:
+        # ===== ERROR HANDLING =====
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# API ENDPOINT: PORTFOLIO DATA
+# ============================================================================
+
+# Versions of the portfolio entries served so far (see quote_book.py)
+# Clients send back "sinceVersion" and "epoch" to receive only what changed
+quote_book = QuoteBook(max_entries=int(os.environ.get('QUOTE_BOOK_MAX_ENTRIES', 10000)))
+
+
+def parse_sync_cursor(data):
+    """
+    Read the optional delta-refresh cursor of a portfolio request.
+
+    Returns:
+        tuple: (epoch, since_version), or None for a full refresh
+
+    Raises:
+        ValueError: if sinceVersion is not a non-negative integer
+    """
+    since = data.get('sinceVersion')
+    if since is None:
+        return None
+    if isinstance(since, bool) or not isinstance(since, int) or since < 0:
+        raise ValueError('sinceVersion must be a non-negative integer')
+    return str(data.get('epoch', '')), since
+
+
+def build_portfolio(tickers, histories, infos, fmt='rows', cursor=None):
+    """
+    Build the /api/portfolio response from bulk-fetched prices and info.
+
+    Args:
+        tickers (list): Ticker symbols as sent by the client
+        histories (dict): Uppercase ticker -> today's price history (or the exception raised)
+        infos (dict): Uppercase ticker -> company info (or the exception raised)
+        fmt (str): 'rows' (list of objects) or 'columnar' (one array per field)
+        cursor (tuple): (epoch, since_version) from parse_sync_cursor(); when
+                        the epoch matches this process's quote book, only
+                        entries that changed after since_version are returned
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    # Initialize list to store portfolio data
+    portfolio_data = []
+    failed = []  # Tickers whose data couldn't be fetched this time
+
+    # Build one entry per ticker, in the order they were requested
+    for ticker in tickers:
+        symbol = str(ticker).upper()
+        try:
+            # Get stock information (company name, previous close, etc.)
+            info = infos[symbol]
+            if isinstance(info, Exception):
+                raise info
+            company_names.learn(symbol, info.get('longName'))  # for ticker search
+
+            # Get today's price data
+            hist = histories[symbol]
+            if isinstance(hist, Exception):
+                raise hist
+
+            # Check if we got valid data
+            if not hist.empty:
+                # Extract current price (most recent closing price)
+                current_price = hist['Close'].iloc[-1]
+
+                # Build stock data object
+                portfolio_data.append({
+                    'ticker': symbol,  # Stock symbol
+                    'company': info.get('longName', symbol),  # Full company name
+                    'currentPrice': round(current_price, 2),  # Current price
+                    'previousClose': info.get('previousClose', 0),  # Yesterday's close
+                    # Calculate price change from previous close
+                    'priceChange': round(current_price - info.get('previousClose', 0), 2),
+                    'volume': int(hist['Volume'].iloc[-1])  # Trading volume today
+                })
+            else:
+                # No rows from upstream: report it like a failure so delta
+                # clients drop their old row instead of keeping stale data
+                failed.append(symbol)
+
+        except Exception as e:
+            # If there's an error fetching data for this ticker, log it and continue
+            # This ensures one bad ticker doesn't break the entire portfolio request
+            print(f"Error fetching data for {ticker}: {e}")
+            failed.append(symbol)
+            continue
+
+    # Version every entry; the returned version covers everything sent here.
+    # A failed ticker is versioned as an "unavailable" marker, so going from
+    # good data to a failure is a change that delta responses report too.
+    markers = [{'ticker': symbol, 'unavailable': True} for symbol in failed]
+    versions, version = quote_book.update(portfolio_data + markers)
+    versions, failed_versions = versions[:len(portfolio_data)], versions[len(portfolio_data):]
+    sync = {
+        'version': version,  # Send back as "sinceVersion" to get only changes
+        'epoch': quote_book.epoch,  # Send back as "epoch" with it
+        'delta': False,  # True if "portfolio" only holds entries that changed
+        'unavailable': failed,  # Tickers with no data now; drop their rows
+    }
+    if cursor is not None and cursor[0] == quote_book.epoch:
+        # Delta: drop the entries the client already has
+        since = cursor[1]
+        changed = [entry for entry, v in zip(portfolio_data, versions) if v > since]
+        sync['delta'] = True
+        sync['unchanged'] = len(portfolio_data) - len(changed)
+        sync['unavailable'] = [symbol for symbol, v in zip(failed, failed_versions) if v > since]
+        portfolio_data = changed
+
+    # Columnar: {"ticker": [...], "currentPrice": [...], ...} instead of repeated keys
+    if fmt == 'columnar':
+        return {
+            'format': 'columnar',
+            'portfolio': to_columnar(portfolio_data, keys=PORTFOLIO_FIELDS),
+            **sync,
+            'timestamp': datetime.now().isoformat()
+        }, 200
+
+    # Return the array of stock data with timestamp
+    return {
+        'portfolio': portfolio_data,  # Array of stock data objects
+        **sync,
+        'timestamp': datetime.now().isoformat()  # When this data was fetched
+    }, 200
+
+@api.route('/api/portfolio', methods=['POST'])
+def get_portfolio_data():
+    """
+    API endpoint to get current data for multiple stocks in a portfolio.
+
+    This endpoint allows you to fetch data for multiple stocks in a single request,
+    which is more efficient than making individual requests for each stock.
+    Useful for displaying a portfolio overview or watchlist.
+
+    Request Format (JSON):
+        POST /api/portfolio
+        {
+            "tickers": ["AAPL", "MSFT", "TSLA", "NVDA"],  // Array of stock ticker symbols
+            "format": "rows",                             // Optional: "rows" (default) or "columnar"
+            "sinceVersion": 1042,                         // Optional: "version" of the last response
+            "epoch": "3f9c2a1b7d4e"                       // Optional: "epoch" of the last response
+        }
+
+    With sinceVersion and a matching epoch, "portfolio" only contains the
+    tickers whose entry changed since that response ("delta": true). If the
+    epoch doesn't match (server restarted, or another worker answered), the
+    full list is returned ("delta": false) and the client replaces its data.
+    Send a full request (no sinceVersion) after changing the ticker list.
+
+    Response Format (JSON):
+        {
+            "portfolio": [
+                {
+                    "ticker": "AAPL",
+                    "company": "Apple Inc.",
+                    "currentPrice": 175.50,
+                    "previousClose": 174.20,
+                    "priceChange": 1.30,
+                    "volume": 50000000
+                },
+                {
+                    "ticker": "MSFT",
+                    "company": "Microsoft Corporation",
+                    "currentPrice": 380.25,
+                    "previousClose": 378.90,
+                    "priceChange": 1.35,
+                    "volume": 25000000
+                },
+                ...
+            ],
+            "version": 1057,
+            "epoch": "3f9c2a1b7d4e",
+            "delta": true,
+            "unchanged": 2,          // Only with "delta": true
+            "unavailable": ["XYZ"],  // Tickers that failed (with "delta": true, only newly failed ones)
+            "timestamp": "2024-11-12T10:30:00"
+        }
+
+    A ticker that can't be fetched is left out of "portfolio" and listed in
+    "unavailable", so a client applying a delta removes its old row instead
+    of showing stale data.
+    """
+    try:
+        # ===== STEP 1: EXTRACT AND VALIDATE INPUT =====
+        # Get the JSON data from the request body
+        data = request.get_json()
+
+        # Extract the array of ticker symbols
+        tickers = data.get('tickers', [])
+
+        # Validate input
+        # - Ensure tickers is provided
+        # - Ensure tickers is actually a list (array)
+        if not tickers or not isinstance(tickers, list):
+            return jsonify({'error': 'Tickers array is required'}), 400
+
+        # Optional response layout ("rows" or "columnar")
+        fmt = data.get('format', 'rows')
+        if fmt not in RESPONSE_FORMATS:
+            return jsonify({'error': "format must be 'rows' or 'columnar'"}), 400
+
+        # Optional delta refresh: only entries changed since the client's last response
+        try:
+            cursor = parse_sync_cursor(data)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+
+        # ===== STEP 2: FETCH DATA FOR ALL STOCKS AT ONCE =====
+        # Prices for every ticker come from a single bulk download (only the
+        # tickers missing from the cache are requested), and company info is
+        # looked up in parallel from the long-lived info cache.
+        # This keeps latency roughly flat as the portfolio grows.
+        symbols = [str(ticker).upper() for ticker in tickers]
+        histories = market_cache.get_histories(symbols, period='1d')
+        infos = market_cache.get_infos(symbols)
+
+        # ===== STEP 3: BUILD AND RETURN RESPONSE =====
+        response, status = build_portfolio(tickers, histories, infos, fmt, cursor)
+        return jsonify(response), status
+
+    except Exception as e:
+        # ===== ERROR HANDLING =====
+        # Catch any unexpected errors
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# API ENDPOINT: BULK PORTFOLIO VALUATION
+# ============================================================================
+
+# Field order of a valuation entry (used for the columnar layout)
+VALUATION_FIELDS = ['id', 'marketValue', 'previousValue', 'dayPnl', 'dayPnlPct', 'missingPrices']
+
+def parse_valuation_request(data):
+    """
+    Validate a /api/portfolio/valuation body and build its positions matrix.
+
+    Returns:
+        tuple: (PositionBook, include_weights, fmt)
+
+    Raises:
+        ValueError: with a message suitable for a 400 response
+    """
+    portfolios = data.get('portfolios')
+    if not portfolios or not isinstance(portfolios, list):
+        raise ValueError('Portfolios array is required')
+
+    fmt = data.get('format', 'rows')
+    if fmt not in RESPONSE_FORMATS:
+        raise ValueError("format must be 'rows' or 'columnar'")
+
+    return PositionBook.from_portfolios(portfolios), bool(data.get('includeWeights', False)), fmt
+
+def build_valuation(book, histories, include_weights=False, fmt='rows'):
+    """
+    Value every portfolio of the book with a few sparse matrix-vector products.
+
+    Args:
+        book (PositionBook): holdings of all requested portfolios
+        histories (dict): Uppercase ticker -> daily price history (last few days, or the exception raised)
+        include_weights (bool): add each holding's share of its portfolio value
+        fmt (str): 'rows' (list of objects) or 'columnar' (one array per field)
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    # One price and one previous close per distinct ticker, however many
+    # portfolios hold it
+    prices, previous_closes = price_vectors(book.tickers, histories)
+    result = value_book(book, prices, previous_closes, include_weights)
+
+    # Convert whole arrays at once; only the rows layout loops per portfolio
+    columns = {
+        'id': result.portfolio_ids,
+        'marketValue': np.round(result.market_value, 2).tolist(),
+        'previousValue': np.round(result.previous_value, 2).tolist(),
+        'dayPnl': np.round(result.day_pnl, 2).tolist(),
+        'dayPnlPct': np.round(result.day_pnl_pct, 4).tolist(),
+        'missingPrices': result.missing_prices.tolist(),
+    }
+    if include_weights:
+        columns['weights'] = [result.weights_of(row) for row in range(len(result.portfolio_ids))]
+
+    # Prices used, so clients can show them next to the totals
+    quotes = {
+        ticker: {
+            'price': None if np.isnan(price) else round(float(price), 4),
+            'previousClose': None if np.isnan(previous) else round(float(previous), 4),
+        }
+        for ticker, price, previous in zip(book.tickers, prices, previous_closes)
+    }
+
+    response = {
+        'count': len(result.portfolio_ids),
+        'prices': quotes,
+        'timestamp': datetime.now().isoformat()
+    }
+    if fmt == 'columnar':
+        response['format'] = 'columnar'
+        response['valuations'] = columns
+    else:
+        names = list(columns)
+        response['valuations'] = [dict(zip(names, values)) for values in zip(*columns.values())]
+    return response, 200
+
+@api.route('/api/portfolio/valuation', methods=['POST'])
+def get_portfolio_valuation():
+    """
+    API endpoint to value many portfolios in one request.
+
+    All holdings are put in one sparse positions matrix (portfolios x tickers),
+    each distinct ticker is priced once from its daily bars, and every
+    portfolio's market value and day P&L come out of a single matrix-vector
+    product. Built for bulk jobs (e.g. valuing every user's portfolio); the
+    pricing step is shared with the other endpoints through the market cache.
+
+    Request Format (JSON):
+        POST /api/portfolio/valuation
+        {
+            "portfolios": [
+                {"id": "user-1", "holdings": {"AAPL": 10, "MSFT": 5}},
+                {"id": "user-2", "holdings": {"AAPL": 3, "NVDA": 12}}
+            ],
+            "includeWeights": false,   // Optional: per-holding weights
+            "format": "rows"           // Optional: "rows" (default) or "columnar"
+        }
+
+    Response Format (JSON):
+        {
+            "count": 2,
+            "valuations": [
+                {
+                    "id": "user-1",
+                    "marketValue": 3651.25,
+                    "previousValue": 3630.10,
+                    "dayPnl": 21.15,
+                    "dayPnlPct": 0.5826,
+                    "missingPrices": 0      // Held tickers without a price (valued at 0)
+                },
+                ...
+            ],
+            "prices": {"AAPL": {"price": 175.5, "previousClose": 174.2}, ...},
+            "timestamp": "2024-11-12T10:30:00"
+        }
+    """
+    try:
+        # ===== STEP 1: EXTRACT AND VALIDATE INPUT =====
+        data = request.get_json() or {}
+        try:
+            book, include_weights, fmt = parse_valuation_request(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # ===== STEP 2: PRICE EACH DISTINCT TICKER ONCE =====
+        # Daily bars for the last few days give both the latest price and the
+        # previous close; misses are fetched with one bulk download
+        histories = market_cache.get_histories(book.tickers, period='5d')
+
+        # ===== STEP 3: VALUE ALL PORTFOLIOS AND RETURN =====
+        response, status = build_valuation(book, histories, include_weights, fmt)
+        return jsonify(response), status
+
+    except Exception as e:
+        # ===== ERROR HANDLING =====
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# API ENDPOINT: PORTFOLIO RISK
+# ============================================================================
+
+# Covariance of daily returns for every ticker in the price dataset, kept warm
+# and updated with only the new days when the dataset changes
+# (window and benchmark from RISK_WINDOW / RISK_BENCHMARK)
+risk_model = RiskModel.from_env(PARQUET_PATH)
+
+def parse_risk_request(data):
+    """
+    Validate a /api/portfolio/risk body.
+
+    Accepts either one portfolio ("holdings") or many ("portfolios", same
+    shape as /api/portfolio/valuation).
+
+    Returns:
+        tuple: (PositionBook, confidence, horizon_days)
+
+    Raises:
+        ValueError: with a message suitable for a 400 response
+    """
+    portfolios = data.get('portfolios')
+    if portfolios is None and isinstance(data.get('holdings'), dict):
+        portfolios = [{'id': 'portfolio', 'holdings': data['holdings']}]
+    if not portfolios or not isinstance(portfolios, list):
+        raise ValueError('Holdings object or portfolios array is required')
+
+    try:
+        confidence = float(data.get('confidence', 0.95))
+        horizon_days = int(data.get('horizonDays', 1))
+    except (TypeError, ValueError):
+        raise ValueError('confidence and horizonDays must be numbers')
+
+    return PositionBook.from_portfolios(portfolios), confidence, horizon_days
+
+def build_portfolio_risk(book, confidence=0.95, horizon_days=1):
+    """
+    Build the /api/portfolio/risk response.
+
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    try:
+        risk = risk_model.portfolio_risk(book, confidence, horizon_days)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except OSError:
+        # No dataset to estimate from (missing or unreadable parquet file)
+        return {'error': 'Price dataset unavailable'}, 503
+
+    return {
+        'risk': risk,
+        'confidence': confidence,
+        'horizonDays': horizon_days,
+        'model': risk_model.stats(),  # Window, benchmark and as-of date of the estimates
+        'timestamp': datetime.now().isoformat()
+    }, 200
+
+@api.route('/api/portfolio/risk', methods=['POST'])
+def get_portfolio_risk():
+    """
+    API endpoint for portfolio risk analytics.
+
+    Positions are valued at the last close in the price dataset, and risk is
+    estimated from the last RISK_WINDOW (default 252) daily returns:
+    - volatility: sqrt(w' S w) with S the cached return covariance matrix
+    - VaR / expected shortfall: parametric (normal) and historical simulation,
+      in dollars, scaled to the horizon with sqrt(time)
+    - beta against RISK_BENCHMARK (default SPY, or the equal-weighted universe)
+    - riskContribution: each holding's share of the portfolio variance (sums to 1)
+
+    Request Format (JSON):
+        POST /api/portfolio/risk
+        {
+            "holdings": {"AAPL": 10, "MSFT": 5},   // Or "portfolios": [{"id": ..., "holdings": {...}}, ...]
+            "confidence": 0.95,                      // Optional (default 0.95)
+            "horizonDays": 1                         // Optional (default 1)
+        }
+
+    Response Format (JSON):
+        {
+            "risk": [
+                {
+                    "id": "portfolio",
+                    "value": 5507.19,
+                    "volatility": {"daily": 0.0147, "annual": 0.2329},
+                    "var": {"parametric": 133.2, "historical": 140.5},
+                    "expectedShortfall": {"parametric": 167.0, "historical": 185.1},
+                    "beta": 0.48,
+                    "contributions": {"AAPL": {"weight": 0.56, "riskContribution": 0.60}, ...},
+                    "missingTickers": []             // Not in the price dataset (left out)
+                }
+            ],
+            "confidence": 0.95,
+            "horizonDays": 1,
+            "model": {"symbols": 51, "window": 252, "asOf": "2025-03-14T00:00:00", ...},
+            "timestamp": "2024-11-12T10:30:00"
+        }
+    """
+    try:
+        # ===== STEP 1: EXTRACT AND VALIDATE INPUT =====
+        data = request.get_json() or {}
+        try:
+            book, confidence, horizon_days = parse_risk_request(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # ===== STEP 2: QUADRATIC FORMS AGAINST THE WARM COVARIANCE MATRIX =====
+        # portfolio_risk() first applies any new daily bars to the matrix
+        response, status = build_portfolio_risk(book, confidence, horizon_days)
+        return jsonify(response), status
+
+    except Exception as e:
+        # ===== ERROR HANDLING =====
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# API ENDPOINT: LIVE PRICE STREAM (SERVER-SENT EVENTS)
+# ============================================================================
+
+# Shared by every stream: each symbol is polled once per interval no matter
+# how many clients watch it. Polls go through `provider` (the upstream
+# batcher), so they share one rate limit with the API's own upstream calls.
+# PRICE_HUB_SOURCE=simulated serves random-walk prices without any network
+# access (see price_hub.py).
+price_hub = PriceHub.from_env(get_price_source(provider))
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {serialization.dumps(data).decode('utf-8')}\n\n"
+
+
+def price_stream(subscription):
+    """
+    Yield SSE messages for a subscription until the client goes away.
+
+    A comment line is sent after every `heartbeat` seconds without updates;
+    writing it is also how a disconnected client is noticed.
+    """
+    try:
+        # Ask the browser's EventSource to reconnect after 3 seconds if dropped
+        yield 'retry: 3000\n\n'
+        while True:
+            update = subscription.get(timeout=price_hub.heartbeat)
+            if subscription.closed:
+                break
+            if update is None:
+                yield ': heartbeat\n\n'
+            else:
+                yield sse_event('price', update)
+    finally:
+        # Runs when the client disconnects (the server closes the generator)
+        price_hub.unsubscribe(subscription)
+
+
+def parse_stream_symbols(raw):
+    """Split the comma-separated symbols parameter (e.g. "SPY,QQQ,BTC/USD")."""
+    return [s for s in (raw or '').split(',') if s.strip()]
+
+
+# Headers for event streams: never cache, and tell nginx not to buffer
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+# Under Flask/gunicorn every open stream holds a worker thread for as long as
+# the dashboard is open (gunicorn.conf.py: FINSIGHT_THREADS threads per worker).
+# Without a cap a handful of open tabs would leave no thread for API requests,
+# so each process serves at most SSE_MAX_STREAMS streams (default: half its
+# threads) and answers 503 beyond that. asgi_server.py serves streams as
+# coroutines and has no such limit, so that's the server to use for many
+# dashboards.
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS',
+                                     max(1, int(os.environ.get('FINSIGHT_THREADS', 4)) // 2)))
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+@api.route('/api/stream/prices', methods=['GET'])
+def stream_prices():
+    """
+    Stream live prices for a set of symbols as Server-Sent Events.
+
+    Replaces polling /api/portfolio from every browser tab: the server polls
+    each symbol once and pushes changes to every subscriber.
+
+    Request Format:
+        GET /api/stream/prices?symbols=SPY,QQQ,DIA
+
+    Response Format (text/event-stream):
+        event: price
+        data: {"symbol": "SPY", "price": 512.3, "volume": 1200, "asOf": "...", "publishedAt": 1731400000.1}
+
+        : heartbeat
+
+    The latest known price of each symbol is sent immediately. A slow
+    client gets only the newest price per symbol, never a growing backlog.
+
+    Each stream holds one of the SSE_MAX_STREAMS slots of this process;
+    once they are taken the request gets 503 (EventSource retries later).
+    """
+    # ===== STEP 1: TAKE A STREAM SLOT (keeps threads free for the API) =====
+    if not sse_slots.acquire(blocking=False):
+        return jsonify({'error': 'too many open price streams, try again later'}), 503
+
+    # ===== STEP 2: SUBSCRIBE =====
+    try:
+        subscription = price_hub.subscribe(parse_stream_symbols(request.args.get('symbols')))
+    except ValueError as ve:
+        sse_slots.release()
+        return jsonify({'error': str(ve)}), 400
+    except OverflowError as oe:
+        sse_slots.release()
+        return jsonify({'error': str(oe)}), 503
+
+    # ===== STEP 3: STREAM =====
+    # The slot is released when the server closes the response, which also
+    # happens when the client disconnects before the first message
+    response = Response(price_stream(subscription), mimetype='text/event-stream', headers=SSE_HEADERS)
+    response.call_on_close(sse_slots.release)
+    return response
+
+# ============================================================================
+# API ENDPOINT: HEALTH CHECK
+# ============================================================================
+
+def build_health():
+    """
+    Build the /api/health response.
+
+    Returns:
+        tuple: (response dict, 200 when ready or 503 while warming up / after a failed warm-up)
+    """
+    ready, components = readiness()
+    if ready:
+        status = 'healthy'
+    elif any(info['state'] == 'failed' for info in components.values()):
+        status = 'degraded'
+    else:
+        status = 'starting'
+    return {
+        'status': status,  # healthy / starting (warming up) / degraded (warm-up failed)
+        'ready': ready,  # False until every preloaded component is warm
+        'components': components,  # Warm-up state of each component
+        'forecastModelsCached': model_cache_size(),  # Fitted models in memory
+        'marketDataCache': market_cache.stats(),  # Hit/miss counters for the yfinance cache
+        'upstream': provider.stats(),  # Batch sizes, throttling and rate limiter waits
+        'responseCache': response_cache.stats(),  # Hit/miss counters for the GET response cache
+        'prewarm': prewarm_scheduler.stats(),  # Hot tickers and background refresh counters
+        'priceHub': price_hub.stats(),  # Live price stream subscribers and pollers
+        'risk': risk_model.stats(),  # Covariance window and as-of date of the risk model
+        'correlationIndex': correlation_index.stats(),  # Similar-stocks index build info
+        'quoteBook': quote_book.stats(),  # Epoch and version of the portfolio delta protocol
+        'timestamp': datetime.now().isoformat()  # Current server time
+    }, 200 if ready else 503
+
+@api.route('/api/health', methods=['GET'])
+def health_check():
+    """
+    Simple health check endpoint to verify the server is running.
+
+    This endpoint is useful for:
+    - Monitoring tools to check if the server is alive
+    - Frontend to verify backend connectivity before making actual requests
+    - Load balancers to check server health
+
+    Returns 503 until the server is ready, so load balancers only route to
+    workers whose preloaded components are warm.
+
+    Request Format:
+        GET /api/health
+
+    Response Format (JSON):
+        {
+            "status": "healthy",
+            "ready": true,
+            "components": {
+                "sentimentModel": {"state": "ready", "seconds": 4.2},
+                "priceDataset": {"state": "ready", "tickers": 500, "seconds": 1.1},
+                "riskModel": {"state": "ready", "seconds": 0.4},
+                "forecastModels": {"state": "ready", "tickers": ["AAPL", ...], "seconds": 0.9}
+            },
+            "forecastModelsCached": 8,
+            "marketDataCache": {"quotes": {...}, "info": {...}},
+            "responseCache": {"predict": {...}, "forecast": {...}, "sentiment": {...}},
+            "prewarm": {"running": true, "hotTickers": [["AAPL", 41.2], ...], "refreshed": {...}, ...},
+            "priceHub": {"subscribers": 12, "symbols": {"SPY": {"subscribers": 12, ...}}, ...},
+            "timestamp": "2024-11-12T10:30:00"
+        }
+    """
+    response, status = build_health()
+    return jsonify(response), status
 
 # ============================================================================
-# SERVER STARTUP
-# ============================================================================
+# WARM-UP AND READINESS
+# ============================================================================
+
+# Tickers whose forecast models are fitted during warm-up
+# (the stocks the dashboard shows by default; override with WARMUP_TICKERS)
+DEFAULT_WARMUP_TICKERS = ['AAPL', 'MSFT', 'TSLA', 'NVDA', 'GOOGL', 'AMZN', 'META', 'NFLX']
+
+# Warm-up state of each component: cold -> warming -> ready (or failed)
+# In lazy mode (no preload) components stay "lazy" and load on first use
+warmup_state = {
+    'sentimentModel': {'state': 'lazy'},
+    'priceDataset': {'state': 'lazy'},
+    'riskModel': {'state': 'lazy'},
+    'forecastModels': {'state': 'lazy'},
+}
+warmup_lock = threading.Lock()
+
+
+def _set_warmup_state(component, state, **details):
+    with warmup_lock:
+        warmup_state[component] = {'state': state, **details}
+
+
+def warmup_tickers():
+    """Tickers to pre-fit, from WARMUP_TICKERS (comma separated) or the defaults."""
+    raw = os.environ.get('WARMUP_TICKERS')
+    if not raw:
+        return list(DEFAULT_WARMUP_TICKERS)
+    return [t.strip().upper() for t in raw.split(',') if t.strip()]
+
+
+def warm_up(tickers=None):
+    """
+    Load everything that would otherwise make the first requests slow.
+
+    - the sentiment pipeline (plus one inference, which is slow the first time)
+    - the price dataset, read and split by ticker once
+    - the risk model's return covariance matrix
+    - fitted forecast models for the warm-up tickers
+
+    When called in the gunicorn master before workers fork (preload_app),
+    every worker starts with these already in memory, shared copy-on-write.
+    A component that fails is marked "failed" and the others still load.
+    """
+    tickers = warmup_tickers() if tickers is None else tickers
+    for component in warmup_state:
+        _set_warmup_state(component, 'cold')
+
+    # ===== SENTIMENT MODEL =====
+    _set_warmup_state('sentimentModel', 'warming')
+    started = time.time()
+    try:
+        get_sentiment_pipeline()('Warm-up sentence for the sentiment model.')
+        _set_warmup_state('sentimentModel', 'ready', seconds=round(time.time() - started, 2))
+    except Exception as e:
+        print(f"Warm-up: sentiment model failed: {e}")
+        _set_warmup_state('sentimentModel', 'failed', error=str(e))
+
+    # ===== PRICE DATASET =====
+    _set_warmup_state('priceDataset', 'warming')
+    started = time.time()
+    try:
+        groups = load_dataset(PARQUET_PATH)
+        _set_warmup_state('priceDataset', 'ready', tickers=len(groups),
+                          seconds=round(time.time() - started, 2))
+    except Exception as e:
+        print(f"Warm-up: price dataset failed: {e}")
+        _set_warmup_state('priceDataset', 'failed', error=str(e))
+        groups = {}
+
+    # ===== RISK MODEL =====
+    # Builds the return covariance matrix once; later syncs only add new days
+    _set_warmup_state('riskModel', 'warming')
+    started = time.time()
+    try:
+        risk_model.sync()
+        _set_warmup_state('riskModel', 'ready', seconds=round(time.time() - started, 2))
+    except Exception as e:
+        print(f"Warm-up: risk model failed: {e}")
+        _set_warmup_state('riskModel', 'failed', error=str(e))
+
+    # ===== FITTED FORECAST MODELS =====
+    # Same parameters as run_quick_forecast() and the forecast endpoint defaults,
+    # so the first requests for these tickers hit the model cache
+    _set_warmup_state('forecastModels', 'warming')
+    started = time.time()
+    fitted = []
+    for ticker in tickers:
+        if ticker not in groups:
+            continue
+        try:
+            run_quick_forecast(ticker)
+            fitted.append(ticker)
+        except Exception as e:
+            print(f"Warm-up: forecast for {ticker} failed: {e}")
+    _set_warmup_state('forecastModels', 'ready', tickers=fitted,
+                      seconds=round(time.time() - started, 2))
+
+
+def readiness():
+    """
+    Return (ready, components) for the health check.
+
+    The server is ready when no component is still cold/warming and none
+    failed. Lazy components (no preload requested) count as ready.
+    """
+    with warmup_lock:
+        components = {name: dict(info) for name, info in warmup_state.items()}
+    ready = all(info['state'] in ('ready', 'lazy') for info in components.values())
+    return ready, components
+
+
+def start_background_warm_up():
+    """
+    Run warm_up() in a daemon thread; health reports 503 until it is done.
+
+    Must be called in the process that serves requests. Under gunicorn with
+    preload_app this means after the fork (gunicorn.conf.py post_fork): a
+    thread started in the master doesn't exist in the workers, which would
+    inherit its half-finished "warming" state and any lock it held.
+    """
+    for component in warmup_state:
+        _set_warmup_state(component, 'cold')
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+# ============================================================================
+# BACKGROUND PRE-WARMING OF POPULAR TICKERS
+# ============================================================================
+
+# Requests per ticker with exponential decay (half-life PREWARM_HALF_LIFE seconds)
+# Every predict/forecast/sentiment handler records the ticker it was asked for
+popularity = PopularityTracker(half_life=float(os.environ.get('PREWARM_HALF_LIFE', 600)))
+
+# Cache keys the pre-warm jobs refresh, matching what the handlers look up
+# (forecast with the endpoint defaults, sentiment with the default keyword)
+PREWARM_FORECAST_PARAMS = (20, None, 'rows', 0)
+
+
+def _refresh_forecast(ticker):
+    horizon, lags, fmt, simulate = PREWARM_FORECAST_PARAMS
+    response_cache.refresh('forecast', (ticker,) + PREWARM_FORECAST_PARAMS,
+                           lambda: build_detailed_forecast(ticker, horizon, lags, fmt, simulate))
+
+
+def _refresh_sentiment(ticker):
+    keyword = ticker.lower()
+
+    def compute():
+        # No latency budget here, so the result is never partial
+        return analyze_news_sentiment(ticker, keyword)
+
+    response_cache.refresh('sentiment', (ticker, keyword), compute)
+
+
+def build_prewarm_jobs():
+    """
+    The cache entries kept warm for each hot ticker.
+
+    - quote: the 5-day price history behind the predict endpoint
+    - predict / forecast / sentiment: the rendered GET responses
+    """
+    return [
+        PrewarmJob('quote', market_cache.quotes.ttl,
+                   lambda t: market_cache.quotes.ttl_remaining((t, '5d')),
+                   lambda t: market_cache.refresh_history(t, '5d')),
+        PrewarmJob('predict', response_cache.ttl('predict'),
+                   lambda t: response_cache.ttl_remaining('predict', (t,)),
+                   lambda t: response_cache.refresh('predict', (t,),
+                                                    lambda: compute_stock_prediction(t))),
+        PrewarmJob('forecast', response_cache.ttl('forecast'),
+                   lambda t: response_cache.ttl_remaining('forecast', (t,) + PREWARM_FORECAST_PARAMS),
+                   _refresh_forecast),
+        PrewarmJob('sentiment', response_cache.ttl('sentiment'),
+                   lambda t: response_cache.ttl_remaining('sentiment', (t, t.lower())),
+                   _refresh_sentiment),
+    ]
+
+
+# Top-N size, interval, concurrency and CPU budget: PREWARM_* variables (see prewarm.py)
+prewarm_scheduler = PrewarmScheduler.from_env(popularity, build_prewarm_jobs())
+
+
+def prewarm_enabled():
+    return os.environ.get('PREWARM_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+
+def start_prewarm():
+    """
+    Start the pre-warm scheduler in this process if PREWARM_ENABLED is set.
+
+    Cheap when it is already running, so it can run before every request.
+    Threads don't survive fork, so each gunicorn worker starts its own.
+    """
+    if prewarm_enabled():
+        prewarm_scheduler.start()
+
+# ============================================================================
+# JSON ENCODING AND COMPRESSION
+# ============================================================================
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by serialization.dumps (orjson when installed).
+
+    jsonify() goes through this, so every endpoint gets the faster encoder
+    and native NumPy scalar support without changing the handlers.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return serialization.dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(serialization.dumps(obj), mimetype=self.mimetype)
+
+
+def compress_response(response):
+    """
+    after_request hook: gzip/brotli-compress JSON bodies the client accepts.
+
+    Skips small bodies, streamed responses, 304s and responses that were
+    already compressed (cached GET responses compress themselves once).
+    """
+    if (response.direct_passthrough or response.status_code in (204, 304)
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    body = response.get_data()
+    if not should_compress(body, encoding):
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# ============================================================================
+# REQUEST PROFILING (OPT-IN)
+# ============================================================================
+
+# Configured with PROFILE_TOKEN (header/query trigger), PROFILE_SAMPLE_EVERY
+# (1 in N requests), PROFILE_DIR and PROFILE_MAX_FILES (see profiling.py).
+# create_app() only installs the hooks and endpoints below when one of the
+# triggers is set, so unprofiled servers pay nothing per request.
+request_profiler = RequestProfiler.from_env()
+
+# Pstats sort keys accepted by the text report
+PROFILE_SORT_KEYS = ('cumulative', 'tottime', 'ncalls', 'filename')
+
+
+def start_request_profile():
+    """before_request hook: start cProfile if this request asked for it or was sampled."""
+    if request.endpoint in ('list_profiles', 'download_profile'):
+        return  # fetching profiles (token header included) shouldn't create new ones
+    g.request_profile = request_profiler.start(request.headers, request.args)
+
+
+def finish_request_profile(response):
+    """after_request hook: store the profile and tell the client its id."""
+    active = g.pop('request_profile', None)
+    if active is not None:
+        # Never write the trigger token to disk
+        query = {k: v for k, v in request.args.items() if k != PROFILE_QUERY_ARG}
+        meta = request_profiler.finish(active, request.method, request.path, query, response.status_code)
+        response.headers['X-Profile-Id'] = meta['id']
+    return response
+
+
+def profiles_authorized():
+    """
+    Profiles show code paths and request parameters, so the endpoints need
+    the profiling token, or a local client when no token is configured.
+    """
+    if request_profiler.token:
+        return request_profiler.authorized(request.headers.get(PROFILE_HEADER)
+                                           or request.args.get(PROFILE_QUERY_ARG))
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+def list_profiles():
+    """
+    GET /api/debug/profiles: stored profiles, newest first.
+
+    Response Format (JSON):
+        {
+            "profiler": {"enabled": true, "sampleEvery": 100, "captured": 12, ...},
+            "profiles": [
+                {"id": "20241112T103000-1a2b3c4d", "method": "GET",
+                 "path": "/api/stock/forecast", "query": {"ticker": "AAPL"},
+                 "status": 200, "durationMs": 412.5, "trigger": "header", ...},
+                ...
+            ]
+        }
+    """
+    if not profiles_authorized():
+        return jsonify({'error': 'profiling token required'}), 403
+    return jsonify({'profiler': request_profiler.stats(), 'profiles': request_profiler.list()})
+
+
+def download_profile(profile_id):
+    """
+    GET /api/debug/profiles/<id>: one stored profile.
+
+    ?format=prof (default) downloads the raw cProfile file (pstats, snakeviz),
+    ?format=json returns the metadata with the top functions, and
+    ?format=text&sort=cumulative returns a pstats text report.
+    """
+    if not profiles_authorized():
+        return jsonify({'error': 'profiling token required'}), 403
+    fmt = request.args.get('format', 'prof')
+    if fmt == 'json':
+        path = request_profiler.path(profile_id, '.json')
+        if path is None:
+            return jsonify({'error': f'No profile {profile_id}'}), 404
+        return send_file(os.path.abspath(path), mimetype='application/json')
+    if fmt == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in PROFILE_SORT_KEYS:
+            return jsonify({'error': f"sort must be one of {', '.join(PROFILE_SORT_KEYS)}"}), 400
+        report = request_profiler.report(profile_id, sort)
+        if report is None:
+            return jsonify({'error': f'No profile {profile_id}'}), 404
+        return Response(report, mimetype='text/plain')
+    if fmt != 'prof':
+        return jsonify({'error': "format must be 'prof', 'json' or 'text'"}), 400
+    path = request_profiler.path(profile_id)
+    if path is None:
+        return jsonify({'error': f'No profile {profile_id}'}), 404
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=profile_id + '.prof')
+
+# ============================================================================
+# APP FACTORY
+# ============================================================================
+
+def create_app(preload=None):
+    """
+    Build the Flask application.
+
+    Args:
+        preload (bool): Warm up the sentiment model, price dataset and
+                        forecast models before returning. Defaults to the
+                        FINSIGHT_PRELOAD environment variable ("1" to enable).
+                        Set FINSIGHT_PRELOAD=background to warm up in a
+                        background thread instead (health reports 503 until done;
+                        see start_background_warm_up for gunicorn).
+
+    Returns:
+        Flask: the configured application
+    """
+    if preload is None:
+        preload = os.environ.get('FINSIGHT_PRELOAD', '0').lower()
+
+    # Create the Flask application instance
+    flask_app = Flask(__name__)
+
+    # Enable CORS to allow requests from frontend applications running on different ports/domains
+    # This is essential for React/Vue/Angular apps that typically run on localhost:3000
+    # while the Flask server runs on localhost:5000
+    CORS(flask_app)
+
+    # Opt-in request profiling (PROFILE_TOKEN / PROFILE_SAMPLE_EVERY). Registered
+    # first so the profile also covers the other hooks, compression included.
+    if request_profiler.enabled:
+        flask_app.before_request(start_request_profile)
+        flask_app.after_request(finish_request_profile)
+        flask_app.add_url_rule('/api/debug/profiles', 'list_profiles', list_profiles)
+        flask_app.add_url_rule('/api/debug/profiles/<profile_id>', 'download_profile', download_profile)
+
+    # Faster JSON encoding for jsonify() and negotiated response compression
+    flask_app.json = FastJSONProvider(flask_app)
+    flask_app.after_request(compress_response)
+
+    # Register all API routes
+    flask_app.register_blueprint(api)
+
+    if preload == 'background':
+        start_background_warm_up()
+    elif preload in (True, '1', 'true', 'yes'):
+        warm_up()
+
+    # Popular tickers are refreshed in the background (PREWARM_ENABLED=1).
+    # The scheduler starts on the first request each process serves, so with
+    # gunicorn's preload it runs in every worker and not in the master.
+    if prewarm_enabled():
+        flask_app.before_request(start_prewarm)
+
+    return flask_app
+
+
+# Module-level app for "flask run", "gunicorn server:app" and the benchmarks.
+# It is built on first access to server.app rather than at import, so wsgi.py
+# (which builds its own app) doesn't run the FINSIGHT_PRELOAD warm-up twice.
+# Production should use wsgi:app with gunicorn.conf.py, which preloads before forking
+_app = None
+_app_lock = threading.Lock()
+
+
+def get_app():
+    """The module-level app, created with create_app() on first use."""
+    global _app
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+        return _app
+
+
+def __getattr__(name):
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ============================================================================
+# SERVER STARTUP
+# ============================================================================
 
 if __name__ == '__main__':
     """
@@ -684,6 +2636,11 @@ if __name__ == '__main__':
         http://localhost:5001/api/stock/predict
         http://localhost:5001/api/news/sentiment
         http://localhost:5001/api/portfolio
+        http://localhost:5001/api/stream/prices
         http://localhost:5001/api/health
+
+    Set FINSIGHT_PRELOAD=1 to warm everything up before serving. For production
+    use gunicorn with the bundled config (preloads once, then forks workers):
+        gunicorn -c gunicorn.conf.py
     """
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    get_app().run(debug=True, port=5001)
\ No newline at end of file
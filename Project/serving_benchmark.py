@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Throughput comparison between the Flask server and the async (ASGI) server.
+
+Both servers are started as subprocesses with the synthetic upstream provider
+(providers.py), which sleeps a fixed latency on every call to mimic a slow
+Yahoo Finance. The market data cache TTLs are set to zero and every request
+asks for different tickers, so each request really waits on the upstream.
+
+Example:
+    python serving_benchmark.py --concurrency 64 --duration 15 --latency_ms 200
+
+Flask runs under gunicorn with sync workers (the usual production setup);
+pass --flask_server werkzeug to use the threaded development server instead.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+def wait_until_ready(port, timeout=60.0):
+    """Poll /api/health until the server answers."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f'server on port {port} did not become ready')
+
+
+def start_server(mode, port, args):
+    env = dict(
+        os.environ,
+        FINSIGHT_PROVIDER='synthetic',
+        FINSIGHT_REPLAY_LATENCY_MS=str(args.latency_ms),
+        MARKET_CACHE_QUOTE_TTL='0',
+        MARKET_CACHE_INFO_TTL='0',
+        MARKET_CACHE_INFO_WORKERS=str(args.info_workers),
+        UPSTREAM_RATE_LIMIT='0',  # the synthetic upstream doesn't throttle
+    )
+    if mode == 'asgi':
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi_server:app',
+               '--port', str(port), '--log-level', 'warning']
+    elif args.flask_server == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', '-w', str(args.flask_workers),
+               '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'server:app']
+    else:
+        cmd = [sys.executable, '-c',
+               f'import server; server.app.run(port={port}, threaded=True)']
+    proc = subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        wait_until_ready(port)
+    except Exception:
+        proc.terminate()
+        raise
+    return proc
+
+
+def run_load(port, endpoint, concurrency, duration, tickers_per_request):
+    """Hammer one endpoint from `concurrency` client threads for `duration` seconds."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while time.time() < stop_at:
+            # Fresh ticker names so nothing is served from a cache
+            names = [f'SYN{rng.randrange(1_000_000)}' for _ in range(tickers_per_request)]
+            if endpoint == '/api/portfolio':
+                body = {'tickers': names}
+            else:
+                body = {'ticker': names[0]}
+            started = time.perf_counter()
+            try:
+                conn.request('POST', endpoint, json.dumps(body), {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 500
+            except OSError:
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.time() - started
+
+    lat_ms = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / wall, 2),
+        'p50_ms': round(float(np.percentile(lat_ms, 50)), 1),
+        'p95_ms': round(float(np.percentile(lat_ms, 95)), 1),
+        'p99_ms': round(float(np.percentile(lat_ms, 99)), 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--endpoint', default='/api/portfolio',
+                    choices=['/api/portfolio', '/api/stock/predict', '/api/news/sentiment'])
+    ap.add_argument('--concurrency', type=int, default=64)
+    ap.add_argument('--duration', type=float, default=15.0)
+    ap.add_argument('--latency_ms', type=float, default=200.0)
+    ap.add_argument('--tickers_per_request', type=int, default=5)
+    ap.add_argument('--info_workers', type=int, default=32,
+                    help='size of the company-info lookup pool in each server process')
+    ap.add_argument('--flask_server', choices=['gunicorn', 'werkzeug'], default='gunicorn')
+    ap.add_argument('--flask_workers', type=int, default=4)
+    ap.add_argument('--port', type=int, default=5101)
+    ap.add_argument('--out_json', default=None)
+    args = ap.parse_args()
+
+    results = {}
+    for offset, mode in enumerate(['flask', 'asgi']):
+        port = args.port + offset
+        proc = start_server(mode, port, args)
+        try:
+            print(f'Running {mode} on :{port} ...')
+            results[mode] = run_load(port, args.endpoint, args.concurrency,
+                                     args.duration, args.tickers_per_request)
+        finally:
+            proc.terminate()
+            proc.wait()
+        print(f'{mode:>6}: {results[mode]}')
+
+    report = {
+        'endpoint': args.endpoint,
+        'concurrency': args.concurrency,
+        'upstream_latency_ms': args.latency_ms,
+        'flask_server': f'{args.flask_server} ({args.flask_workers} workers)'
+                        if args.flask_server == 'gunicorn' else 'werkzeug (threaded)',
+        'results': results,
+        'asgi_speedup': round(results['asgi']['throughput_rps'] / results['flask']['throughput_rps'], 2)
+                        if results['flask']['throughput_rps'] else None,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out_json:
+        with open(args.out_json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Saved report -> {args.out_json}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The modules under test live flat in Project/ (run with: python -m pytest tests)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Symbols in the small price dataset the server tests run against
+DATASET_TICKERS = ['AAPL', 'MSFT', 'NVDA', 'SPY']
+
+
+def write_dataset(path, tickers=DATASET_TICKERS, days=400):
+    """Random-walk daily bars in the stock_data_since_2016.parquet layout."""
+    frames = []
+    dates = pd.bdate_range('2022-01-03', periods=days)
+    for i, ticker in enumerate(tickers):
+        close = 50.0 * (i + 1) * np.exp(np.cumsum(np.random.default_rng(i).normal(0, 0.01, days)))
+        frames.append(pd.DataFrame({'timestamp': dates, 'symbol': ticker, 'open': close, 'high': close,
+                                    'low': close, 'close': close, 'volume': 1000.0}))
+    pd.concat(frames, ignore_index=True).to_parquet(path)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def server(tmp_path_factory):
+    """
+    server.py on offline settings: synthetic market data, the stub sentiment
+    model and a small generated dataset.
+    """
+    pytest.importorskip('transformers')  # imported by server.py at module level
+    data_dir = tmp_path_factory.mktemp('data')
+    os.environ.update({
+        'FINSIGHT_PROVIDER': 'synthetic',
+        'FINSIGHT_SENTIMENT_MODEL': 'stub',
+        'FINSIGHT_PARQUET_PATH': write_dataset(data_dir / 'prices.parquet'),
+        'FINSIGHT_FORECAST_PARAMS': str(data_dir / 'forecast_params.json'),
+        'PRICE_HUB_SOURCE': 'simulated',
+        'UPSTREAM_RATE_LIMIT': '0',
+        'FINSIGHT_PRELOAD': '0',
+    })
+    import server as server_module
+    yield server_module
+    server_module.price_hub.close()
+
+
+@pytest.fixture
+def client(server):
+    return server.get_app().test_client()
@@ -0,0 +1,51 @@
+import pytest
+
+VOLATILE = {'timestamp', 'timingsMs', 'seconds', 'durationMs'}
+
+REQUESTS = [
+    ('POST', '/api/stock/predict', {'ticker': 'AAPL'}),
+    ('POST', '/api/stock/predict', {}),
+    ('POST', '/api/stock/forecast', {'ticker': 'MSFT', 'horizon': 5}),
+    ('POST', '/api/stock/forecast', {'ticker': 'ZZZZ'}),
+    ('GET', '/api/stock/forecast?ticker=NVDA&horizon=5', None),
+    ('POST', '/api/stock/signal', {'ticker': 'AAPL', 'horizon': 5}),
+    ('POST', '/api/news/sentiment', {'ticker': 'AAPL'}),
+    ('GET', '/api/tickers/search?q=MS', None),
+    ('GET', '/api/stock/similar?ticker=AAPL&n=2', None),
+    ('POST', '/api/portfolio', {'holdings': {'AAPL': 10, 'MSFT': 5}}),
+    ('POST', '/api/portfolio/risk', {'holdings': {'AAPL': 10, 'MSFT': 5}}),
+]
+
+
+def _stable(value):
+    """The payload without the fields that change from one call to the next."""
+    if isinstance(value, dict):
+        return {k: _stable(v) for k, v in value.items() if k not in VOLATILE}
+    if isinstance(value, list):
+        return [_stable(v) for v in value]
+    return value
+
+
+@pytest.fixture(scope='module')
+def asgi_client(server):
+    pytest.importorskip('starlette')
+    from starlette.testclient import TestClient
+
+    import asgi_server
+    return TestClient(asgi_server.app)
+
+
+@pytest.mark.parametrize('method, path, body', REQUESTS)
+def test_same_responses_as_flask(client, asgi_client, method, path, body):
+    flask_response = client.open(path, method=method, json=body)
+    asgi_response = asgi_client.request(method, path, json=body)
+    assert asgi_response.status_code == flask_response.status_code
+    assert _stable(asgi_response.json()) == _stable(flask_response.get_json())
+
+
+def test_cached_get_revalidates_with_the_etag(asgi_client):
+    first = asgi_client.get('/api/stock/predict?ticker=AAPL')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    again = asgi_client.get('/api/stock/predict?ticker=AAPL', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.content == b''
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from bar_aggregator import BarAggregator
+
+T0 = pd.Timestamp('2024-01-02 14:30:00')
+
+
+def trades(*rows):
+    return pd.DataFrame([{'symbol': s, 'timestamp': T0 + pd.Timedelta(seconds=sec), 'price': p, 'size': q}
+                         for s, sec, p, q in rows])
+
+
+def test_ohlcv_and_vwap_for_one_bar():
+    agg = BarAggregator(timeframes=('1m',), watermark_seconds=0)
+    agg.add_batch(trades(('X', 1, 10.0, 1), ('X', 20, 12.0, 3), ('X', 40, 9.0, 1), ('X', 50, 11.0, 5)))
+    (bar,) = agg.flush()
+    assert (bar['open'], bar['high'], bar['low'], bar['close']) == (10.0, 12.0, 9.0, 11.0)
+    assert bar['volume'] == 10 and bar['trade_count'] == 4
+    assert abs(bar['vwap'] - (10 + 36 + 9 + 55) / 10) < 1e-12
+
+
+def test_out_of_order_trades_inside_watermark_are_merged():
+    agg = BarAggregator(timeframes=('1m',), watermark_seconds=30)
+    assert agg.add_batch(trades(('X', 30, 11.0, 1), ('X', 65, 13.0, 1))) == []
+    # Earlier trade of the first minute arrives late, still inside the watermark
+    agg.add_batch(trades(('X', 5, 10.0, 2)))
+    closed = agg.add_batch(trades(('X', 95, 14.0, 1)))
+    assert [b['timestamp'] for b in closed] == [T0]
+    assert closed[0]['open'] == 10.0 and closed[0]['close'] == 11.0 and closed[0]['volume'] == 3
+    assert agg.late_trades == 0
+
+
+def test_trades_for_emitted_bars_are_counted_late():
+    agg = BarAggregator(timeframes=('1m',), watermark_seconds=0)
+    agg.add_batch(trades(('X', 10, 10.0, 1), ('X', 70, 11.0, 1)))  # closes the first minute
+    agg.add_batch(trades(('X', 20, 99.0, 1)))
+    assert agg.late_trades == 1
+    assert all(b['high'] != 99.0 for b in agg.flush())
+
+
+def test_batches_split_anywhere_give_the_same_bars():
+    rows = [('X', s, 10.0 + (s % 7), 1 + s % 3) for s in range(0, 300, 7)] + \
+           [('Y', s, 50.0 - (s % 5), 2) for s in range(3, 300, 11)]
+    rows.sort(key=lambda r: r[1])  # the watermark is global, so feed in time order
+    whole = BarAggregator(timeframes=('1m', '5m'), watermark_seconds=0)
+    expected = whole.add_batch(trades(*rows)) + whole.flush()
+    split = BarAggregator(timeframes=('1m', '5m'), watermark_seconds=0)
+    got = []
+    for i in range(0, len(rows), 5):
+        got += split.add_batch(trades(*rows[i:i + 5]))
+    got += split.flush()
+    key = lambda b: (b['timeframe'], b['symbol'], b['timestamp'])
+    assert sorted(got, key=key) == sorted(expected, key=key)
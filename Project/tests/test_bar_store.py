@@ -0,0 +1,55 @@
+import pandas as pd
+
+from bar_store import BarIngestor, BarStore
+
+
+def bars(symbol, days, close):
+    ts = pd.date_range('2024-05-01', periods=days, freq='D')
+    return pd.DataFrame({'timestamp': ts, 'symbol': symbol, 'open': 1.0, 'high': 2.0,
+                         'low': 0.5, 'close': close, 'volume': 100.0})
+
+
+class FakeFetcher:
+    """Serves whatever frame is current, from the requested start on."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.starts = []
+
+    def fetch(self, symbols, start, timeframe):
+        self.starts.append(start)
+        return self.frame[self.frame['timestamp'] >= start]
+
+
+def test_reingest_replaces_the_forming_last_bar(tmp_path):
+    store = BarStore(str(tmp_path))
+    fetcher = FakeFetcher(bars('BTC/USD', 3, 10.0))
+    ingestor = BarIngestor(store, fetcher)
+    assert ingestor.ingest(['BTC/USD'], '2024-05-01') == {'BTC/USD': 3}
+
+    # The last bar was still forming: it closes at a different price, and a new bar follows
+    updated = pd.concat([bars('BTC/USD', 3, 10.0), bars('BTC/USD', 4, 12.0).tail(1)], ignore_index=True)
+    updated.loc[2, ['close', 'volume']] = [11.0, 250.0]
+    fetcher.frame = updated
+    assert ingestor.ingest(['BTC/USD'], '2024-05-01') == {'BTC/USD': 2}
+    assert fetcher.starts[-1] == pd.Timestamp('2024-05-03')
+
+    stored = store.read(['BTC/USD'])
+    assert stored['close'].tolist() == [10.0, 10.0, 11.0, 12.0]
+    assert stored['volume'].tolist()[2] == 250.0
+    assert store.high_water_mark('BTC/USD') == pd.Timestamp('2024-05-04')
+
+
+def test_unchanged_last_bar_is_not_rewritten(tmp_path):
+    store = BarStore(str(tmp_path), compact_min_files=0)
+    ingestor = BarIngestor(store, FakeFetcher(bars('AAPL', 3, 10.0)))
+    ingestor.ingest(['AAPL'], '2024-05-01')
+    assert ingestor.ingest(['AAPL'], '2024-05-01') == {}
+    assert store.read(['AAPL'])['close'].tolist() == [10.0] * 3
+
+
+def test_rows_before_the_mark_are_skipped(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.append(bars('AAPL', 3, 10.0))
+    assert store.append(bars('AAPL', 2, 99.0)) == {}
+    assert store.read(['AAPL'])['close'].tolist() == [10.0] * 3
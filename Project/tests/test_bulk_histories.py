@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pandas as pd
+
+from market_cache import MarketDataCache
+
+
+class CountingProvider:
+    def __init__(self):
+        self.downloads = []
+
+    def download(self, tickers, period):
+        self.downloads.append(list(tickers))
+        frames = {t: pd.DataFrame({'Close': [1.0, 2.0], 'Volume': [10, 20]},
+                                  index=pd.bdate_range('2024-01-01', periods=2)) for t in tickers}
+        return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+
+def test_get_histories_downloads_only_misses():
+    provider = CountingProvider()
+    cache = MarketDataCache(provider=provider)
+    first = cache.get_histories(['aapl', 'MSFT'], '1d')
+    assert sorted(first) == ['AAPL', 'MSFT']
+    cache.get_histories(['AAPL', 'NVDA'], '1d')
+    assert provider.downloads == [['AAPL', 'MSFT'], ['NVDA']]
+
+
+def test_concurrent_get_histories_share_in_flight_tickers():
+    class SlowProvider(CountingProvider):
+        def __init__(self):
+            super().__init__()
+            self.started, self.release = threading.Event(), threading.Event()
+
+        def download(self, tickers, period):
+            self.started.set()
+            self.release.wait(5)
+            return super().download(tickers, period)
+
+    provider = SlowProvider()
+    cache = MarketDataCache(provider=provider)
+    results = []
+    first = threading.Thread(target=lambda: results.append(cache.get_histories(['AAPL', 'MSFT'], '1d')))
+    first.start()
+    provider.started.wait(5)
+    second = threading.Thread(target=lambda: results.append(cache.get_histories(['MSFT', 'NVDA'], '1d')))
+    second.start()
+    time.sleep(0.05)
+    provider.release.set()
+    first.join(5)
+    second.join(5)
+    assert sorted(map(sorted, provider.downloads)) == [['AAPL', 'MSFT'], ['NVDA']]
+    assert all(not hist.empty for r in results for hist in r.values())
+
+
+def test_download_error_becomes_a_per_ticker_entry():
+    class Failing:
+        def download(self, tickers, period):
+            raise RuntimeError('upstream down')
+
+    cache = MarketDataCache(provider=Failing())
+    cache.quotes.put(('AAPL', '1d'), 'cached')
+    result = cache.get_histories(['AAPL', 'MSFT', 'NVDA'], '1d')
+    assert result['AAPL'] == 'cached'
+    assert all(isinstance(result[t], RuntimeError) for t in ('MSFT', 'NVDA'))
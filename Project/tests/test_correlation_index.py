@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from correlation_index import CorrelationIndex, top_k_correlations
+
+
+def returns_frame():
+    rng = np.random.default_rng(3)
+    base = rng.normal(size=(300, 1))
+    data = base * rng.uniform(0, 1, size=8) + rng.normal(size=(300, 8))
+    frame = pd.DataFrame(data, columns=[f'T{i}' for i in range(8)])
+    frame.iloc[:40, 2] = np.nan  # listed later
+    frame.iloc[rng.choice(300, 25, replace=False), 5] = np.nan  # gaps
+    return frame
+
+
+def test_top_k_matches_pandas_pairwise_corr():
+    frame = returns_frame()
+    tickers, neighbors, correlations = top_k_correlations(frame, k=3, block_size=3, min_overlap=10)
+    expected = frame.corr(min_periods=10)
+    for i, ticker in enumerate(tickers):
+        row = expected[ticker].drop(ticker).sort_values(ascending=False)
+        assert [tickers[j] for j in neighbors[i]] == row.index[:3].tolist()
+        np.testing.assert_allclose(correlations[i], row.values[:3], atol=1e-6)
+
+
+def test_min_overlap_excludes_pairs_and_pads():
+    frame = returns_frame()
+    frame.iloc[60:, 0] = np.nan  # T0 only has 60 days
+    tickers, neighbors, correlations = top_k_correlations(frame, k=7, min_overlap=100)
+    assert (neighbors[0] == -1).all() and np.isnan(correlations[0]).all()
+    index = CorrelationIndex(tickers, neighbors, correlations, {})
+    assert index.neighbors('t0') == []
+    assert len(index.neighbors('T1', n=3)) == 3
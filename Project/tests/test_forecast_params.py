@@ -0,0 +1,30 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import forecast_model_final as fm
+
+
+def make_inputs(tmp_path):
+    dates = pd.bdate_range('2020-01-01', periods=400)
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(size=len(dates)))
+    pd.DataFrame({'timestamp': dates, 'symbol': 'AAA', 'open': close, 'high': close,
+                  'low': close, 'close': close, 'volume': 1.0}).to_parquet(tmp_path / 'prices.parquet')
+    params = {'tickers': {'AAA': {'horizons': {'5': {'lags': 7, 'per_rows': 300}}}}}
+    (tmp_path / 'params.json').write_text(json.dumps(params))
+    return str(tmp_path / 'prices.parquet'), str(tmp_path / 'params.json')
+
+
+def test_tuned_params_apply_only_when_neither_is_given(tmp_path):
+    prices, params = make_inputs(tmp_path)
+    run = lambda **kw: fm.run_forecast('AAA', prices, horizon=5, params_path=params, **kw)
+
+    result = run()
+    assert (result['lags'], result['per_rows'], result['tuned']) == (7, 300, True)
+
+    # per_rows was tuned together with lags=7, so it isn't reused for other lags
+    result = run(lags=3)
+    assert (result['lags'], result['per_rows'], result['tuned']) == (3, fm.DEFAULT_PER_ROWS, False)
+    result = run(per_rows=200)
+    assert (result['lags'], result['per_rows'], result['tuned']) == (fm.DEFAULT_LAGS, 200, False)
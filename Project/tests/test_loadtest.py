@@ -0,0 +1,60 @@
+import random
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+import loadtest
+
+
+def test_parse_mix():
+    assert loadtest.parse_mix('predict=3,health') == {'predict': 3.0, 'health': 1.0}
+    with pytest.raises(ValueError):
+        loadtest.parse_mix('quotes=1')
+    with pytest.raises(ValueError):
+        loadtest.parse_mix('predict=0')
+
+
+def test_zipf_weights_favour_the_first_ranks():
+    weights = loadtest.zipf_weights(100, 1.1)
+    assert weights.sum() == pytest.approx(1.0)
+    assert list(weights) == sorted(weights, reverse=True)
+
+
+def test_summarize_reports_percentiles_and_errors():
+    latencies = [i / 1000.0 for i in range(1, 101)]  # 1..100 ms
+    statuses = Counter({200: 97, 503: 2, 'connection_error': 1})
+    summary = loadtest.summarize(latencies, statuses, duration=10.0)
+    assert summary['requests'] == 100 and summary['throughput_rps'] == 10.0
+    assert summary['errors'] == 3 and summary['error_rate'] == 0.03
+    assert (summary['p50_ms'], summary['p95_ms'], summary['p99_ms'], summary['max_ms']) == (50.5, 95.0, 99.0, 100.0)
+    assert 'p50_ms' not in loadtest.summarize([], Counter(), duration=1.0)
+
+
+def test_build_request():
+    args = SimpleNamespace(portfolio_size=3, horizon=20, budget_ms=250, method='get')
+    rng = random.Random(0)
+    universe = loadtest.make_universe(5)
+    weights = list(loadtest.zipf_weights(5, 1.1))
+    method, path, body = loadtest.build_request('sentiment', rng, universe, weights, args)
+    assert method == 'GET' and path.startswith('/api/news/sentiment?ticker=T000') and 'budgetMs=250' in path
+    method, path, body = loadtest.build_request('portfolio', rng, universe, weights, args)
+    assert method == 'POST' and body['tickers'] == sorted(set(body['tickers']))
+
+
+def test_run_load_against_a_running_server(server):
+    from werkzeug.serving import make_server
+
+    httpd = make_server('127.0.0.1', 0, server.get_app(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    args = SimpleNamespace(tickers=5, zipf_s=1.1, warmup=0.0, duration=0.3, concurrency=2, timeout=5,
+                           seed=0, portfolio_size=2, horizon=5, budget_ms=None, method='post',
+                           latency_ms=0, sentiment_latency_ms=0, url=None)
+    try:
+        recorder = loadtest.run_load('127.0.0.1', httpd.server_port, {'health': 1.0}, args)
+    finally:
+        httpd.shutdown()
+    report = loadtest.build_report(recorder, {'health': 1.0}, args, 'local')
+    assert report['total']['requests'] > 0 and report['total']['errors'] == 0
+    assert set(report['endpoints']) == {'health'}
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from market_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    calls = []
+    load = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_load('k', load) == 1
+    clock.now = 9.9
+    assert cache.get_or_load('k', load) == 1
+    clock.now = 10.0
+    assert cache.get_or_load('k', load) == 2
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_lru_eviction():
+    cache = TTLCache(ttl=60, max_entries=2)
+    for key in 'abc':
+        cache.put(key, key)
+    assert cache.peek('a') is None and cache.peek('c') == 'c'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    cache = TTLCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', load)))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 4
+
+
+def test_loader_errors_reach_waiters_and_are_not_cached():
+    cache = TTLCache(ttl=60)
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    for _ in range(2):
+        try:
+            cache.get_or_load('k', fail)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError('expected the loader error')
+    assert cache.get_or_load('k', lambda: 'ok') == 'ok'
@@ -0,0 +1,71 @@
+import pytest
+
+from prewarm import PopularityTracker, PrewarmJob, PrewarmScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_scores_decay_with_the_half_life():
+    clock = FakeClock()
+    tracker = PopularityTracker(half_life=10.0, clock=clock)
+    for _ in range(4):
+        tracker.record('aapl')
+    tracker.record('MSFT')
+    assert tracker.score('AAPL') == pytest.approx(4.0)
+    clock.now = 10.0
+    assert tracker.score('AAPL') == pytest.approx(2.0)
+    tracker.record('MSFT', weight=3.0)
+    assert tracker.top(2) == [('MSFT', 3.5), ('AAPL', 2.0)]
+    assert tracker.top(5, min_score=2.5) == [('MSFT', 3.5)]
+
+
+def test_rebase_keeps_scores():
+    clock = FakeClock()
+    tracker = PopularityTracker(half_life=1.0, clock=clock)
+    tracker.record('AAPL')
+    clock.now = 100.0  # far enough for the scaled values to be rebased
+    tracker.record('AAPL')
+    assert tracker.score('AAPL') == pytest.approx(1.0)
+
+
+def test_drops_the_coldest_tickers_beyond_max_tracked():
+    tracker = PopularityTracker(max_tracked=10, clock=FakeClock())
+    for i in range(11):
+        tracker.record(f'T{i}', weight=i + 1)
+    assert len(tracker) == 9 and tracker.score('T0') == 0.0 and tracker.score('T10') > 0
+
+
+def make_scheduler(remaining, refresh, **kwargs):
+    tracker = PopularityTracker(clock=FakeClock())
+    for ticker, hits in (('AAPL', 5), ('MSFT', 3), ('NVDA', 1)):
+        tracker.record(ticker, weight=hits)
+    job = PrewarmJob('quote', ttl=60, ttl_remaining=lambda t: remaining[t], refresh=refresh)
+    return PrewarmScheduler(tracker, [job], interval=1.0, **kwargs)
+
+
+def test_refreshes_hot_entries_close_to_expiry():
+    refreshed = []
+    remaining = {'AAPL': 5.0, 'MSFT': 50.0, 'NVDA': 0.0}
+    scheduler = make_scheduler(remaining, refreshed.append, top_n=2, max_workers=4)
+    assert scheduler.run_once(wait=True) == 1
+    assert refreshed == ['AAPL']  # MSFT is still fresh, NVDA is outside the top 2
+    assert scheduler.stats()['refreshed'] == {'quote': 1}
+
+
+def test_failures_are_counted_and_the_budget_stops_submissions():
+    def fail(ticker):
+        raise RuntimeError('upstream down')
+
+    remaining = {'AAPL': 0.0, 'MSFT': 0.0, 'NVDA': 0.0}
+    scheduler = make_scheduler(remaining, fail, max_workers=4, min_score=0.5)
+    assert scheduler.run_once(wait=True) == 3
+    assert scheduler.failed == {'quote': 3}
+
+    busy = make_scheduler(remaining, lambda t: sum(range(200000)), cpu_budget=0.0)
+    assert busy.run_once(wait=True) == 0 and busy.skipped_for_budget == 1
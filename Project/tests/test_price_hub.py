@@ -0,0 +1,30 @@
+from price_hub import PriceHub
+
+
+class Source:
+    def fetch(self, symbol):
+        return {'price': 1.0, 'volume': 0, 'asOf': 't'}
+
+
+def test_publish_after_close_is_ignored():
+    hub = PriceHub(Source(), poll_interval=60)
+    hub.close()
+    hub._publish('SPY', {'price': 2.0, 'volume': 0, 'asOf': 't2'})  # a poll finishing late
+    assert hub.latest('SPY') is None
+
+
+def test_subscribers_get_changes_only():
+    hub = PriceHub(Source(), poll_interval=60)
+    try:
+        subscription = hub.subscribe(['spy'])
+        hub._publish('SPY', {'price': 2.0, 'volume': 0, 'asOf': 't2'})
+        hub._publish('SPY', {'price': 2.0, 'volume': 0, 'asOf': 't2'})
+        prices = []
+        while True:
+            update = subscription.get(timeout=0.2)
+            if update is None:
+                break
+            prices.append(update['price'])
+        assert prices[-1] == 2.0 and prices.count(2.0) == 1
+    finally:
+        hub.close()
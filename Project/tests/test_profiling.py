@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from profiling import PROFILE_HEADER, RequestProfiler
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    return RequestProfiler(str(tmp_path / 'profiles'), token='secret', max_profiles=2)
+
+
+def test_triggers(tmp_path):
+    profiler = RequestProfiler(str(tmp_path), token='secret', sample_every=3)
+    assert profiler.start({PROFILE_HEADER: 'wrong'}, {}) is None
+    assert profiler.start({}, {}) is None
+    sampled = profiler.start({}, {})
+    assert sampled.trigger == 'sample'
+    sampled.profiler.disable()
+    by_query = profiler.start({}, {'profile': 'secret'})
+    assert by_query.trigger == 'header'
+    by_query.profiler.disable()
+    assert not RequestProfiler(str(tmp_path)).enabled
+
+
+def test_finish_stores_profiles_and_keeps_the_newest(profiler):
+    ids = []
+    for _ in range(3):
+        active = profiler.start({PROFILE_HEADER: 'secret'}, {})
+        sorted(range(1000))
+        ids.append(profiler.finish(active, 'GET', '/api/health', {}, 200)['id'])
+    assert [meta['id'] for meta in profiler.list()] == ids[:0:-1]
+    assert profiler.path(ids[0]) is None
+    assert 'function calls' in profiler.report(ids[-1])
+    assert profiler.path('../etc/passwd') is None
+
+
+def test_work_on_other_threads_joins_the_profile(profiler):
+    active = profiler.start({PROFILE_HEADER: 'secret'}, {}, profile_caller=False)
+    worker = threading.Thread(target=active.run, args=(sorted, range(1000)))
+    worker.start()
+    worker.join()
+    meta = profiler.finish(active, 'GET', '/api/health', {}, 200)
+    assert any('sorted' in row['function'] for row in meta['top'])
+
+
+def test_flask_profiling(server, profiler, monkeypatch):
+    monkeypatch.setattr(server, 'request_profiler', profiler)
+    client = server.create_app(preload=False).test_client()
+    response = client.get('/api/health', headers={PROFILE_HEADER: 'secret'})
+    profile_id = response.headers['X-Profile-Id']
+    assert client.get('/api/debug/profiles').status_code == 403
+    listing = client.get('/api/debug/profiles', headers={PROFILE_HEADER: 'secret'}).get_json()
+    assert [meta['id'] for meta in listing['profiles']] == [profile_id]
+    report = client.get(f'/api/debug/profiles/{profile_id}?format=text', headers={PROFILE_HEADER: 'secret'})
+    assert report.status_code == 200 and 'build_health' in report.get_data(as_text=True)
+
+
+def test_asgi_profiling(server, profiler, monkeypatch):
+    pytest.importorskip('starlette')
+    from starlette.testclient import TestClient
+
+    import asgi_server
+    monkeypatch.setattr(server, 'request_profiler', profiler)
+    client = TestClient(asgi_server.create_app())
+    response = client.post('/api/stock/predict', json={'ticker': 'AAPL'}, headers={PROFILE_HEADER: 'secret'})
+    assert response.status_code == 200
+    profile_id = response.headers['X-Profile-Id']
+    assert client.get('/api/debug/profiles').status_code == 403
+    listing = client.get('/api/debug/profiles', headers={PROFILE_HEADER: 'secret'}).json()
+    assert [meta['id'] for meta in listing['profiles']] == [profile_id]
+    assert listing['profiles'][0]['status'] == 200
+    report = client.get(f'/api/debug/profiles/{profile_id}?format=text', headers={PROFILE_HEADER: 'secret'})
+    assert report.status_code == 200 and 'run_quick_forecast' in report.text
+    assert client.get('/api/health').headers.get('X-Profile-Id') is None
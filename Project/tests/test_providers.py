@@ -0,0 +1,49 @@
+import pytest
+
+from market_cache import MarketDataCache
+from providers import (RecordingProvider, RecordingStore, ReplayMissError, ReplayProvider,
+                       SyntheticProvider)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordingStore(str(tmp_path / 'recordings'))
+
+
+def test_replay_does_not_depend_on_how_downloads_were_batched(store):
+    recording = MarketDataCache(provider=RecordingProvider(SyntheticProvider(), store))
+    recording.get_histories(['AAPL'], '1mo')
+    recording.get_histories(['AAPL', 'MSFT'], '1mo')
+    expected = SyntheticProvider()
+
+    for tickers in (['AAPL', 'MSFT'], ['MSFT'], ['MSFT', 'AAPL']):
+        replay = MarketDataCache(provider=ReplayProvider(store))
+        histories = replay.get_histories(tickers, '1mo')
+        for ticker in tickers:
+            assert list(histories[ticker]['Close']) == list(expected.history(ticker, '1mo')['Close'])
+
+
+def test_history_and_download_recordings_serve_each_other(store):
+    recorder = RecordingProvider(SyntheticProvider(), store)
+    recorder.history('NVDA', '5d')
+    recorder.download(['SPY'], '5d')
+    replay = ReplayProvider(store)
+    assert not replay.download(['NVDA'], '5d').empty
+    assert not replay.history('SPY', '5d').empty
+
+
+def test_info_replay_and_misses(store):
+    recorder = RecordingProvider(SyntheticProvider(), store)
+    info = recorder.info('AAPL')
+    replay = ReplayProvider(store)
+    assert replay.info('AAPL') == info
+    with pytest.raises(ReplayMissError):
+        replay.info('MSFT')
+    with pytest.raises(ReplayMissError):
+        replay.download(['AAPL', 'TSLA'], '1mo')
+
+
+def test_synthetic_provider_is_deterministic():
+    a, b = SyntheticProvider(), SyntheticProvider()
+    assert a.history('AAPL', '1y')['Close'].equals(b.history('AAPL', '1y')['Close'])
+    assert not a.history('AAPL', '1y')['Close'].equals(a.history('MSFT', '1y')['Close'])
@@ -0,0 +1,51 @@
+from quote_book import QuoteBook
+
+
+def entry(ticker, price):
+    return {'ticker': ticker, 'currentPrice': price}
+
+
+def test_versions_only_move_on_change():
+    book = QuoteBook()
+    versions, version = book.update([entry('A', 1.0), entry('B', 2.0)])
+    assert versions == [1, 2] and version == 2
+    versions, version = book.update([entry('A', 1.0), entry('B', 2.5)])
+    assert versions == [1, 3] and version == 3
+
+
+def test_later_changes_get_versions_above_the_returned_version():
+    book = QuoteBook()
+    _, seen = book.update([entry('A', 1.0)])
+    versions, _ = book.update([entry('A', 1.1), entry('B', 1.0)])
+    assert all(v > seen for v in versions)
+
+
+def test_evicted_symbols_come_back_with_a_new_version():
+    book = QuoteBook(max_entries=1)
+    book.update([entry('A', 1.0)])
+    book.update([entry('B', 1.0)])
+    versions, _ = book.update([entry('A', 1.0)])
+    assert versions == [3]
+
+
+def test_portfolio_delta_reports_tickers_that_lost_their_data(server):
+    import pandas as pd
+    hist = pd.DataFrame({'Close': [2.0], 'Volume': [5]})
+    infos = {'AAPL': {'previousClose': 1.0}, 'MSFT': {'previousClose': 1.0}}
+    first, _ = server.build_portfolio(['AAPL', 'msft'], {'AAPL': hist, 'MSFT': hist}, infos)
+    assert [e['ticker'] for e in first['portfolio']] == ['AAPL', 'MSFT']
+    assert first['portfolio'][1]['company'] == 'MSFT'
+
+    # MSFT comes back empty, then its download fails: both must reach the client
+    cursor = (first['epoch'], first['version'])
+    empty, _ = server.build_portfolio(['AAPL', 'MSFT'], {'AAPL': hist, 'MSFT': hist.iloc[:0]}, infos, cursor=cursor)
+    assert empty['delta'] and empty['portfolio'] == [] and empty['unavailable'] == ['MSFT']
+
+    cursor = (empty['epoch'], empty['version'])
+    again, _ = server.build_portfolio(['AAPL', 'MSFT'], {'AAPL': hist, 'MSFT': RuntimeError('down')},
+                                      infos, cursor=cursor)
+    assert again['portfolio'] == [] and again['unavailable'] == []  # already reported
+
+    back, _ = server.build_portfolio(['AAPL', 'MSFT'], {'AAPL': hist, 'MSFT': hist}, infos,
+                                     cursor=(again['epoch'], again['version']))
+    assert [e['ticker'] for e in back['portfolio']] == ['MSFT']
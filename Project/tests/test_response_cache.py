@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+from response_cache import ResponseCache, UncacheableResponse
+
+
+def test_uncoalesced_miss_does_not_wait_for_a_running_computation():
+    cache = ResponseCache()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return {'articles': 10}, 200
+
+    leader = threading.Thread(target=cache.get_or_compute, args=('sentiment', ('A', 'a'), slow))
+    leader.start()
+    started.wait(5)
+    def out_of_budget():
+        raise UncacheableResponse({'partial': True}, 200)
+
+    # A budgeted request computes its own (partial) answer instead of joining
+    with pytest.raises(UncacheableResponse) as partial:
+        cache.get_or_compute('sentiment', ('A', 'a'), out_of_budget, coalesce=False)
+    assert partial.value.payload == {'partial': True}
+    release.set()
+    leader.join(5)
+    # ...and the partial answer was never cached
+    assert cache.get_or_compute('sentiment', ('A', 'a'), slow).payload == {'articles': 10}
+
+
+def test_uncoalesced_complete_result_is_cached():
+    cache = ResponseCache()
+    entry = cache.get_or_compute('sentiment', ('B', 'b'), lambda: ({'articles': 3}, 200), coalesce=False)
+    assert cache.get_or_compute('sentiment', ('B', 'b'), lambda: ({}, 500)) is entry
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ring_buffer import RecentBars, RingBuffer
+
+T0 = pd.Timestamp('2024-01-02 14:30')
+
+
+def fill(buffer, n):
+    for i in range(n):
+        buffer.append(T0 + pd.Timedelta(minutes=i), i, i + 1, i - 1, float(i), 100 + i)
+
+
+def test_wraparound_keeps_the_last_capacity_bars_in_order():
+    buffer = RingBuffer(5)
+    fill(buffer, 13)
+    assert len(buffer) == 5
+    np.testing.assert_array_equal(buffer.window(), [8, 9, 10, 11, 12])
+    np.testing.assert_array_equal(buffer.window(3), [10, 11, 12])
+    assert buffer.latest().close == 12.0
+    assert buffer.latest().timestamp == T0 + pd.Timedelta(minutes=12)
+
+
+def test_same_timestamp_replaces_the_last_bar():
+    buffer = RingBuffer(3)
+    fill(buffer, 3)
+    buffer.append(T0 + pd.Timedelta(minutes=2), 0, 0, 0, 42.0, 0)
+    assert len(buffer) == 3
+    np.testing.assert_array_equal(buffer.window(), [0, 1, 42])
+
+
+def test_windows_are_read_only_views():
+    buffer = RingBuffer(4)
+    fill(buffer, 6)
+    view = buffer.window(4)
+    with pytest.raises(ValueError):
+        view[0] = 1.0
+    assert buffer.frame()['close'].tolist() == [2.0, 3.0, 4.0, 5.0]
+
+
+def test_recent_bars_drops_least_recently_updated_symbol():
+    bars = RecentBars(capacity=2, max_symbols=2)
+    for symbol in ('a', 'b', 'c'):
+        bars.append(symbol, T0, 1, 1, 1, 1, 1)
+    assert bars.symbols() == ['B', 'C']
+    assert bars.latest('a') is None and len(bars.window('zzz')) == 0
+
+
+def test_latest_is_consistent_under_concurrent_appends():
+    import threading
+    buffer = RingBuffer(8)
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            buffer.append(T0 + pd.Timedelta(minutes=i), i, i, i, float(i), i)
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(2000):
+            bar = buffer.latest()
+            if bar is not None:
+                assert bar.open == bar.close == bar.volume
+                assert bar.timestamp == T0 + pd.Timedelta(minutes=int(bar.close))
+    finally:
+        stop.set()
+        thread.join(5)
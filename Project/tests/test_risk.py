@@ -0,0 +1,33 @@
+import numpy as np
+
+from risk import RollingCovariance
+
+
+def test_matches_np_cov_before_the_window_fills():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(30, 4))
+    cov = RollingCovariance(4, window=50)
+    for row in data:
+        cov.update(row)
+    np.testing.assert_allclose(cov.covariance(), np.cov(data, rowvar=False), atol=1e-12)
+    np.testing.assert_allclose(cov.mean(), data.mean(axis=0))
+
+
+def test_matches_np_cov_of_the_last_window_while_rolling():
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(137, 5))
+    cov = RollingCovariance(5, window=40)
+    for i, row in enumerate(data):
+        cov.update(row)
+        if i >= 40 and i % 13 == 0:
+            window = data[i - 39:i + 1]
+            np.testing.assert_allclose(cov.covariance(), np.cov(window, rowvar=False), atol=1e-12)
+            np.testing.assert_array_equal(cov.returns(), window)
+
+
+def test_extend_with_more_rows_than_the_window():
+    rng = np.random.default_rng(2)
+    data = rng.normal(size=(100, 3))
+    cov = RollingCovariance(3, window=25)
+    cov.extend(data)
+    np.testing.assert_allclose(cov.covariance(), np.cov(data[-25:], rowvar=False), atol=1e-12)
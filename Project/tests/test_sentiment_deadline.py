@@ -0,0 +1,64 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from providers import StubSentimentPipeline, SyntheticProvider
+
+
+class CountingFeeds(SyntheticProvider):
+    def __init__(self):
+        super().__init__()
+        self.fetches = 0
+
+    def parse_feed(self, url):
+        self.fetches += 1
+        return super().parse_feed(url)
+
+
+@pytest.fixture
+def feeds(server, monkeypatch):
+    feeds = CountingFeeds()
+    monkeypatch.setattr(server, 'provider', feeds)
+    monkeypatch.setattr(server, 'last_feed_entries', {})
+    monkeypatch.setattr(server, 'article_sentiment_cache', server.OrderedDict())
+    return feeds
+
+
+def test_unbounded_request_scores_every_article(server, feeds):
+    response, status = server.analyze_news_sentiment('AAPL', '')
+    assert status == 200
+    assert response['partial'] is False and len(response['articles']) == 10
+
+
+def test_spent_budget_serves_cached_scores_without_new_work(server, feeds):
+    server.analyze_news_sentiment('AAPL', '')
+    deadline = server.Deadline(1)
+    time.sleep(0.01)
+    response, status = server.analyze_news_sentiment('AAPL', '', deadline)
+    assert status == 200 and response['partial'] is True
+    assert feeds.fetches == 1  # nothing queued once the budget is gone
+    assert all(article['cached'] for article in response['articles'])
+
+
+def test_inference_overshoots_the_budget_by_at_most_one_article(server, feeds, monkeypatch):
+    monkeypatch.setattr(server, 'sentiment_pipeline', StubSentimentPipeline(latency_ms=40))
+    started = time.monotonic()
+    response, status = server.analyze_news_sentiment('MSFT', '', server.Deadline(100))
+    elapsed_ms = (time.monotonic() - started) * 1000.0
+    assert status == 200 and response['partial'] is True
+    assert 0 < len(response['articles']) < 10
+    assert elapsed_ms < 100 + 40 + 50
+
+
+def test_queued_feed_fetch_is_cancelled_at_the_deadline(server, feeds, monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(server, 'io_executor', pool)
+    release = threading.Event()
+    pool.submit(release.wait, 5)  # occupy the only worker
+    entries, timed_out = server.fetch_news_entries('NVDA', server.Deadline(30))
+    release.set()
+    pool.shutdown(wait=True)
+    assert timed_out and entries == []
+    assert feeds.fetches == 0
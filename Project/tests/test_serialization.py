@@ -0,0 +1,69 @@
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+
+import serialization
+from serialization import compress, dumps, negotiate_encoding, should_compress, to_columnar
+
+
+def test_dumps_handles_numpy_and_pandas():
+    payload = {'n': np.int64(3), 'x': np.float32(0.5), 'arr': np.array([1, 2]),
+               'when': pd.Timestamp('2024-01-02'), 'ok': np.bool_(True)}
+    assert json.loads(dumps(payload)) == {'n': 3, 'x': 0.5, 'arr': [1, 2],
+                                          'when': '2024-01-02T00:00:00', 'ok': True}
+
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(serialization, 'brotli', None)
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding('gzip, deflate') == 'gzip'
+    assert negotiate_encoding('br, gzip;q=0') is None
+    assert negotiate_encoding('identity') is None
+    assert negotiate_encoding('*') == 'gzip'
+
+
+def test_compress_only_large_bodies():
+    body = dumps({'rows': list(range(2000))})
+    assert should_compress(body, 'gzip') and not should_compress(body, None)
+    assert not should_compress(b'{}', 'gzip')
+    assert gzip.decompress(compress(body, 'gzip')) == body
+    assert compress(body, None) == body
+
+
+def test_to_columnar():
+    rows = [{'date': 'd1', 'ticker': 'AAPL', 'pred_close': 1.0},
+            {'date': 'd2', 'ticker': 'AAPL', 'pred_close': 2.0}]
+    assert to_columnar(rows, constant=('ticker',)) == {'ticker': 'AAPL', 'date': ['d1', 'd2'],
+                                                       'pred_close': [1.0, 2.0]}
+    assert to_columnar([], keys=['date']) == {'date': []}
+
+
+def test_columnar_forecast_matches_rows(client):
+    rows = client.post('/api/stock/forecast', json={'ticker': 'AAPL', 'horizon': 5}).get_json()
+    columnar = client.post('/api/stock/forecast',
+                           json={'ticker': 'AAPL', 'horizon': 5, 'format': 'columnar'}).get_json()
+    assert columnar['format'] == 'columnar'
+    assert columnar['forecast']['dates'] == [row['date'] for row in rows['forecast']]
+    assert columnar['forecast']['pred_close'] == [row['pred_close'] for row in rows['forecast']]
+    bad = client.post('/api/stock/forecast', json={'ticker': 'AAPL', 'format': 'csv'})
+    assert bad.status_code == 400
+
+
+def test_responses_are_compressed_when_accepted(client):
+    body = {'ticker': 'AAPL', 'horizon': 60}
+    plain = client.post('/api/stock/forecast', json=body)
+    zipped = client.post('/api/stock/forecast', json=body, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(zipped.get_data()))['forecast'] == plain.get_json()['forecast']
+
+
+def test_cached_get_answers_304_for_a_matching_etag(client):
+    first = client.get('/api/stock/forecast?ticker=MSFT&horizon=5')
+    etag = first.headers['ETag']
+    again = client.get('/api/stock/forecast?ticker=MSFT&horizon=5', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.get_data() == b''
+    changed = client.get('/api/stock/forecast?ticker=MSFT&horizon=5', headers={'If-None-Match': '"other"'})
+    assert changed.status_code == 200
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+
+def _results(sentiment):
+    hist = pd.DataFrame({'Close': [100.0, 101.0]}, index=pd.bdate_range('2024-01-01', periods=2))
+    return {'info': {'longName': 'Apple Inc.', 'previousClose': 100.0}, 'history': hist,
+            'sentiment': sentiment}
+
+
+def test_failed_sentiment_marks_the_signal_partial(server):
+    response, status = server.build_signal('AAPL', 20, _results(({'error': 'feed down'}, 500)), {}, {})
+    assert status == 200
+    assert response['partial'] is True and response['errors'] == {'sentiment': 'feed down'}
+    assert set(response['signal']['components']) == {'momentum'}
+
+
+def test_partial_sentiment_marks_the_signal_partial(server):
+    sentiment = {'partial': True, 'articlesAnalyzed': 2, 'sentimentScore': 0.5}
+    response, status = server.build_signal('AAPL', 20, _results((sentiment, 200)), {}, {})
+    assert status == 200 and response['partial'] is True and response['errors'] == {}
+    assert response['signal']['components']['sentiment']['score'] == 0.5
+
+
+def test_complete_signal(server, client):
+    response = client.post('/api/stock/signal', json={'ticker': 'AAPL', 'horizon': 5})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['partial'] is False and body['forecast']['horizon'] == 5
+
+
+@pytest.mark.parametrize('horizon', [0, 10_000])
+def test_horizon_is_bounded(server, client, horizon):
+    payload = {'ticker': 'AAPL', 'horizon': horizon}
+    flask_response = client.post('/api/stock/signal', json=payload)
+    assert flask_response.status_code == 400
+
+    pytest.importorskip('starlette')
+    from starlette.testclient import TestClient
+
+    import asgi_server
+    asgi_response = TestClient(asgi_server.app).post('/api/stock/signal', json=payload)
+    assert asgi_response.status_code == 400
+    assert asgi_response.json() == flask_response.get_json()
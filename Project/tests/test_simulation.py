@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecast_model_final as fm
+
+
+@pytest.fixture
+def fitted():
+    close = 100 + np.cumsum(np.random.default_rng(1).normal(size=300))
+    X, y = fm.make_supervised(pd.Series(close), 5)
+    return fm.fit_pipe(X, y), close[-5:]
+
+
+def test_linear_coefficients_reproduce_the_pipeline(fitted):
+    model, last_values = fitted
+    w, b = fm.linear_coefficients(model)
+    X = np.random.default_rng(2).normal(100, 5, size=(20, 5))
+    np.testing.assert_allclose(X @ w + b, model.predict(X))
+
+
+def test_paths_without_noise_follow_the_point_forecast(fitted):
+    model, last_values = fitted
+    paths = fm.simulate_paths(last_values, model, np.zeros(10), n_steps=15, n_paths=4,
+                              rng=np.random.default_rng(0))
+    assert paths.shape == (4, 15)
+    np.testing.assert_allclose(paths, np.tile(fm.forecast_recursive(last_values, model, 15), (4, 1)))
+
+
+def test_paths_are_reproducible_for_a_seed(fitted):
+    model, last_values = fitted
+    residuals = np.random.default_rng(3).normal(size=200)
+    run = lambda seed: fm.simulate_paths(last_values, model, residuals, 10, 50, np.random.default_rng(seed))
+    np.testing.assert_array_equal(run(7), run(7))
+    assert not np.array_equal(run(7), run(8))
+
+
+def test_summarize_paths():
+    paths = np.array([[110.0, 120.0], [90.0, 80.0], [100.0, 100.0]])
+    summary = fm.summarize_paths(paths, last_close=100.0)
+    assert summary['paths'] == 3
+    assert summary['bands']['p50'] == [100.0, 100.0]
+    assert summary['terminal_return']['mean'] == pytest.approx(0.0)
+    assert summary['terminal_return']['prob_gain'] == pytest.approx(1 / 3)
+    assert summary['max_drawdown']['mean'] == pytest.approx(0.2 / 3)
+
+
+def test_forecast_endpoint_adds_bands(client):
+    body = client.post('/api/stock/forecast', json={'ticker': 'AAPL', 'horizon': 5, 'simulate': 500}).get_json()
+    bands = body['simulation']['bands']
+    assert len(bands['p5']) == 5
+    assert all(lo <= mid <= hi for lo, mid, hi in zip(bands['p5'], bands['p50'], bands['p95']))
+    too_many = client.post('/api/stock/forecast', json={'ticker': 'AAPL', 'simulate': 10 ** 6})
+    assert too_many.status_code == 400
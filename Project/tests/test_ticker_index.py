@@ -0,0 +1,73 @@
+import pytest
+
+from ticker_index import CompanyNames, TickerIndex
+
+
+def make_index():
+    names = CompanyNames()
+    names.learn('AAPL', 'Apple Inc.')
+    names.learn('MSFT', 'Microsoft Corporation')
+    return TickerIndex(['MSFT', 'AAPL', 'AAL', 'AMZN', 'NVDA', 'AAPL'], names=names)
+
+
+def test_membership_and_prefix_search():
+    index = make_index()
+    assert len(index) == 5
+    assert 'AAPL' in index and 'AAP' not in index and 'ZZZZ' not in index
+    assert index.with_prefix('AA') == ['AAL', 'AAPL']
+    assert index.with_prefix('A', limit=2) == ['AAL', 'AAPL']
+
+
+def test_search_ranks_exact_prefix_name_then_fuzzy():
+    index = make_index()
+    assert [(r['symbol'], r['match']) for r in index.search('aapl')][0] == ('AAPL', 'exact')
+    assert [r['match'] for r in index.search('micro')] == ['name']
+    assert index.search('NVDX')[0] == {'symbol': 'NVDA', 'name': None, 'match': 'fuzzy'}
+    assert index.search('   ') == []
+
+
+def test_unknown_ticker_gets_404_with_suggestions(client):
+    response = client.post('/api/stock/forecast', json={'ticker': 'AAPLL'})
+    assert response.status_code == 404
+    assert 'AAPL' in response.get_json()['suggestions']
+
+
+@pytest.fixture
+def missing_dataset(server, tmp_path, monkeypatch):
+    """Point the server at a price dataset that doesn't exist (FINSIGHT_PARQUET_PATH)."""
+    path = str(tmp_path / 'missing.parquet')
+    monkeypatch.setattr(server, 'PARQUET_PATH', path)
+    monkeypatch.setattr(server.risk_model, 'parquet_path', path)
+    monkeypatch.setattr(server.risk_model, 'version', None)
+    server.response_cache.invalidate()  # responses computed from the real dataset
+
+
+def test_missing_dataset_keeps_the_baseline_status_codes(server, client, missing_dataset):
+    assert len(server.ticker_index()) == 0
+
+    # Predict falls back to the moving-average trend
+    for response in (client.post('/api/stock/predict', json={'ticker': 'AAPL'}),
+                     client.get('/api/stock/predict?ticker=AAPL')):
+        assert response.status_code == 200
+        assert response.get_json()['trend'] in ('bullish', 'bearish')
+        assert 'predictedPrice' not in response.get_json()
+
+    assert client.post('/api/stock/forecast', json={'ticker': 'AAPL'}).status_code == 404
+    assert client.get('/api/stock/forecast?ticker=AAPL').status_code == 404
+    search = client.get('/api/tickers/search?q=AA')
+    assert search.status_code == 200 and search.get_json()['results'] == []
+    risk = client.post('/api/portfolio/risk', json={'holdings': {'AAPL': 10}})
+    assert risk.status_code == 503
+
+
+def test_missing_dataset_in_the_asgi_server(server, missing_dataset):
+    pytest.importorskip('starlette')
+    from starlette.testclient import TestClient
+
+    import asgi_server
+    client = TestClient(asgi_server.app)
+    assert client.post('/api/stock/predict', json={'ticker': 'AAPL'}).status_code == 200
+    assert client.post('/api/stock/forecast', json={'ticker': 'AAPL'}).status_code == 404
+    assert client.get('/api/stock/forecast?ticker=AAPL').status_code == 404
+    assert client.get('/api/tickers/search?q=AA').status_code == 200
+    assert client.post('/api/portfolio/risk', json={'holdings': {'AAPL': 10}}).status_code == 503
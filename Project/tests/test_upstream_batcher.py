@@ -0,0 +1,120 @@
+import threading
+
+import pandas as pd
+
+from upstream_batcher import TokenBucket, UpstreamBatcher, is_throttled
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_burst_then_rate():
+    t = FakeTime()
+    bucket = TokenBucket(rate=10, burst=3, clock=t.clock, sleep=t.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert abs(bucket.acquire() - 0.1) < 1e-9
+    t.now += 1.0  # refills, capped at burst
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() > 0
+
+
+def test_token_bucket_charges_multiple_tokens():
+    t = FakeTime()
+    bucket = TokenBucket(rate=10, burst=5, clock=t.clock, sleep=t.sleep)
+    assert bucket.acquire(5) == 0.0
+    assert abs(bucket.acquire(3) - 0.3) < 1e-9
+    assert bucket.stats()['acquired'] == 8
+
+
+def test_token_bucket_backoff_pauses_everyone():
+    t = FakeTime()
+    bucket = TokenBucket(rate=0, burst=1, clock=t.clock, sleep=t.sleep)
+    assert bucket.acquire() == 0.0
+    bucket.backoff(2.0)
+    assert bucket.acquire() == 2.0
+    assert bucket.stats()['backoffs'] == 1
+
+
+def test_is_throttled():
+    assert is_throttled(RuntimeError('429 Client Error: Too Many Requests'))
+    assert not is_throttled(ValueError('no data'))
+
+
+class Provider:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _frame(self, ticker):
+        return pd.DataFrame({'Close': [float(len(ticker))], 'Volume': [1]},
+                            index=pd.bdate_range('2024-01-01', periods=1))
+
+    def history(self, ticker, period):
+        with self.lock:
+            self.calls.append(('history', ticker))
+        return self._frame(ticker)
+
+    def download(self, tickers, period):
+        with self.lock:
+            self.calls.append(('download', tuple(tickers)))
+        frames = {t: self._frame(t) for t in tickers}
+        return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+
+def test_concurrent_history_calls_share_one_download():
+    provider = Provider()
+    batcher = UpstreamBatcher(provider, window_ms=50)
+    tickers = ['A', 'BB', 'CCC', 'DDDD']
+    results = {}
+    threads = [threading.Thread(target=lambda t=t: results.update({t: batcher.history(t, '5d')}))
+               for t in tickers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert [c[0] for c in provider.calls] == ['download']
+    assert {t: results[t]['Close'].iloc[-1] for t in tickers} == {t: float(len(t)) for t in tickers}
+
+
+def test_merged_download_pays_one_token_per_ticker():
+    t = FakeTime()
+    batcher = UpstreamBatcher(Provider(), window_ms=0,
+                              limiter=TokenBucket(100, 100, clock=t.clock, sleep=t.sleep))
+    batcher.download(['A', 'B', 'C'], '1d')
+    batcher.history('A', '1d')
+    assert batcher.stats()['limiter']['acquired'] == 4
+
+
+def test_single_ticker_batch_uses_history():
+    provider = Provider()
+    batcher = UpstreamBatcher(provider, window_ms=1)
+    assert batcher.history('AAPL', '5d')['Close'].iloc[-1] == 4.0
+    assert provider.calls == [('history', 'AAPL')]
+
+
+def test_throttled_calls_retry_with_backoff():
+    class Flaky:
+        attempts = 0
+
+        def info(self, ticker):
+            Flaky.attempts += 1
+            if Flaky.attempts < 3:
+                raise RuntimeError('Rate limited. Try after a while.')
+            return {'longName': ticker}
+
+    t = FakeTime()
+    batcher = UpstreamBatcher(Flaky(), window_ms=0, backoff_ms=100,
+                              limiter=TokenBucket(0, 1, clock=t.clock, sleep=t.sleep))
+    assert batcher.info('X') == {'longName': 'X'}
+    assert batcher.stats()['retries'] == 2
+    assert len(t.slept) == 2 and t.slept[1] > t.slept[0] * 0.5
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from valuation import PositionBook, value_book
+
+
+def test_value_book_market_value_pnl_and_weights():
+    book = PositionBook.from_portfolios([
+        {'id': 'p1', 'holdings': {'AAPL': 10, 'MSFT': 5}},
+        {'id': 'p2', 'holdings': {}},
+        {'id': 'p3', 'holdings': {'MSFT': 2, 'XYZ': 100}},
+    ])
+    assert book.portfolio_ids == ['p1', 'p2', 'p3']
+    prices = {'AAPL': 100.0, 'MSFT': 200.0, 'XYZ': np.nan}
+    previous = {'AAPL': 90.0, 'MSFT': 210.0, 'XYZ': 1.0}
+    v = value_book(book, [prices[t] for t in book.tickers], [previous[t] for t in book.tickers],
+                   include_weights=True)
+    np.testing.assert_allclose(v.market_value, [2000.0, 0.0, 400.0])
+    # XYZ has no price: no value and no P&L, reported as missing
+    np.testing.assert_allclose(v.day_pnl, [10 * 10 - 5 * 10, 0.0, -20.0])
+    assert v.missing_prices.tolist() == [0, 0, 1]
+    weights = dict(zip(book.tickers, v.weights[0].toarray().ravel()))
+    assert weights['AAPL'] == pytest.approx(0.5) and weights['MSFT'] == pytest.approx(0.5)
+
+
+def test_bad_shares_are_rejected():
+    with pytest.raises(ValueError):
+        PositionBook.from_portfolios([{'id': 'p', 'holdings': {'AAPL': 'ten'}}])
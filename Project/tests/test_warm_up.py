@@ -0,0 +1,54 @@
+import threading
+
+import forecast_model_final
+from conftest import write_dataset
+
+
+def test_dataset_read_does_not_block_index_or_repeat(tmp_path, monkeypatch):
+    path = str(tmp_path / 'prices.parquet')
+    write_dataset(path, ['AAPL', 'MSFT'], days=30)
+    started, release = threading.Event(), threading.Event()
+    reads = []
+    prepare = forecast_model_final.load_and_prepare
+
+    def slow_prepare(parquet_path):
+        reads.append(parquet_path)
+        started.set()
+        release.wait(5)
+        return prepare(parquet_path)
+
+    monkeypatch.setattr(forecast_model_final, 'load_and_prepare', slow_prepare)
+    results = []
+    loaders = [threading.Thread(target=lambda: results.append(forecast_model_final.load_dataset(path)))
+               for _ in range(2)]
+    loaders[0].start()
+    started.wait(5)
+    loaders[1].start()
+    # The index only needs the lock for its own cache, not for the whole read
+    indexes = []
+    lookup = threading.Thread(target=lambda: indexes.append(forecast_model_final.load_ticker_index(path)))
+    lookup.start()
+    lookup.join(2)
+    assert indexes and 'AAPL' in indexes[0]
+    release.set()
+    for loader in loaders:
+        loader.join(5)
+    assert len(reads) == 1
+    assert results[0] is results[1] and sorted(results[0]) == ['AAPL', 'MSFT']
+
+
+def test_warm_up_reports_every_component(server, client, monkeypatch):
+    ready, components = server.readiness()
+    assert ready
+    monkeypatch.setitem(server.warmup_state, 'riskModel', {'state': 'warming'})
+    response = client.get('/api/health')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'starting'
+
+    server.warm_up(['AAPL'])
+    ready, components = server.readiness()
+    assert ready
+    assert set(components) == {'sentimentModel', 'priceDataset', 'riskModel', 'forecastModels'}
+    assert components['riskModel']['state'] == 'ready'
+    assert components['forecastModels']['tickers'] == ['AAPL']
+    assert client.get('/api/health').status_code == 200
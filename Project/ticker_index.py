@@ -0,0 +1,175 @@
+"""
+Ticker symbol index for validation and autocomplete.
+
+The symbols of the price dataset are kept in a sorted list, so
+
+- membership (is this a ticker we have data for?) is a binary search, O(log n)
+- prefix search ("AA" -> AAL, AAPL, ...) is two binary searches plus a slice
+- company names, where known, are indexed the same way by lowercased word
+  ("micro" -> MSFT, MU, ...)
+- when nothing matches, fuzzy matching suggests close symbols for typos
+
+Company names come from the shared `company_names` registry: a CSV named by
+FINSIGHT_TICKER_NAMES (columns symbol,name) if set, plus names learned from
+company info lookups while the server runs (see CompanyNames.learn).
+
+Building the index only reads the symbol column of the dataset (or lists
+the symbol directories of a bar store), not the prices.
+"""
+
+import csv
+import difflib
+import os
+import threading
+from bisect import bisect_left, bisect_right
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from bar_store import BarStore, is_bar_store
+
+# Upper bound for prefix scans: sorts after any character used in symbols or names
+_HIGH = '\uffff'
+
+
+class CompanyNames:
+    """Thread-safe symbol -> company name registry with a change counter."""
+
+    def __init__(self):
+        self._names = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def learn(self, symbol, name):
+        """Record a company name (ignored if empty or unchanged)."""
+        if not name or not symbol:
+            return
+        symbol, name = str(symbol).upper(), str(name).strip()
+        with self._lock:
+            if self._names.get(symbol) != name:
+                self._names[symbol] = name
+                self.version += 1
+
+    def load_csv(self, path):
+        """Load names from a CSV with symbol and name columns."""
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                self.learn(row.get('symbol') or row.get('ticker'), row.get('name'))
+
+    def get(self, symbol):
+        return self._names.get(symbol)
+
+    def items(self):
+        with self._lock:
+            return list(self._names.items())
+
+
+company_names = CompanyNames()
+if os.environ.get('FINSIGHT_TICKER_NAMES'):
+    company_names.load_csv(os.environ['FINSIGHT_TICKER_NAMES'])
+
+
+def dataset_symbols(parquet_path):
+    """Distinct symbols of a parquet file or bar store, reading only the symbol column."""
+    if is_bar_store(parquet_path):
+        return BarStore(parquet_path).symbols('1Day')
+    columns = {name.strip().lower(): name for name in pq.read_schema(parquet_path).names}
+    column = columns.get('symbol') or columns.get('ticker')
+    if column is None:
+        return ['UNK']  # load_and_prepare() names a single-ticker dataset UNK
+    values = pd.read_parquet(parquet_path, columns=[column])[column].dropna()
+    return values.astype(str).unique().tolist()
+
+
+class TickerIndex:
+    """
+    Sorted symbol list with binary-search lookups.
+
+    Args:
+        symbols (iterable): tickers in the dataset
+        names (CompanyNames): company name registry
+    """
+
+    def __init__(self, symbols, names=company_names):
+        self.symbols = sorted(set(str(s) for s in symbols))
+        self.names = names
+        self._name_keys = []  # sorted (lowercased word or full name, symbol)
+        self._names_version = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        i = bisect_left(self.symbols, symbol)
+        return i < len(self.symbols) and self.symbols[i] == symbol
+
+    def with_prefix(self, prefix, limit=10):
+        """Symbols starting with prefix, in alphabetical order."""
+        lo = bisect_left(self.symbols, prefix)
+        hi = bisect_right(self.symbols, prefix + _HIGH, lo)
+        return self.symbols[lo:min(hi, lo + limit)]
+
+    def _name_index(self):
+        """Name keys, rebuilt when the registry has changed since the last search."""
+        if self._names_version != self.names.version:
+            with self._lock:
+                version = self.names.version
+                keys = []
+                for symbol, name in self.names.items():
+                    if symbol in self:
+                        lowered = name.lower()
+                        keys.append((lowered, symbol))
+                        keys.extend((word, symbol) for word in lowered.split()[1:])
+                keys.sort()
+                self._name_keys, self._names_version = keys, version
+        return self._name_keys
+
+    def with_name_prefix(self, prefix, limit=10):
+        """Symbols whose company name (or a word of it) starts with prefix."""
+        keys = self._name_index()
+        prefix = prefix.lower()
+        lo = bisect_left(keys, (prefix,))
+        hi = bisect_right(keys, (prefix + _HIGH,), lo)
+        found = []
+        for _, symbol in keys[lo:hi]:
+            if symbol not in found:
+                found.append(symbol)
+                if len(found) == limit:
+                    break
+        return found
+
+    def suggest(self, symbol, n=3):
+        """Close symbols for a ticker that isn't in the index (typos)."""
+        return difflib.get_close_matches(symbol.upper(), self.symbols, n=n, cutoff=0.6)
+
+    def search(self, query, limit=10):
+        """
+        Autocomplete: exact symbol, then symbol prefix, then company name
+        prefix, then fuzzy symbol matches.
+
+        Returns:
+            list: [{'symbol', 'name', 'match'}] with match one of
+                  'exact', 'prefix', 'name', 'fuzzy'
+        """
+        query = query.strip()
+        if not query:
+            return []
+        symbol_query = query.upper()
+        ranked = []
+
+        def add(symbols, match):
+            for symbol in symbols:
+                if len(ranked) == limit:
+                    return
+                if all(r['symbol'] != symbol for r in ranked):
+                    ranked.append({'symbol': symbol, 'name': self.names.get(symbol), 'match': match})
+
+        if symbol_query in self:
+            add([symbol_query], 'exact')
+        add(self.with_prefix(symbol_query, limit), 'prefix')
+        add(self.with_name_prefix(query, limit), 'name')
+        if len(ranked) < limit:
+            add(self.suggest(symbol_query, limit - len(ranked)), 'fuzzy')
+        return ranked
+
@@ -0,0 +1,289 @@
+"""
+Cross-request batching and rate limiting for upstream market data calls.
+
+When many users ask for different tickers at the same moment, every
+/api/stock/predict miss used to make its own .history() call. The market
+data cache only coalesces requests for the *same* ticker; this module
+coalesces requests for different ones:
+
+- history(ticker, period) calls arriving within `window_ms` of each other
+  are collected into one batch per period
+- the batch is fetched with a single multi-symbol download() and split back
+  into one frame per ticker (market_cache.split_download), so each waiting
+  request gets exactly what .history() would have returned
+- a batch is sent early once it holds `max_batch` tickers; a batch of one
+  ticker is sent as a plain history() call
+
+Every upstream call (batched or not) first takes tokens from a token bucket
+(`rate` requests per second, bursts up to `burst`). yfinance's download()
+makes one HTTP request per ticker, so a merged download takes one token per
+ticker: batching saves the per-call overhead, not upstream quota. The price
+hub's polls go through the same wrapper (server.py hands it this provider),
+so they draw on the same budget as the API requests. When the upstream signals
+throttling (HTTP 429 / rate limit errors), the call is retried with
+exponential backoff and jitter, and the whole bucket is paused for the
+backoff so other requests don't keep hitting the limit.
+
+UpstreamBatcher wraps a provider from providers.py and has the same
+methods, so it drops in wherever a provider is used.
+
+Configuration (UpstreamBatcher.from_env):
+    UPSTREAM_BATCH_WINDOW_MS  collection window (default 5, 0 = no batching)
+    UPSTREAM_BATCH_MAX        tickers per batch (default 100)
+    UPSTREAM_RATE_LIMIT       upstream requests per second (default 20, 0 = unlimited)
+    UPSTREAM_RATE_BURST       bucket size (default 40)
+    UPSTREAM_MAX_RETRIES      retries after a throttling error (default 3)
+    UPSTREAM_BACKOFF_MS       first retry delay, doubled each retry (default 500)
+"""
+
+import os
+import random
+import threading
+import time
+
+from market_cache import split_download
+
+
+def is_throttled(error):
+    """True if an upstream error means we are being rate limited."""
+    text = f'{type(error).__name__} {error}'.lower()
+    return 'ratelimit' in text or 'rate limit' in text or '429' in text or 'too many requests' in text
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    acquire() takes tokens, sleeping until they are available. backoff()
+    pauses the bucket for everyone, e.g. after the upstream said "slow down".
+
+    Args:
+        rate (float): tokens added per second (<= 0 disables the limit)
+        burst (float): maximum tokens stored
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._stamp = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.backoffs = 0
+
+    def acquire(self, tokens=1.0):
+        """
+        Take tokens (one per upstream request); returns the seconds spent waiting.
+
+        A request for more than `burst` tokens is allowed and simply waits
+        until the balance has been paid back.
+        """
+        with self._lock:
+            now = self.clock()
+            self.acquired += tokens
+            wait = max(0.0, self._paused_until - now)
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                # Reserve the tokens now (the balance may go negative) so
+                # concurrent callers queue up instead of all waking at once
+                self._tokens -= tokens
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds += wait
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def backoff(self, seconds):
+        """Let no call through for the next `seconds`."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+            self.backoffs += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ratePerSecond': self.rate,
+                'burst': self.burst,
+                'acquired': self.acquired,
+                'waited': self.waited,
+                'waitSeconds': round(self.wait_seconds, 3),
+                'backoffs': self.backoffs,
+            }
+
+
+class _Batch:
+    """History requests for one period collected during one window."""
+
+    __slots__ = ('period', 'tickers', 'event', 'frames', 'error')
+
+    def __init__(self, period):
+        self.period = period
+        self.tickers = {}  # insertion-ordered set
+        self.event = threading.Event()
+        self.frames = None
+        self.error = None
+
+
+class UpstreamBatcher:
+    """
+    Provider wrapper that batches history() calls and rate-limits everything.
+
+    Args:
+        provider: providers.py provider (info, history, download, parse_feed)
+        window_ms (float): how long a batch collects tickers (0 = no batching)
+        max_batch (int): tickers that make a batch go out immediately
+        limiter (TokenBucket): shared limiter for all upstream calls
+        max_retries (int): retries after a throttling error
+        backoff_ms (float): first retry delay; doubled on every retry
+    """
+
+    def __init__(self, provider, window_ms=5.0, max_batch=100, limiter=None,
+                 max_retries=3, backoff_ms=500.0, clock=time.monotonic):
+        self.provider = provider
+        self.window = float(window_ms) / 1000.0
+        self.max_batch = max(int(max_batch), 1)
+        self.limiter = limiter or TokenBucket(0, 1)
+        self.max_retries = int(max_retries)
+        self.backoff = float(backoff_ms) / 1000.0
+        self.clock = clock
+        self._open = {}  # period -> _Batch still collecting tickers
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.batched_tickers = 0
+        self.largest_batch = 0
+        self.retries = 0
+        self.throttled = 0
+
+    @classmethod
+    def from_env(cls, provider):
+        """Build a batcher configured from UPSTREAM_* environment variables."""
+        return cls(
+            provider,
+            window_ms=float(os.environ.get('UPSTREAM_BATCH_WINDOW_MS', 5)),
+            max_batch=int(os.environ.get('UPSTREAM_BATCH_MAX', 100)),
+            limiter=TokenBucket(float(os.environ.get('UPSTREAM_RATE_LIMIT', 20)),
+                                float(os.environ.get('UPSTREAM_RATE_BURST', 40))),
+            max_retries=int(os.environ.get('UPSTREAM_MAX_RETRIES', 3)),
+            backoff_ms=float(os.environ.get('UPSTREAM_BACKOFF_MS', 500)),
+        )
+
+    def _call(self, fn, *args, tokens=1):
+        """
+        Call the upstream through the rate limiter, retrying when throttled.
+
+        tokens is the number of upstream requests the call makes (one per
+        ticker for a download); every attempt pays for all of them.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                return fn(*args)
+            except Exception as e:
+                if not is_throttled(e):
+                    raise
+                with self._stats_lock:
+                    self.throttled += 1
+                if attempt == self.max_retries:
+                    raise
+                with self._stats_lock:
+                    self.retries += 1
+                # Exponential backoff with jitter, applied to the whole bucket
+                self.limiter.backoff(self.backoff * (2 ** attempt) * (1.0 + random.random()))
+
+    # ----- provider interface -----
+
+    def info(self, ticker):
+        return self._call(self.provider.info, ticker)
+
+    def download(self, tickers, period):
+        tickers = list(tickers)
+        return self._call(self.provider.download, tickers, period, tokens=max(len(tickers), 1))
+
+    def parse_feed(self, url):
+        # RSS feeds are a different service from the quote API, not limited here
+        return self.provider.parse_feed(url)
+
+    def history(self, ticker, period):
+        """
+        Price history for one ticker, fetched together with whatever other
+        tickers are requested for the same period within the window.
+        """
+        with self._stats_lock:
+            self.requests += 1
+        if self.window <= 0:
+            return self._call(self.provider.history, ticker, period)
+
+        with self._cond:
+            batch = self._open.get(period)
+            leader = batch is None
+            if leader:
+                batch = _Batch(period)
+                self._open[period] = batch
+            batch.tickers[ticker] = None
+            if len(batch.tickers) >= self.max_batch:
+                # Full: close it and wake the leader to send it now
+                del self._open[period]
+                self._cond.notify_all()
+
+        if leader:
+            self._collect(batch)
+            self._fetch(batch)
+        else:
+            batch.event.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.frames[ticker]
+
+    def _collect(self, batch):
+        """Wait out the window (or until the batch fills up), then close the batch."""
+        deadline = self.clock() + self.window
+        with self._cond:
+            while self._open.get(batch.period) is batch:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    del self._open[batch.period]
+                    break
+                self._cond.wait(remaining)
+
+    def _fetch(self, batch):
+        """One upstream call for the whole batch, split back per ticker."""
+        tickers = list(batch.tickers)
+        try:
+            if len(tickers) == 1:
+                batch.frames = {tickers[0]: self._call(self.provider.history, tickers[0], batch.period)}
+            else:
+                data = self._call(self.provider.download, tickers, batch.period, tokens=len(tickers))
+                batch.frames = split_download(data, tickers)
+        except BaseException as e:
+            batch.error = e
+        finally:
+            with self._stats_lock:
+                self.batches += 1
+                self.batched_tickers += len(tickers)
+                self.largest_batch = max(self.largest_batch, len(tickers))
+            batch.event.set()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'windowMs': self.window * 1000.0,
+                'maxBatch': self.max_batch,
+                'historyRequests': self.requests,
+                'batches': self.batches,
+                'avgBatchSize': round(self.batched_tickers / self.batches, 2) if self.batches else 0.0,
+                'largestBatch': self.largest_batch,
+                'throttled': self.throttled,
+                'retries': self.retries,
+                'limiter': self.limiter.stats(),
+            }
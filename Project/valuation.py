@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vectorized valuation of many portfolios at once.
+
+All holdings are kept in one sparse positions matrix P (portfolios x
+tickers, shares as values). With a price vector p and a previous-close
+vector q over the same tickers:
+
+    market value   = P @ p
+    previous value = P @ q
+    day P&L        = P @ (p - q)
+    weights        = P * p / market value    (row-scaled, still sparse)
+
+Each distinct ticker is priced once no matter how many portfolios hold it,
+and the whole book is valued with a couple of sparse matrix-vector products.
+
+Example (benchmark on synthetic portfolios):
+    python valuation.py --portfolios 100000 --tickers 2000 --holdings 12
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class PositionBook:
+    """
+    Holdings of many portfolios as a CSR matrix.
+
+    Args:
+        portfolio_ids (list): row labels
+        tickers (list): column labels (uppercase symbols)
+        matrix (scipy.sparse.csr_matrix): shares, shape (portfolios, tickers)
+    """
+
+    def __init__(self, portfolio_ids, tickers, matrix):
+        self.portfolio_ids = list(portfolio_ids)
+        self.tickers = list(tickers)
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+
+    @classmethod
+    def from_arrays(cls, portfolio_ids, tickers, shares):
+        """
+        Build from parallel arrays, one entry per holding.
+
+        Repeated (portfolio, ticker) pairs are summed.
+        """
+        rows, row_labels = pd.factorize(pd.Index(portfolio_ids))
+        return cls._build(rows, row_labels.tolist(), tickers, shares)
+
+    @classmethod
+    def from_portfolios(cls, portfolios):
+        """
+        Build from [{"id": ..., "holdings": {"AAPL": 10, ...}}, ...].
+
+        Rows follow the order of the list; portfolios without holdings get
+        an empty row.
+
+        Raises:
+            ValueError: a portfolio without an id or with non-numeric shares
+        """
+        ids, counts, tickers, shares = [], [], [], []
+        for portfolio in portfolios:
+            holdings = portfolio.get('holdings') if isinstance(portfolio, dict) else None
+            if not isinstance(holdings, dict) or portfolio.get('id') is None:
+                raise ValueError('each portfolio needs an "id" and a "holdings" object')
+            ids.append(portfolio['id'])
+            counts.append(len(holdings))
+            tickers.extend(holdings.keys())
+            shares.extend(holdings.values())
+        try:
+            shares = np.asarray(shares, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError('shares must be numbers')
+        codes, row_labels = pd.factorize(pd.Index(ids))
+        rows = np.repeat(codes, counts)
+        return cls._build(rows, row_labels.tolist(), tickers, shares)
+
+    @classmethod
+    def _build(cls, rows, row_labels, tickers, shares):
+        cols, col_labels = pd.factorize(pd.Index(tickers, dtype=object).astype(str).str.upper())
+        matrix = sparse.coo_matrix(
+            (np.asarray(shares, dtype=np.float64), (rows, cols)),
+            shape=(len(row_labels), len(col_labels)),
+        ).tocsr()
+        matrix.sum_duplicates()
+        return cls(row_labels, col_labels.tolist(), matrix)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+
+class Valuation:
+    """Result of PositionBook valuation: one array entry per portfolio."""
+
+    __slots__ = ('portfolio_ids', 'market_value', 'previous_value', 'day_pnl', 'day_pnl_pct',
+                 'missing_prices', 'weights', 'tickers')
+
+    def __init__(self, portfolio_ids, market_value, previous_value, day_pnl, day_pnl_pct,
+                 missing_prices, weights, tickers):
+        self.portfolio_ids = portfolio_ids
+        self.market_value = market_value
+        self.previous_value = previous_value
+        self.day_pnl = day_pnl
+        self.day_pnl_pct = day_pnl_pct
+        self.missing_prices = missing_prices
+        self.weights = weights  # sparse CSR matrix or None
+        self.tickers = tickers
+
+    def weights_of(self, row):
+        """{ticker: weight} for one portfolio (requires include_weights)."""
+        start, end = self.weights.indptr[row], self.weights.indptr[row + 1]
+        return {self.tickers[j]: round(float(w), 6)
+                for j, w in zip(self.weights.indices[start:end], self.weights.data[start:end])}
+
+
+def value_book(book, prices, previous_closes, include_weights=False):
+    """
+    Value every portfolio in the book.
+
+    Args:
+        book (PositionBook): holdings
+        prices (array): current price per book.tickers entry (NaN if unknown)
+        previous_closes (array): previous close per ticker (NaN if unknown)
+        include_weights (bool): also compute each holding's share of its portfolio
+
+    Holdings with an unknown price count as zero and are reported in
+    missing_prices (number of such tickers per portfolio).
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    previous_closes = np.asarray(previous_closes, dtype=np.float64)
+    unknown = np.isnan(prices)
+    p = np.where(unknown, 0.0, prices)
+    # Without a price or a previous close the holding contributes no day P&L
+    q = np.where(unknown | np.isnan(previous_closes), p, previous_closes)
+
+    P = book.matrix
+    market_value = P @ p
+    previous_value = P @ q
+    day_pnl = market_value - previous_value
+    with np.errstate(divide='ignore', invalid='ignore'):
+        day_pnl_pct = np.where(previous_value != 0, day_pnl / previous_value * 100.0, 0.0)
+    # Count of held tickers without a price, per portfolio
+    held = P.copy()
+    held.data = np.ones_like(held.data)
+    missing_prices = (held @ unknown.astype(np.float64)).astype(np.int64)
+
+    weights = None
+    if include_weights:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse_value = np.where(market_value != 0, 1.0 / market_value, 0.0)
+        # diag(1 / value) @ P @ diag(p), all sparse
+        weights = (sparse.diags(inverse_value) @ P @ sparse.diags(p)).tocsr()
+
+    return Valuation(book.portfolio_ids, market_value, previous_value, day_pnl, day_pnl_pct,
+                     missing_prices, weights, book.tickers)
+
+
+def price_vectors(tickers, histories):
+    """
+    Current price and previous close per ticker from daily price histories.
+
+    Args:
+        tickers (list): tickers in book order
+        histories (dict): ticker -> daily history DataFrame (Close column),
+                          e.g. from MarketDataCache.get_histories(tickers, '5d')
+
+    Returns:
+        tuple: (prices, previous_closes) arrays, NaN where unknown
+    """
+    prices = np.full(len(tickers), np.nan)
+    previous = np.full(len(tickers), np.nan)
+    for i, ticker in enumerate(tickers):
+        hist = histories.get(ticker)
+        if hist is None or isinstance(hist, Exception) or hist.empty:
+            continue
+        closes = hist['Close'].dropna()
+        if len(closes):
+            prices[i] = closes.iloc[-1]
+        if len(closes) > 1:
+            previous[i] = closes.iloc[-2]
+    return prices, previous
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the portfolio valuation engine.')
+    ap.add_argument('--portfolios', type=int, default=100_000)
+    ap.add_argument('--tickers', type=int, default=2000)
+    ap.add_argument('--holdings', type=int, default=12, help='holdings per portfolio')
+    ap.add_argument('--weights', action='store_true', help='also compute weights')
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n = args.portfolios * args.holdings
+    # Popular tickers are held more often (Zipf-like)
+    popularity = 1.0 / np.arange(1, args.tickers + 1)
+    ticker_ids = rng.choice(args.tickers, size=n, p=popularity / popularity.sum())
+    ids = np.repeat(np.arange(args.portfolios), args.holdings)
+    shares = rng.integers(1, 200, size=n)
+    names = np.array([f'T{i:04d}' for i in range(args.tickers)])
+
+    started = time.perf_counter()
+    book = PositionBook.from_arrays(ids, names[ticker_ids], shares)
+    built = time.perf_counter()
+    prices = rng.uniform(5, 500, size=len(book.tickers))
+    previous = prices * rng.normal(1.0, 0.01, size=len(book.tickers))
+    result = value_book(book, prices, previous, include_weights=args.weights)
+    valued = time.perf_counter()
+
+    print(f'{book.shape[0]} portfolios x {book.shape[1]} tickers, {book.matrix.nnz} holdings')
+    print(f'build book: {(built - started) * 1000:.1f} ms')
+    print(f'valuation:  {(valued - built) * 1000:.1f} ms')
+    print(f'total value: ${result.market_value.sum():,.0f}, '
+          f'day P&L: ${result.day_pnl.sum():,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+# ============================================================================
+# PRODUCTION WSGI ENTRYPOINT
+# ============================================================================
+#
+# Builds the app with preloading enabled. With gunicorn's preload_app (see
+# gunicorn.conf.py) this module is imported once in the master process, so the
+# sentiment pipeline, the price dataset and the fitted forecast models are
+# loaded before the workers fork and shared by all of them copy-on-write.
+#
+# With FINSIGHT_PRELOAD=background nothing is loaded here: a warm-up thread
+# can't be forked into the workers, so gunicorn.conf.py starts one in each
+# worker after the fork instead.
+#
+#     gunicorn -c gunicorn.conf.py
+# ============================================================================
+
+import os
+
+from server import create_app
+
+BACKGROUND_WARM_UP = os.environ.get('FINSIGHT_PRELOAD', '').lower() == 'background'
+
+app = create_app(preload=not BACKGROUND_WARM_UP)